@@ -0,0 +1,260 @@
+"""
+Accuracy and latency regression harness for the inspection-number detectors.
+
+Runs the text-layer and OCR detectors over a labeled corpus and records, per
+file, whether the chosen number is right, the rank of the right number among
+each detector's candidates and the time each stage took. A run is saved as a
+JSON baseline; a later run checked against it fails when accuracy drops, more
+wrong numbers would be renamed automatically, or a stage gets slower beyond the
+tolerances, so a detector speed-up is accepted or rejected with evidence:
+
+    python accuracy.py --output accuracy.json
+    ... change the detector ...
+    python accuracy.py --baseline accuracy.json
+
+A labeled corpus is either a folder generated by synthetic_corpus.py (or any
+folder with the same manifest.json), or a folder of already renamed files, whose
+inspection number prefixes serve as the labels.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import detection
+import synthetic_corpus
+from benchmark import git_revision, percentile
+from number_index import parse_inspection_number
+
+OCR_MODES = ("fallback", "all", "off")
+MAX_ACCURACY_DROP = 0.0  # Accuracy may not fall below the baseline at all
+MAX_LATENCY_RISE = 0.20  # Relative p50 slowdown of a stage counted as a failure
+LATENCY_MIN_MS = 1.0  # Smaller absolute slowdowns are timer noise
+
+
+def load_labels(folder):
+    """Read the labels of a corpus folder
+    Uses manifest.json when present, otherwise the inspection number prefix of
+    every numbered PDF name (unnumbered names have no known label and are skipped).
+    Returns:
+        list of dicts with name, kind and number (None = no number in the document)
+    """
+    folder = Path(folder)
+    if (folder / synthetic_corpus.MANIFEST_NAME).exists():
+        return synthetic_corpus.read_manifest(folder)
+    records = []
+    for path in sorted(folder.glob("*.pdf")):
+        number = parse_inspection_number(path.name)
+        if number:
+            records.append({"name": path.name, "kind": "named", "number": number})
+    return records
+
+
+def candidate_rank(numbers, expected):
+    """Return the 1-based rank of the expected number among candidates, or None"""
+    seen = []
+    for number in numbers:
+        if number not in seen:
+            seen.append(number)
+    return seen.index(expected) + 1 if expected in seen else None
+
+
+def timed(func, *args):
+    """Call func and return (result, milliseconds)"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def evaluate_file(pdf_path, expected, ocr_mode="fallback"):
+    """Run the detectors on one file the way the viewer does, timing each stage
+    Args:
+        expected: Correct number, or None if the document has none
+        ocr_mode: 'fallback' runs OCR only when the text layer is uncertain,
+            'all' runs it on every file (the final pick still only uses it as
+            a fallback), 'off' never runs it
+    Returns:
+        dict with number, confidence, source, accepted, correct and stages
+        (per stage: ms, number and rank of the expected number)
+    """
+    text, text_ms = timed(detection.detect_text_numbers, pdf_path)
+    text_candidates = text["candidates"]
+    stages = {"text": {"ms": text_ms,
+                       "number": text_candidates[0]["number"] if text_candidates else None,
+                       "rank": candidate_rank([c["number"] for c in text_candidates], expected)}}
+
+    fallback = detection.needs_ocr(text_candidates, ocr_mode != "off")
+    ocr_candidates = None
+    if ocr_mode == "all" or fallback:
+        ocr, ocr_ms = timed(detection.detect_ocr_numbers, pdf_path)
+        ocr_candidates = ocr["candidates"]
+        stages["ocr"] = {"ms": ocr_ms,
+                         "number": ocr_candidates[0]["number"] if ocr_candidates else None,
+                         "rank": candidate_rank([c["number"] for c in ocr_candidates], expected)}
+
+    best = detection.choose_best(text_candidates, ocr_candidates if fallback else None)
+    accepted = best["confidence"] >= detection.HIGH_CONFIDENCE
+    return {
+        "number": best["number"],
+        "confidence": best["confidence"],
+        "source": best["source"],
+        "accepted": accepted,
+        # A document without a number is handled correctly if nothing is accepted
+        "correct": best["number"] == expected if expected else not accepted,
+        "stages": stages,
+    }
+
+
+def summarize(files):
+    """Aggregate per-file results
+    Returns:
+        dict with files, accuracy, found (share of numbered files whose number
+        is among some stage's candidates), false_accepts, by_kind and stages
+        (per stage: runs, accuracy of its top candidate, p50_ms and p95_ms)
+    """
+    numbered = [f for f in files if f["expected"]]
+    by_kind = defaultdict(list)
+    for f in files:
+        by_kind[f["kind"]].append(f["correct"])
+
+    stages = {}
+    for stage in ("text", "ocr"):
+        runs = [f for f in files if stage in f["stages"]]
+        if not runs:
+            continue
+        durations = [f["stages"][stage]["ms"] for f in runs]
+        labeled = [f for f in runs if f["expected"]]
+        stages[stage] = {
+            "runs": len(runs),
+            "accuracy": (sum(f["stages"][stage]["rank"] == 1 for f in labeled) / len(labeled)
+                         if labeled else None),
+            "p50_ms": percentile(durations, 0.5),
+            "p95_ms": percentile(durations, 0.95),
+        }
+    return {
+        "files": len(files),
+        "accuracy": sum(f["correct"] for f in files) / len(files) if files else None,
+        "found": (sum(any(s["rank"] for s in f["stages"].values()) for f in numbered) / len(numbered)
+                  if numbered else None),
+        "false_accepts": sum(f["accepted"] and not f["correct"] for f in files),
+        "by_kind": {kind: sum(results) / len(results) for kind, results in sorted(by_kind.items())},
+        "stages": stages,
+    }
+
+
+def run_harness(corpus_dir, ocr_mode="fallback", log=print):
+    """Evaluate every labeled file of a corpus folder
+    Returns:
+        run dict (revision, settings, summary and per-file results)
+    """
+    if ocr_mode != "off" and (not detection.OCR_AVAILABLE or detection.check_tesseract() is not None):
+        log("Tesseract is not available: OCR stages are skipped")
+        ocr_mode = "off"
+
+    files = []
+    for record in load_labels(corpus_dir):
+        result = evaluate_file(str(Path(corpus_dir) / record["name"]), record["number"], ocr_mode)
+        result.update(name=record["name"], kind=record["kind"], expected=record["number"])
+        files.append(result)
+        if not result["correct"]:
+            log(f"wrong: {record['name']} expected {record['number']}, got {result['number']} "
+                f"({result['source']}, {result['confidence']:.2f})")
+    return {
+        "revision": git_revision(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "settings": {"ocr": ocr_mode},
+        "summary": summarize(files),
+        "files": files,
+    }
+
+
+def check(baseline, current, max_accuracy_drop=MAX_ACCURACY_DROP,
+          max_latency_rise=MAX_LATENCY_RISE):
+    """Compare a run with a baseline run of the same corpus
+    Returns:
+        list of failure messages (empty if the run is acceptable)
+    """
+    failures = []
+    before, after = baseline["summary"], current["summary"]
+    if before["accuracy"] is not None and after["accuracy"] is not None \
+            and after["accuracy"] < before["accuracy"] - max_accuracy_drop:
+        failures.append(f"accuracy {before['accuracy']:.1%} -> {after['accuracy']:.1%}")
+    for kind, accuracy in after["by_kind"].items():
+        if kind in before["by_kind"] and accuracy < before["by_kind"][kind] - max_accuracy_drop:
+            failures.append(f"{kind} accuracy {before['by_kind'][kind]:.1%} -> {accuracy:.1%}")
+    if after["false_accepts"] > before["false_accepts"]:
+        failures.append(f"wrong numbers accepted {before['false_accepts']} -> {after['false_accepts']}")
+
+    was_correct = {f["name"] for f in baseline["files"] if f["correct"]}
+    newly_wrong = [f["name"] for f in current["files"] if not f["correct"] and f["name"] in was_correct]
+    if newly_wrong:
+        failures.append("newly wrong: " + ", ".join(newly_wrong))
+
+    for stage, timing in after["stages"].items():
+        previous = before["stages"].get(stage)
+        if previous is None:
+            continue
+        slowdown = timing["p50_ms"] - previous["p50_ms"]
+        if slowdown > LATENCY_MIN_MS and slowdown > previous["p50_ms"] * max_latency_rise:
+            failures.append(f"{stage} stage p50 {previous['p50_ms']:.1f} -> {timing['p50_ms']:.1f} ms")
+    return failures
+
+
+def format_summary(summary):
+    """Return the summary as printable lines"""
+    lines = [f"files {summary['files']}  accuracy {summary['accuracy']:.1%}  "
+             f"wrong numbers accepted {summary['false_accepts']}"]
+    if summary["found"] is not None:
+        lines.append(f"right number among the candidates: {summary['found']:.1%}")
+    for kind, accuracy in summary["by_kind"].items():
+        lines.append(f"  {kind:<12} {accuracy:.1%}")
+    for stage, timing in summary["stages"].items():
+        accuracy = f"{timing['accuracy']:.1%}" if timing["accuracy"] is not None else "-"
+        lines.append(f"  {stage} stage: {timing['runs']} runs, top candidate right {accuracy}, "
+                     f"p50 {timing['p50_ms']:.1f} ms, p95 {timing['p95_ms']:.1f} ms")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check detector accuracy and latency on a labeled corpus")
+    parser.add_argument("--corpus", help="Labeled folder (default: generate a synthetic corpus)")
+    parser.add_argument("--per-kind", type=int, default=10, help="Generated documents per kind")
+    parser.add_argument("--ocr", choices=OCR_MODES, default="fallback",
+                        help="Run OCR as a fallback (like the viewer), on every file, or never")
+    parser.add_argument("--output", help="Save the run as a JSON baseline")
+    parser.add_argument("--baseline", help="Fail if this run is worse than a saved baseline")
+    parser.add_argument("--max-accuracy-drop", type=float, default=MAX_ACCURACY_DROP)
+    parser.add_argument("--max-latency-rise", type=float, default=MAX_LATENCY_RISE)
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        current = run_harness(args.corpus, args.ocr)
+    else:
+        with tempfile.TemporaryDirectory() as corpus_dir:
+            synthetic_corpus.generate_corpus(corpus_dir, args.per_kind)
+            current = run_harness(corpus_dir, args.ocr)
+    print("\n".join(format_summary(current["summary"])))
+    if args.output:
+        Path(args.output).write_text(json.dumps(current, indent=1), encoding="utf-8")
+        print(f"Saved run to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if baseline.get("settings") != current["settings"]:
+            print(f"Note: the baseline was run with different settings ({baseline.get('settings')})")
+        failures = check(baseline, current, args.max_accuracy_drop, args.max_latency_rise)
+        for failure in failures:
+            print(f"FAIL {failure}")
+        if failures:
+            return 1
+        print(f"No regression against {baseline.get('revision') or args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,206 @@
-import tkinter as tk
-from tkinter import filedialog, messagebox, simpledialog, ttk
+import time
+
+STARTED = time.perf_counter()  # Reference point of the --profile-startup report
+
 from pathlib import Path
-import fitz  # PyMuPDF
-from PIL import Image, ImageTk
 import os
 import re
+import queue
+import threading
+from collections import OrderedDict
+
+from catalog import FolderCatalog, scan_folder
+from number_index import InspectionNumberIndex, list_tree_pdf_names
+from duplicates import find_duplicate_files
+from text_index import BackgroundIndexer, TextIndex
+import file_filter
+from file_filter import FileListModel
+from tree_walker import TreeWalker
+from page_layout import ZOOM_LEVELS, GridLayout, ListWindow, PageLayout
+from quarantine import Quarantine
+from supervisor import SupervisedPool, TaskFailed
+from scheduler import BULK, IO, PREFETCH, PREVIEW, SUGGESTION, Scheduler
+from startup import DeferredModule, StartupProfile, WarmUp
+import tracing
+
+# The PDF and imaging modules are imported on first use, or by a background
+# thread once the window is up, so they do not delay the first paint
+core = DeferredModule("core")
+detection = DeferredModule("detection")
+rendering = DeferredModule("rendering")
+render_service = DeferredModule("render_service")
+Image = DeferredModule("PIL.Image")
+ImageTk = DeferredModule("PIL.ImageTk")
+WARM_UP_MODULES = ("PIL.ImageTk", "core", "render_service")
+
+# Worker processes are spawned, which re-imports this module as __mp_main__. They
+# only run functions from the Tk-free modules (core, detection, rendering), so
+# they skip the GUI imports and start without loading Tk.
+if __name__ != "__mp_main__":
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, simpledialog, ttk
+    from tkinter import font as tkfont
+
+# Wall-clock limits (seconds) for work done in the supervised worker processes
+PREVIEW_TIMEOUT = 20
+EXTRACT_TIMEOUT = 60
+OCR_TIMEOUT = 180
+
+# The full-quality preview is rendered once the selection has stayed put this
+# long (ms); until then a cached or quickly rendered draft is shown
+PREVIEW_REFINE_DELAY = 120
+DRAFT_CACHE_SIZE = 64
+TILE_CACHE_SIZE = 256  # Zoom tiles kept (256 px tiles, about 64 MB in Tk)
+THUMBNAIL_CACHE_SIZE = 500  # Grid thumbnails kept (about 30 MB in Tk)
+THUMBNAIL_TIMEOUT = 20
+
+# Seconds a rename may take before the operator is told the share is not
+# responding; the rename runs on an I/O thread, so the window never waits for it
+FILE_OPERATION_TIMEOUT = 10
+
+# Spans broken out in the status bar timing readout
+TIMING_STAGES = ("read_file", "fitz.open", "get_text", "get_pixmap", "resize", "PhotoImage", "tesseract")
+
+# Numbered filter choices -> file_filter values
+NUMBERED_FILTERS = {
+    "הכל": file_filter.SHOW_ALL,
+    "ללא מספר בדיקה": file_filter.SHOW_UNNUMBERED,
+    "עם מספר בדיקה": file_filter.SHOW_NUMBERED,
+}
+
+# Sort choices -> file_filter sort modes
+SORT_MODES = {
+    "שם": file_filter.SORT_NAME,
+    "מיון טבעי": file_filter.SORT_NATURAL,
+    "תאריך שינוי": file_filter.SORT_MTIME,
+    "גודל": file_filter.SORT_SIZE,
+}
+
+# Depth limits offered for the recursive mode (first entry = unlimited)
+MAX_DEPTH_CHOICES = ("ללא הגבלה",) + tuple(str(depth) for depth in range(1, 21))
+
+# Background colors marking groups of identical files in the list
+DUPLICATE_COLORS = ["#FFF9C4", "#E1F5FE", "#F3E5F5", "#FFE0B2"]
+
+# Rows of the bulk rename before/after table; only these rows' names are computed
+BULK_PREVIEW_ROWS = 15
 
-# Try to import pytesseract, but make it optional
-try:
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-    pytesseract = None
+# Bulk rename problems -> description
+BULK_PROBLEMS = {
+    "empty": "התבנית לא יצרה שם תקין",
+    "duplicate": "אותו שם חדש לכמה קבצים",
+    "exists": "קיים כבר קובץ בשם זה",
+}
 
 class PDFViewerApp:
-    def __init__(self, root):
+    def __init__(self, root, profile=None):
+        """
+        Args:
+            profile: Optional StartupProfile that records the startup milestones
+        """
         self.root = root
+        self.profile = profile
         self.root.title("מציג ומשנה שמות PDF")
         self.root.geometry("1200x700")
         
         self.current_folder = None
-        self.pdf_files = []
         self.selected_pdf = None
-        self.current_preview_image = None
+        self.page_layout = None  # PageLayout of the previewed document
+        self.page_path = None  # Path of the previewed document
+        self.page_images = {}  # Page number -> (PhotoImage, canvas item, quality)
+        self.page_requests = {}  # Page number -> pending render future
+        self.viewport_after_id = None
+        self.page_sizes = []  # Fit-to-width page sizes of the previewed document
+        self.page_points = []  # Page sizes in points, for the render zoom
+        self.zoom_index = 0  # Index into ZOOM_LEVELS
+        self.tile_cache = OrderedDict()  # (path, page, zoom, column, row) -> PhotoImage
+        self.tile_items = {}  # Tile key -> canvas item of the tiles on screen
+        self.tile_requests = {}  # Tile key -> pending render future
+        self.pdf_entries = []  # FileEntry of every listed file, in list order
+        self.list_rows = {}  # Name -> row of pdf_entries
+        self.list_window = ListWindow()  # Rows of the list shown in the listbox
+        self.list_selection = set()  # Selected rows of the whole list
+        self.list_anchor = None  # Row a shift-click extends the selection from
+        self.list_active = None  # Row last clicked or moved to, the one previewed
+        self.grid_layout = None
+        self.grid_items = {}  # Cell index -> (frame, image, label) canvas items
+        self.grid_after_id = None
+        self.thumbnail_cache = OrderedDict()  # (path, mtime_ns) -> PhotoImage, least recent first
+        self.thumbnail_requests = {}  # (path, mtime_ns) -> pending render future
+        self.thumbnail_failed = set()  # Keys whose thumbnail could not be rendered
+        self.catalog = None
+        self.walker = None
+        self.number_index = None
+        self.index_results = queue.Queue()
+        self.duplicate_groups = []  # Lists of paths with identical content
+        self.duplicate_of = {}  # Path -> its duplicate group
+        self.duplicate_colors = {}  # Path -> list background color of its group
+        self.text_index = None
+        self.indexer = None
+        self.search_matches = None  # Names matching the content search, None when not searching
+        self.numbered_names = None  # (numbered filter, search matches, allowed names) from the catalog
+        self.search_after_id = None
+        self.resume_indexing_id = None
+        self.file_model = FileListModel()
+        # Rendering and extraction run in supervised processes so a pathological
+        # PDF cannot freeze the window
+        self.worker_pool = SupervisedPool(workers=2)
+        # All background work is queued by priority class: the previewed file
+        # first, then the rename suggestion, thumbnails and bulk work
+        self.scheduler = Scheduler(self.worker_pool)
+        self.background_pauses = 0  # Open dialogs holding prefetch and bulk work
+        # Preview pages and the OCR region share one cache of rendered rasters
+        # (created on first use, as it needs the PDF modules)
+        self.render_service = None
+        self.warm_up = None
+        self.tesseract_probe = None  # WarmUp running check_tesseract, the OCR button waits for it
+        self.ocr_after_id = None
+        self.quarantine = Quarantine()
+        self.preview_request = None
+        self.refine_request = None
+        self.refine_after_id = None
+        self.draft_cache = OrderedDict()  # (path, (size, mtime_ns)) -> draft, least recent first
+        self.refined_path = None  # Document whose sharp pages may be rendered
+        self.preview_error_path = None
+        self.preview_started = None  # (path, perf_counter_ns) of the preview being timed
+        self.timings = {}  # Readout label -> (total ms, stage ms), shown while tracing
         
         self.setup_ui()
+        if self.profile:
+            self.profile.mark("window built")
+        
+        # Idle callbacks run after Tk has drawn the window
+        self.root.after_idle(self.start_warm_up)
+    
+    def start_warm_up(self):
+        """Import the PDF modules and probe Tesseract in the background"""
+        if self.profile:
+            self.profile.mark("first paint")
+        self.warm_up = WarmUp(WARM_UP_MODULES, [
+            lambda: detection.OCR_AVAILABLE and detection.check_tesseract(),
+        ], profile=self.profile).start()
+        self.tesseract_probe = self.warm_up
+        if self.profile:
+            self.root.after(20, self.finish_startup_profile)
+    
+    def finish_startup_profile(self):
+        """Print the startup milestones once warm-up and a worker round trip are done"""
+        if not self.warm_up.done.is_set():
+            self.root.after(20, self.finish_startup_profile)
+            return
+        self.worker_pool.submit(os.getpid).result(timeout=60)
+        self.profile.mark("worker ready")
+        print("\n".join(self.profile.report()))
+        for error in self.warm_up.errors:
+            print(f"warm-up error: {error}")
+        self.root.destroy()
+    
+    def get_render_service(self):
+        """Return the shared render service, creating it on first use"""
+        if self.render_service is None:
+            self.render_service = render_service.RenderService(self.scheduler,
+                                                                timeout=PREVIEW_TIMEOUT)
+        return self.render_service
         
     def setup_ui(self):
         """Create the user interface"""
@@ -43,6 +218,33 @@ class PDFViewerApp:
                                      font=("Arial", 10), fg="gray")
         self.folder_label.pack(side=tk.RIGHT, padx=10)
         
+        # Recursive mode: include subfolders, limited by depth and a file name glob
+        self.recursive_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(top_frame, text="כולל תת-תיקיות", variable=self.recursive_var,
+                      font=("Arial", 10), command=self.reopen_folder).pack(side=tk.LEFT, padx=5)
+        tk.Label(top_frame, text="עומק:", font=("Arial", 10)).pack(side=tk.LEFT)
+        self.max_depth_spinbox = tk.Spinbox(top_frame, values=MAX_DEPTH_CHOICES, width=10,
+                                            font=("Arial", 10), state="readonly",
+                                            command=self.on_walk_options_change)
+        self.max_depth_spinbox.pack(side=tk.LEFT, padx=5)
+        tk.Label(top_frame, text="תבנית:", font=("Arial", 10)).pack(side=tk.LEFT)
+        self.glob_var = tk.StringVar(value="*.pdf")
+        glob_entry = tk.Entry(top_frame, textvariable=self.glob_var, width=12, font=("Arial", 10))
+        glob_entry.pack(side=tk.LEFT, padx=5)
+        glob_entry.bind('<Return>', lambda e: self.on_walk_options_change())
+        
+        # Status bar: timing readout of the last preview and extraction while tracing
+        status_frame = tk.Frame(self.root, relief=tk.SUNKEN, bd=1)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        self.tracing_var = tk.BooleanVar(value=tracing.tracer.enabled)
+        tk.Checkbutton(status_frame, text="מדידת זמנים", variable=self.tracing_var,
+                      font=("Arial", 9), command=self.toggle_tracing).pack(side=tk.RIGHT)
+        tk.Button(status_frame, text="ייצוא מדידות...", font=("Arial", 9),
+                 command=self.export_trace).pack(side=tk.RIGHT, padx=5)
+        self.timing_label = tk.Label(status_frame, text="", font=("Arial", 9), fg="#555555",
+                                     anchor=tk.W)
+        self.timing_label.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        
         # Main content - use PanedWindow for resizable columns
         self.paned_window = tk.PanedWindow(self.root, orient=tk.HORIZONTAL, sashrelief=tk.RAISED, sashwidth=5)
         self.paned_window.pack(side=tk.TOP, fill=tk.BOTH, expand=True, padx=10, pady=5)
@@ -52,22 +254,88 @@ class PDFViewerApp:
         
         tk.Label(right_frame, text="קבצי PDF", font=("Arial", 12, "bold")).pack(pady=5)
         
+        # Name filter, numbered filter and sort order over the in-memory file list
+        filter_frame = tk.Frame(right_frame)
+        filter_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        tk.Label(filter_frame, text="סינון לפי שם:", font=("Arial", 10)).pack(side=tk.RIGHT)
+        self.name_filter_var = tk.StringVar()
+        self.name_filter_var.trace_add("write", lambda *args: self.refresh_file_list())
+        self.name_filter_entry = tk.Entry(filter_frame, textvariable=self.name_filter_var,
+                                          font=("Arial", 11), justify=tk.RIGHT)
+        self.name_filter_entry.pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
+        self.regex_filter_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(filter_frame, text="ביטוי רגולרי", variable=self.regex_filter_var,
+                      font=("Arial", 9), command=self.refresh_file_list).pack(side=tk.RIGHT)
+        
+        options_frame = tk.Frame(right_frame)
+        options_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        tk.Label(options_frame, text="הצג:", font=("Arial", 10)).pack(side=tk.RIGHT)
+        self.numbered_filter_combo = ttk.Combobox(options_frame, state="readonly", width=16,
+                                                  values=list(NUMBERED_FILTERS))
+        self.numbered_filter_combo.current(0)
+        self.numbered_filter_combo.pack(side=tk.RIGHT, padx=5)
+        self.numbered_filter_combo.bind("<<ComboboxSelected>>", lambda e: self.on_filter_change())
+        tk.Label(options_frame, text="מיון:", font=("Arial", 10)).pack(side=tk.RIGHT)
+        self.sort_combo = ttk.Combobox(options_frame, state="readonly", width=14,
+                                       values=list(SORT_MODES))
+        self.sort_combo.current(0)
+        self.sort_combo.pack(side=tk.RIGHT, padx=5)
+        self.sort_combo.bind("<<ComboboxSelected>>", lambda e: self.on_filter_change())
+        self.grid_view_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options_frame, text="תצוגת רשת", variable=self.grid_view_var,
+                      font=("Arial", 9), command=self.toggle_grid_view).pack(side=tk.LEFT)
+        
+        # Full-text search over the content of the folder's PDFs
+        search_frame = tk.Frame(right_frame)
+        search_frame.pack(fill=tk.X, padx=5, pady=(0, 5))
+        tk.Label(search_frame, text="חיפוש בתוכן:", font=("Arial", 10)).pack(side=tk.RIGHT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add("write", self.on_search_change)
+        tk.Entry(search_frame, textvariable=self.search_var, font=("Arial", 11),
+                justify=tk.RIGHT).pack(side=tk.RIGHT, fill=tk.X, expand=True, padx=5)
+        
         # Listbox with scrollbar
-        list_frame = tk.Frame(right_frame)
-        list_frame.pack(fill=tk.BOTH, expand=True)
+        self.list_frame = tk.Frame(right_frame)
+        self.list_frame.pack(fill=tk.BOTH, expand=True)
         
-        scrollbar = tk.Scrollbar(list_frame)
-        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.list_scrollbar = tk.Scrollbar(self.list_frame, command=self.on_list_scroll)
+        self.list_scrollbar.pack(side=tk.LEFT, fill=tk.Y)
         
-        # Create listbox with increased line spacing and custom styling
-        self.pdf_listbox = tk.Listbox(list_frame, yscrollcommand=scrollbar.set, 
-                                      font=("Arial", 13), selectmode=tk.SINGLE,
+        # Create listbox with increased line spacing and custom styling. It only holds
+        # the rows in view: scrolling and selection are handled over the whole list here.
+        self.pdf_listbox = tk.Listbox(self.list_frame, font=("Arial", 13),
+                                      selectmode=tk.EXTENDED, exportselection=False,
                                       height=15,  # Set initial height for better spacing
                                       activestyle='none')  # Remove default selection highlight
         self.pdf_listbox.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
-        self.pdf_listbox.bind('<<ListboxSelect>>', self.on_pdf_select)
-        
-        scrollbar.config(command=self.pdf_listbox.yview)
+        self.list_row_height = tkfont.Font(font=self.pdf_listbox.cget("font")).metrics("linespace") + 1
+        self.pdf_listbox.bind("<Configure>", self.on_list_resize)
+        self.pdf_listbox.bind("<Button-1>", lambda e: self.on_list_click(e, "set"))
+        self.pdf_listbox.bind("<Control-Button-1>", lambda e: self.on_list_click(e, "toggle"))
+        self.pdf_listbox.bind("<Shift-Button-1>", lambda e: self.on_list_click(e, "extend"))
+        self.pdf_listbox.bind("<B1-Motion>", lambda e: self.on_list_click(e, "extend"))
+        self.pdf_listbox.bind("<B1-Leave>", lambda e: "break")  # No auto-scan of the few rows held
+        for key, step in (("Up", -1), ("Down", 1), ("Prior", "page-"), ("Next", "page+"),
+                          ("Home", "first"), ("End", "last")):
+            self.pdf_listbox.bind(f"<{key}>", lambda e, step=step: self.on_list_key(step, False))
+            self.pdf_listbox.bind(f"<Shift-{key}>", lambda e, step=step: self.on_list_key(step, True))
+        self.pdf_listbox.bind("<MouseWheel>", lambda e: self.scroll_list(-3 if e.delta > 0 else 3))
+        self.pdf_listbox.bind("<Button-4>", lambda e: self.scroll_list(-3))
+        self.pdf_listbox.bind("<Button-5>", lambda e: self.scroll_list(3))
+        
+        # Thumbnail grid, shown instead of the listbox; only the visible cells exist
+        self.grid_frame = tk.Frame(right_frame)
+        self.grid_scrollbar = tk.Scrollbar(self.grid_frame)
+        self.grid_scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.grid_canvas = tk.Canvas(self.grid_frame, bg="white", yscrollcommand=self.on_grid_scroll)
+        self.grid_canvas.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        self.grid_canvas.bind("<Configure>", self.on_grid_resize)
+        self.grid_canvas.bind("<Button-1>", self.on_grid_click)
+        self.grid_canvas.bind("<MouseWheel>", lambda e: self.grid_canvas.yview_scroll(
+            -1 if e.delta > 0 else 1, "units"))
+        self.grid_canvas.bind("<Button-4>", lambda e: self.grid_canvas.yview_scroll(-1, "units"))
+        self.grid_canvas.bind("<Button-5>", lambda e: self.grid_canvas.yview_scroll(1, "units"))
+        self.grid_scrollbar.config(command=self.grid_canvas.yview)
         
         # Rename buttons
         button_frame = tk.Frame(right_frame)
@@ -83,6 +351,26 @@ class PDFViewerApp:
                  bg="#F57C00", fg="white", pady=8, relief=tk.RAISED, bd=3,
                  activebackground="#E64A19", activeforeground="white").pack(fill=tk.X, pady=3)
         
+        tk.Button(button_frame, text="שינוי שם מרובה...", 
+                 command=self.bulk_rename, font=("Arial", 10), 
+                 bg="#FFB74D", fg="black", pady=5, relief=tk.RAISED, bd=2,
+                 activebackground="#FFA726", activeforeground="black").pack(fill=tk.X, pady=3)
+        
+        tk.Button(button_frame, text="חיפוש קבצים זהים", 
+                 command=self.find_duplicate_files, font=("Arial", 10), 
+                 bg="#607D8B", fg="white", pady=5, relief=tk.RAISED, bd=2,
+                 activebackground="#546E7A", activeforeground="white").pack(fill=tk.X, pady=3)
+        
+        tk.Button(button_frame, text="דוח מספרי בדיקה כפולים", 
+                 command=self.show_duplicate_numbers_report, font=("Arial", 10), 
+                 bg="#607D8B", fg="white", pady=5, relief=tk.RAISED, bd=2,
+                 activebackground="#546E7A", activeforeground="white").pack(fill=tk.X, pady=3)
+        
+        tk.Button(button_frame, text="ייצוא רשימת קבצים...", 
+                 command=self.export_manifest, font=("Arial", 10), 
+                 bg="#607D8B", fg="white", pady=5, relief=tk.RAISED, bd=2,
+                 activebackground="#546E7A", activeforeground="white").pack(fill=tk.X, pady=3)
+        
         # Text extraction buttons (hidden for now, code kept for future use)
         # tk.Button(button_frame, text="חילוץ טקסט", 
         #          command=self.extract_text, font=("Arial", 10), 
@@ -107,6 +395,14 @@ class PDFViewerApp:
                                       bg="#E8F5E9", fg="#666666")
         self.filename_label.pack(pady=(0, 5))
         
+        # Zoom controls (Ctrl+wheel on the preview does the same)
+        zoom_frame = tk.Frame(header_frame, bg="#E8F5E9")
+        zoom_frame.pack(pady=(0, 5))
+        tk.Button(zoom_frame, text="+", width=2, command=lambda: self.change_zoom(1)).pack(side=tk.RIGHT)
+        self.zoom_label = tk.Label(zoom_frame, text="100%", width=6, bg="#E8F5E9")
+        self.zoom_label.pack(side=tk.RIGHT)
+        tk.Button(zoom_frame, text="−", width=2, command=lambda: self.change_zoom(-1)).pack(side=tk.RIGHT)
+        
         # Horizontal separator
         separator = ttk.Separator(left_frame, orient='horizontal')
         separator.pack(fill=tk.X, padx=10, pady=5)
@@ -115,14 +411,34 @@ class PDFViewerApp:
         preview_frame = tk.Frame(left_frame, bg="white")
         preview_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
-        preview_scrollbar = tk.Scrollbar(preview_frame)
-        preview_scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        self.preview_scrollbar = tk.Scrollbar(preview_frame)
+        self.preview_scrollbar.pack(side=tk.LEFT, fill=tk.Y)
         
+        self.preview_xscrollbar = tk.Scrollbar(preview_frame, orient=tk.HORIZONTAL)
+        self.preview_xscrollbar.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        # Pages are rendered as they scroll into view
         self.preview_canvas = tk.Canvas(preview_frame, bg="white", 
-                                       yscrollcommand=preview_scrollbar.set)
+                                       yscrollcommand=self.on_preview_scroll,
+                                       xscrollcommand=self.on_preview_xscroll)
         self.preview_canvas.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
-        
-        preview_scrollbar.config(command=self.preview_canvas.yview)
+        self.preview_canvas.bind("<Configure>", self.schedule_visible_pages)
+        self.preview_canvas.bind("<MouseWheel>", lambda e: self.preview_canvas.yview_scroll(
+            -1 if e.delta > 0 else 1, "units"))
+        self.preview_canvas.bind("<Button-4>", lambda e: self.preview_canvas.yview_scroll(-1, "units"))
+        self.preview_canvas.bind("<Button-5>", lambda e: self.preview_canvas.yview_scroll(1, "units"))
+        
+        # Ctrl+wheel zooms around the cursor, dragging pans
+        self.preview_canvas.bind("<Control-MouseWheel>", lambda e: self.change_zoom(
+            1 if e.delta > 0 else -1, e.x, e.y))
+        self.preview_canvas.bind("<Control-Button-4>", lambda e: self.change_zoom(1, e.x, e.y))
+        self.preview_canvas.bind("<Control-Button-5>", lambda e: self.change_zoom(-1, e.x, e.y))
+        self.preview_canvas.bind("<ButtonPress-1>", lambda e: self.preview_canvas.scan_mark(e.x, e.y))
+        self.preview_canvas.bind("<B1-Motion>", lambda e: self.preview_canvas.scan_dragto(
+            e.x, e.y, gain=1))
+        
+        self.preview_scrollbar.config(command=self.preview_canvas.yview)
+        self.preview_xscrollbar.config(command=self.preview_canvas.xview)
         
         self.preview_label = tk.Label(self.preview_canvas, text="בחר קובץ PDF לתצוגה מקדימה", 
                                      font=("Arial", 14), fg="gray", bg="white")
@@ -143,115 +459,1134 @@ class PDFViewerApp:
         folder_path = filedialog.askdirectory(title="בחר תיקייה עם קבצי PDF")
         
         if folder_path:
-            self.current_folder = Path(folder_path)
-            self.folder_label.config(text=f"תיקייה: {folder_path}")
-            self.load_pdf_files()
+            self.open_folder(folder_path)
+    
+    def open_folder(self, folder_path):
+        """Show a folder: catalog contents first, then reconcile with the disk"""
+        # A walk of the previous root is no longer needed
+        if self.walker:
+            self.walker.cancel()
+            self.walker = None
+        
+        # Resolved once, so listed paths key the quarantine without touching the share
+        self.current_folder = Path(folder_path).resolve()
+        self.folder_label.config(text=f"תיקייה: {folder_path}")
+        self.open_catalog()
+        # Show what the catalog already knows, then reconcile with the disk
+        self.load_pdf_files()
+        if self.recursive_var.get():
+            self.start_tree_walk()
+        else:
+            self.start_folder_scan()
+    
+    def reopen_folder(self):
+        """Reload the current folder after the recursive mode was toggled"""
+        if self.current_folder:
+            self.open_folder(self.current_folder)
+    
+    def on_walk_options_change(self):
+        """Walk the tree again with the new depth or glob limits"""
+        if self.current_folder and self.recursive_var.get():
+            self.open_folder(self.current_folder)
+    
+    def catalog_key(self, path):
+        """Return the catalog key of a file: its path relative to the current folder"""
+        return Path(path).relative_to(self.current_folder).as_posix()
+    
+    def file_identity(self, path):
+        """Return (size, mtime_ns) of a listed file as the catalog recorded it, or None"""
+        index = self.file_model.positions.get(self.catalog_key(path))
+        if index is None:
+            return None
+        entry = self.file_model.entries[index]
+        return entry.size, entry.mtime_ns
+    
+    def open_catalog(self):
+        """Open the catalog of the current folder, closing the previous one"""
+        if self.indexer:
+            self.indexer.stop()
+            self.indexer = None
+        if self.text_index:
+            self.text_index.close()
+        if self.catalog:
+            self.catalog.close()
+        self.catalog = FolderCatalog(self.current_folder, recursive=self.recursive_var.get())
+        self.text_index = TextIndex(self.catalog.db_path)
+        self.search_matches = None
+        self.search_var.set("")
+        self.set_duplicate_groups([])
+        if self.number_index is None:
+            self.number_index = InspectionNumberIndex()
+    
+    def start_folder_scan(self):
+        """List the current folder in a background thread"""
+        folder = self.current_folder
+        catalog = self.catalog
+        
+        def scan():
+            with tracing.span("listdir", folder=str(folder)):
+                return scan_folder(folder)
+        
+        def on_error(error):
+            if catalog is self.catalog:
+                messagebox.showerror("שגיאה בקריאת תיקייה", 
+                                   f"לא ניתן לקרוא את התיקייה:\n{str(error)}",
+                                   parent=self.root)
+        
+        def on_listed(entries):
+            if catalog is not self.catalog:
+                return  # Result of a folder that is no longer shown
+            
+            if self.catalog.reconcile(entries):
+                self.load_pdf_files(clear_preview=False)
+            
+            self.number_index.index_folder(folder, entries)
+            self.start_sibling_index(folder)
+            self.finish_folder_listing(entries)
+        
+        # The listing of the shown folder is foreground work
+        self.deliver(self.scheduler.submit(scan, priority=PREVIEW, lane=IO, key=str(folder)),
+                     on_listed, on_error, poll_ms=50)
+    
+    def start_tree_walk(self):
+        """Walk the current folder tree in parallel, streaming files into the list"""
+        folder = self.current_folder
+        depth = self.max_depth_spinbox.get()
+        walker = TreeWalker(folder,
+                            max_depth=None if depth == MAX_DEPTH_CHOICES[0] else int(depth),
+                            pattern=self.glob_var.get().strip() or "*.pdf")
+        self.walker = walker
+        seen = {}
+        
+        def poll():
+            if walker is not self.walker:
+                return  # Cancelled: a different root was chosen
+            
+            changed = False
+            finished = False
+            while True:
+                try:
+                    batch = walker.results.get_nowait()
+                except queue.Empty:
+                    break
+                if batch is None:
+                    finished = True
+                    break
+                rel_dir, files = batch
+                seen.update(files)
+                self.catalog.merge(files)
+                # Only the batch is added to the list; the rows in view are redrawn once per poll
+                if self.file_model.add_entries(
+                        (name, size, mtime_ns, None) for name, (size, mtime_ns) in files.items()):
+                    changed = True
+                    self.numbered_names = None
+                self.number_index.index_folder(folder / rel_dir,
+                                               [name.rsplit("/", 1)[-1] for name in files])
+            
+            # Drop cataloged files that were not found anywhere in the tree
+            if finished and self.catalog.reconcile(seen):
+                self.load_pdf_files(clear_preview=False)
+            elif changed:
+                self.refresh_file_list()
+            
+            if finished:
+                self.walker = None
+                self.finish_folder_listing(seen)
+            else:
+                self.root.after(300, poll)
+        
+        walker.start()
+        self.root.after(100, poll)
+    
+    def finish_folder_listing(self, entries):
+        """Start content indexing once the folder listing is complete"""
+        # Index file contents for search in a low-priority background process
+        if self.text_index.pending(entries):
+            self.indexer = BackgroundIndexer(self.catalog.db_path, self.current_folder, entries)
+        
+        if not self.catalog.count():
+            messagebox.showinfo("לא נמצאו קבצי PDF", 
+                              "לא נמצאו קבצי PDF בתיקייה שנבחרה.",
+                              parent=self.root)
+    
+    def start_sibling_index(self, folder):
+        """Index inspection numbers of the sibling folders as bulk background work"""
+        def scan():
+            listings = []
+            try:
+                for sibling in folder.parent.iterdir():
+                    if sibling != folder and sibling.is_dir():
+                        try:
+                            listings.append((sibling, scan_folder(sibling)))
+                        except OSError:
+                            continue  # Unreadable sibling, skip it
+            except OSError:
+                pass
+            self.index_results.put(listings)
+        
+        self.scheduler.submit(scan, priority=BULK, lane=IO)
+        self.root.after(100, self.poll_sibling_index)
+    
+    def poll_sibling_index(self):
+        """Apply finished sibling folder listings to the inspection number index"""
+        try:
+            listings = self.index_results.get_nowait()
+        except queue.Empty:
+            self.root.after(100, self.poll_sibling_index)
+            return
+        
+        for sibling, entries in listings:
+            self.number_index.index_folder(sibling, entries)
+    
+    def on_search_change(self, *args):
+        """Debounce typing in the search box"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(150, self.apply_search)
+    
+    def apply_search(self):
+        """Filter the list to files whose content matches the search box"""
+        self.search_after_id = None
+        query = self.search_var.get().strip()
+        if query and self.text_index:
+            self.search_matches = self.text_index.search(query)
+        else:
+            self.search_matches = None
+        self.refresh_file_list()
+    
+    def pause_indexing(self, duration=500):
+        """Pause the background indexer for a short while (milliseconds)"""
+        if not self.indexer:
+            return
+        self.indexer.pause()
+        if self.resume_indexing_id:
+            self.root.after_cancel(self.resume_indexing_id)
+        self.resume_indexing_id = self.root.after(duration, self.resume_indexing)
+    
+    def resume_indexing(self):
+        """Let the background indexer continue (unless a dialog holds background work)"""
+        self.resume_indexing_id = None
+        if self.indexer and not self.background_pauses:
+            self.indexer.resume()
+    
+    def pause_background(self):
+        """Hold prefetch and bulk work, including indexing, while a dialog is open"""
+        self.background_pauses += 1
+        self.scheduler.pause()
+        if self.indexer:
+            self.indexer.pause()
+    
+    def resume_background(self):
+        """Undo pause_background() once the dialog is closed"""
+        self.background_pauses -= 1
+        self.scheduler.resume()
+        if not self.background_pauses and not self.resume_indexing_id:
+            self.resume_indexing()
+    
+    def on_filter_change(self):
+        """Re-filter the list when the numbered filter or sort order changes"""
+        self.refresh_file_list()
+    
+    def on_file_renamed(self, old_path, new_path):
+        """Carry what is known about a file over to its new name"""
+        # Queued work for the old name would fail or describe a file that is gone
+        self.scheduler.cancel_key(str(old_path))
+        old_key, new_key = self.catalog_key(old_path), self.catalog_key(new_path)
+        if self.catalog:
+            self.catalog.rename(old_key, new_key)
+            self.numbered_names = None
+        self.file_model.rename_entry(old_key, new_key)
+        if self.number_index:
+            self.number_index.rename(old_path, new_path)
+        if self.text_index:
+            self.text_index.rename(old_key, new_key)
+        if self.search_matches is not None and old_key in self.search_matches:
+            self.search_matches.add(new_key)
+        group = self.duplicate_of.pop(old_path, None)
+        if group is not None:
+            group[group.index(old_path)] = new_path
+            self.duplicate_of[new_path] = group
+            self.duplicate_colors[new_path] = self.duplicate_colors.pop(old_path)
+        # A rename keeps the modification time, so the thumbnail stays valid
+        for key in [key for key in self.thumbnail_cache if key[0] == old_path]:
+            self.thumbnail_cache[(new_path, key[1])] = self.thumbnail_cache.pop(key)
+        # Drafts of a file the rename replaced describe pages that are gone
+        for key in [key for key in self.draft_cache if key[0] == new_path]:
+            del self.draft_cache[key]
+        for key in [key for key in self.draft_cache if key[0] == old_path]:
+            self.draft_cache[(new_path, key[1])] = self.draft_cache.pop(key)
+    
+    def find_duplicate_files(self):
+        """Hash the folder's files in a background thread and mark identical copies"""
+        if not self.catalog:
+            messagebox.showwarning("לא נבחרה תיקייה", 
+                                  "אנא בחר תיקייה תחילה.",
+                                  parent=self.root)
+            return
+        
+        folder = self.current_folder
+        paths = [folder / name for name in self.catalog.files()]
+        
+        def on_hashed(groups):
+            if folder != self.current_folder:
+                return  # Folder changed while hashing
+            self.set_duplicate_groups(groups)
+            self.show_list_rows()  # Only the row colors change
+            copies = sum(len(group) - 1 for group in groups)
+            messagebox.showinfo("קבצים זהים", 
+                              f"נמצאו {len(groups)} קבוצות של קבצים זהים ({copies} עותקים).",
+                              parent=self.root)
+        
+        def on_error(error):
+            messagebox.showerror("שגיאה", f"חיפוש קבצים זהים נכשל:\n{str(error)}",
+                               parent=self.root)
+        
+        # Requested by the operator, so it runs ahead of prefetch and bulk work
+        self.deliver(self.scheduler.submit(find_duplicate_files, paths, priority=SUGGESTION,
+                                           lane=IO),
+                     on_hashed, on_error, poll_ms=100)
+    
+    def set_duplicate_groups(self, groups):
+        """Replace the known groups of identical files"""
+        self.duplicate_groups = groups
+        self.duplicate_of = {path: group for group in groups for path in group}
+        self.duplicate_colors = {path: DUPLICATE_COLORS[i % len(DUPLICATE_COLORS)]
+                                 for i, group in enumerate(groups) for path in group}
+    
+    def rename_identical_copies(self, original_path, inspection_num):
+        """Offer to prepend the same inspection number to identical copies of a file"""
+        group = self.duplicate_of.get(original_path)
+        if group is None:
+            return
+        copies = [p for p in group if p != original_path and not self.has_inspection_number(p.name)]
+        if not copies:
+            return
+        if not messagebox.askyesno("קבצים זהים", 
+                                  f"נמצאו {len(copies)} עותקים זהים לקובץ זה.\n"
+                                  f"להוסיף גם להם את מספר הבדיקה {inspection_num}?",
+                                  parent=self.root):
+            return
+        
+        record = self.catalog.get(self.catalog_key(original_path)) if self.catalog else None
+        
+        def on_renamed(renamed):
+            for old_path, new_path in renamed:
+                self.on_file_renamed(old_path, new_path)
+                # Identical content, so the detection result applies as-is
+                if record and record["numbers"]:
+                    self.catalog.record_detection(self.catalog_key(new_path), record["numbers"],
+                                                  record["confidence"], record["source"])
+            if renamed:
+                self.refresh_file_list()
+        
+        def on_error(error):
+            messagebox.showerror("שגיאה בשינוי שם", f"לא ניתן לשנות את שמות העותקים:\n{error}",
+                                 parent=self.root)
+        
+        # Copies whose new name is taken are skipped: never overwrite silently in a batch
+        self.run_file_operation(core.rename_copies, (copies, inspection_num), on_renamed, on_error)
+    
+    def reselect_current_file(self):
+        """Select the current file in the list again, if it is listed"""
+        index = self.list_row_of(self.selected_pdf)
+        if index is not None:
+            self.list_selection = {index}
+            self.list_anchor = self.list_active = index
+            self.list_window.see(index)
+            self.show_list_rows()
+            if self.grid_layout:
+                self.see_grid_cell(index)
+        else:
+            self.list_selection = set()
+            self.list_anchor = self.list_active = None
+            self.show_list_rows()
+    
+    def listed_path(self, index):
+        """Return the path of a row of the list"""
+        return self.current_folder / self.pdf_entries[index].name
+    
+    def list_row_of(self, path):
+        """Return the row of a file in the list, or None if it is not listed"""
+        if path is None:
+            return None
+        try:
+            name = self.catalog_key(path)
+        except ValueError:
+            return None  # Outside the current folder
+        return self.list_rows.get(name)
     
     def has_inspection_number(self, filename):
         """Check if filename already has an inspection number pattern"""
-        # Pattern: starts with digits followed by underscore
-        import re
-        pattern = r'^\d+_.*\.pdf$'
-        return bool(re.match(pattern, filename))
+        return file_filter.has_inspection_number(filename)
     
     def load_pdf_files(self, clear_preview=True):
-        """Load all PDF files from the selected folder
+        """Load the PDF files of the selected folder from its catalog
         Args:
             clear_preview: Whether to clear the preview (True for folder changes, False for refreshes)
         """
-        if not self.current_folder:
+        if not self.current_folder or not self.catalog:
             return
         
-        self.pdf_files = sorted([f for f in self.current_folder.iterdir() 
-                                if f.suffix.lower() == '.pdf'])
-        
-        # Update listbox with conditional styling
-        self.pdf_listbox.delete(0, tk.END)
-        for pdf_file in self.pdf_files:
-            self.pdf_listbox.insert(tk.END, pdf_file.name)
-        
-        # Apply conditional styling after all items are inserted
-        for i, pdf_file in enumerate(self.pdf_files):
-            if self.has_inspection_number(pdf_file.name):
-                # Files with inspection numbers get green text
-                self.pdf_listbox.itemconfig(i, {'fg': '#2E7D32'})  # Dark green
-            else:
-                # Files without inspection numbers get default black text
-                self.pdf_listbox.itemconfig(i, {'fg': '#000000'})
+        with tracing.span("load_pdf_files"):
+            self.file_model.set_entries(self.catalog.entries())
+            self.numbered_names = None
+            self.refresh_file_list()
         
         # Only clear preview when explicitly requested (e.g., folder change)
         if clear_preview:
             self.filename_label.config(text="")
-            self.preview_canvas.delete("all")
+            self.cancel_page_renders()
+            self.reset_page_view()
             self.preview_label = tk.Label(self.preview_canvas, text="בחר קובץ PDF לתצוגה מקדימה", 
                                          font=("Arial", 14), fg="gray", bg="white")
             self.preview_canvas.create_window(400, 300, window=self.preview_label)
+    
+    def refresh_file_list(self):
+        """Apply the current filters and sort order to the file list"""
+        if not self.current_folder:
+            return
         
-        if not self.pdf_files:
-            messagebox.showinfo("לא נמצאו קבצי PDF", 
-                              "לא נמצאו קבצי PDF בתיקייה שנבחרה.",
+        entries = self.file_model.query(
+            self.name_filter_var.get(),
+            use_regex=self.regex_filter_var.get(),
+            sort_mode=SORT_MODES[self.sort_combo.get()],
+            allowed_names=self.allowed_names(NUMBERED_FILTERS[self.numbered_filter_combo.get()]))
+        
+        # Invalid regular expression: mark the entry and keep the current list
+        if entries is None:
+            self.name_filter_entry.config(bg="#FFCDD2")
+            return
+        self.name_filter_entry.config(bg="white")
+        
+        self.pdf_entries = entries
+        self.list_rows = {entry.name: index for index, entry in enumerate(entries)}
+        self.list_window.resize(count=len(entries))
+        
+        if self.grid_view_var.get():
+            self.build_grid()
+        self.reselect_current_file()
+    
+    def allowed_names(self, numbered):
+        """Return the names the numbered filter and the content search leave, or None
+        The numbered filter is answered by the catalog's (is_numbered, name) index.
+        The set is kept until the catalog changes, so typing in the name filter
+        reuses it (and narrows the previous result).
+        """
+        if numbered is file_filter.SHOW_ALL or not self.catalog:
+            return self.search_matches
+        cached = self.numbered_names
+        if cached is None or cached[0] != numbered or cached[1] is not self.search_matches:
+            names = set(self.catalog.files(unnumbered_only=not numbered, numbered_only=numbered))
+            if self.search_matches is not None:
+                names &= self.search_matches
+            cached = self.numbered_names = (numbered, self.search_matches, names)
+        return cached[2]
+    
+    def show_list_rows(self):
+        """Put the rows in view into the listbox, with their colors and selection"""
+        listbox = self.pdf_listbox
+        rows = self.list_window.visible()
+        listbox.delete(0, tk.END)
+        if rows:
+            listbox.insert(tk.END, *(self.pdf_entries[i].name for i in rows))
+        for offset, index in enumerate(rows):
+            # Files with inspection numbers get green text; the rest keep the default black
+            if self.pdf_entries[index].numbered:
+                listbox.itemconfig(offset, {'fg': '#2E7D32'})  # Dark green
+            # Identical copies share a background color per duplicate group
+            color = self.duplicate_colors.get(self.listed_path(index))
+            if color:
+                listbox.itemconfig(offset, {'bg': color})
+            if index in self.list_selection:
+                listbox.selection_set(offset)
+        self.list_scrollbar.set(*self.list_window.fractions())
+    
+    def on_list_resize(self, event):
+        """Fit the rows in view to the new listbox height"""
+        self.list_window.resize(rows=event.height // self.list_row_height)
+        self.show_list_rows()
+    
+    def on_list_scroll(self, action, amount, unit=None):
+        """Scroll the list from the scrollbar"""
+        if action == "moveto":
+            self.list_window.moveto(amount)
+        else:
+            step = self.list_window.rows if unit == "pages" else 1
+            self.list_window.scroll_to(self.list_window.top + int(amount) * step)
+        self.show_list_rows()
+    
+    def scroll_list(self, rows):
+        """Scroll the list by a number of rows (mouse wheel)"""
+        if self.list_window.scroll_to(self.list_window.top + rows):
+            self.show_list_rows()
+        return "break"
+    
+    def on_list_click(self, event, mode):
+        """Select rows with the mouse
+        Args:
+            mode: 'set' for a click, 'toggle' for Ctrl+click, 'extend' for Shift+click or a drag
+        """
+        self.pdf_listbox.focus_set()
+        if not self.pdf_entries:
+            return "break"
+        offset = self.pdf_listbox.nearest(event.y)
+        index = min(self.list_window.top + offset, len(self.pdf_entries) - 1)
+        if mode == "toggle":
+            self.list_selection ^= {index}
+            self.list_anchor = index
+        elif mode == "extend" and self.list_anchor is not None:
+            low, high = sorted((self.list_anchor, index))
+            self.list_selection = set(range(low, high + 1))
+        else:
+            self.list_selection = {index}
+            self.list_anchor = index
+        self.list_active = index
+        self.show_list_rows()
+        self.on_pdf_select()
+        return "break"
+    
+    def on_list_key(self, step, extend):
+        """Move the selection with the arrow, page and home/end keys"""
+        count = len(self.pdf_entries)
+        if not count:
+            return "break"
+        current = self.list_active if self.list_active is not None else self.list_window.top
+        jumps = {"page-": -self.list_window.rows, "page+": self.list_window.rows,
+                 "first": -count, "last": count}
+        index = max(0, min(count - 1, current + jumps.get(step, step)))
+        if extend and self.list_anchor is not None:
+            low, high = sorted((self.list_anchor, index))
+            self.list_selection = set(range(low, high + 1))
+        else:
+            self.list_selection = {index}
+            self.list_anchor = index
+        self.list_active = index
+        self.list_window.see(index)
+        self.show_list_rows()
+        self.on_pdf_select()
+        return "break"
+    
+    def on_pdf_select(self):
+        """Preview the row clicked or moved to last"""
+        index = self.list_active
+        if index is None or index not in self.list_selection:
+            if not self.list_selection:
+                return
+            index = min(self.list_selection)
+        # Already shown, e.g. when Ctrl+click adds rows for a bulk rename
+        if self.listed_path(index) == self.selected_pdf:
+            return
+        self.selected_pdf = self.listed_path(index)
+        self.preview_pdf()
+    
+    def toggle_grid_view(self):
+        """Switch between the file name list and the thumbnail grid"""
+        if self.grid_view_var.get():
+            self.grid_frame.pack(fill=tk.BOTH, expand=True, before=self.list_frame)
+            self.list_frame.pack_forget()
+            self.build_grid()
+            self.reselect_current_file()
+        else:
+            self.list_frame.pack(fill=tk.BOTH, expand=True, before=self.grid_frame)
+            self.grid_frame.pack_forget()
+            self.cancel_thumbnail_requests()
+            self.grid_canvas.delete("all")
+            self.grid_items = {}
+            self.grid_layout = None
+    
+    def build_grid(self):
+        """Lay out one cell per listed file; cells are drawn as they scroll into view"""
+        self.grid_canvas.delete("all")
+        self.grid_items = {}
+        self.grid_layout = GridLayout(len(self.pdf_entries), self.grid_canvas.winfo_width())
+        self.grid_canvas.config(scrollregion=(0, 0, self.grid_layout.columns * (
+            self.grid_layout.cell_width + self.grid_layout.margin) + self.grid_layout.margin,
+            self.grid_layout.total_height))
+        self.schedule_grid_update()
+    
+    def on_grid_resize(self, event):
+        """Reflow the grid when the panel width changes the number of columns"""
+        if self.grid_layout and GridLayout(0, event.width).columns != self.grid_layout.columns:
+            self.build_grid()
+            self.reselect_current_file()
+        else:
+            self.schedule_grid_update()
+    
+    def on_grid_scroll(self, first, last):
+        """Keep the scrollbar in sync and draw the cells scrolled into view"""
+        self.grid_scrollbar.set(first, last)
+        self.schedule_grid_update()
+    
+    def schedule_grid_update(self):
+        """Update the drawn cells shortly (coalesces scroll events)"""
+        if not self.grid_after_id:
+            self.grid_after_id = self.root.after(30, self.update_grid)
+    
+    def see_grid_cell(self, index):
+        """Scroll the grid so a cell is visible"""
+        _, y0, _, y1 = self.grid_layout.cell_box(index)
+        top = self.grid_canvas.canvasy(0)
+        bottom = self.grid_canvas.canvasy(self.grid_canvas.winfo_height())
+        if y0 < top or y1 > bottom:
+            self.grid_canvas.yview_moveto(max(0, y0 - self.grid_layout.margin)
+                                          / self.grid_layout.total_height)
+        self.schedule_grid_update()
+    
+    def thumbnail_key(self, index):
+        """Cache key of a cell's thumbnail; a modified file gets a new thumbnail"""
+        return self.listed_path(index), self.pdf_entries[index].mtime_ns
+    
+    def update_grid(self):
+        """Draw the cells in and near the viewport, drop the others and their requests"""
+        self.grid_after_id = None
+        if not self.grid_layout:
+            return
+        top = self.grid_canvas.canvasy(0)
+        bottom = self.grid_canvas.canvasy(self.grid_canvas.winfo_height())
+        wanted = self.grid_layout.visible_range(top, bottom)
+        
+        for index in [index for index in self.grid_items if index not in wanted]:
+            self.clear_grid_cell(index)
+        
+        # Cells that scrolled out before their thumbnail was served are not rendered
+        wanted_keys = {self.thumbnail_key(index) for index in wanted}
+        for key, request in list(self.thumbnail_requests.items()):
+            if key not in wanted_keys and request.cancel():
+                del self.thumbnail_requests[key]
+        
+        for index in wanted:
+            if index not in self.grid_items:
+                self.draw_grid_cell(index)
+    
+    def draw_grid_cell(self, index):
+        """Draw a cell with its cached thumbnail, requesting the thumbnail if needed"""
+        path = self.listed_path(index)
+        x0, y0, x1, y1 = self.grid_layout.cell_box(index)
+        frame = self.grid_canvas.create_rectangle(
+            x0, y0, x1, y1, fill="#F5F5F5",
+            outline="#2196F3" if path == self.selected_pdf else "#DDDDDD",
+            width=3 if path == self.selected_pdf else 1)
+        name = path.name if len(path.name) <= 36 else path.name[:35] + "…"
+        label = self.grid_canvas.create_text(
+            (x0 + x1) / 2, y1 - 4, text=name, anchor=tk.S, width=x1 - x0 - 8,
+            font=("Arial", 8), justify=tk.CENTER,
+            fill="#2E7D32" if self.pdf_entries[index].numbered else "black")
+        
+        key = self.thumbnail_key(index)
+        image = None
+        if key in self.thumbnail_cache:
+            self.thumbnail_cache.move_to_end(key)
+            image = self.grid_canvas.create_image((x0 + x1) / 2, y0 + 8, anchor=tk.N,
+                                                  image=self.thumbnail_cache[key])
+        elif (key not in self.thumbnail_requests and key not in self.thumbnail_failed
+              and self.quarantined(path) is None):
+            self.thumbnail_requests[key] = self.run_in_worker(
+                rendering.render_thumbnail, (str(path),),
+                lambda result, key=key: self.on_thumbnail_rendered(key, result),
+                lambda error, key=key: self.on_thumbnail_error(key, error),
+                timeout=THUMBNAIL_TIMEOUT, priority=PREFETCH, key=str(path), poll_ms=50)
+        self.grid_items[index] = (frame, image, label)
+    
+    def clear_grid_cell(self, index):
+        """Remove a cell's items from the canvas"""
+        for item in self.grid_items.pop(index):
+            if item:
+                self.grid_canvas.delete(item)
+    
+    def on_thumbnail_rendered(self, key, image):
+        """Cache a thumbnail and show it if its cell is on the canvas"""
+        self.thumbnail_requests.pop(key, None)
+        with tracing.span("PhotoImage", kind="thumbnail"):
+            self.thumbnail_cache[key] = ImageTk.PhotoImage(image)
+        image.close()
+        while len(self.thumbnail_cache) > THUMBNAIL_CACHE_SIZE:
+            self.thumbnail_cache.popitem(last=False)
+        
+        # Only drawn cells are searched, not the whole (possibly huge) file list
+        for index in [index for index in self.grid_items if self.thumbnail_key(index) == key]:
+            self.clear_grid_cell(index)
+            self.draw_grid_cell(index)
+    
+    def on_thumbnail_error(self, key, error):
+        """Leave the cell without a thumbnail; a hung or crashed render quarantines the file"""
+        self.thumbnail_requests.pop(key, None)
+        self.thumbnail_failed.add(key)
+        self.describe_worker_error(key[0], error)
+    
+    def cancel_thumbnail_requests(self):
+        """Drop every thumbnail render that has not started yet"""
+        for request in self.thumbnail_requests.values():
+            request.cancel()
+        self.thumbnail_requests = {}
+    
+    def on_grid_click(self, event):
+        """Select and preview the file of a clicked cell"""
+        if not self.grid_layout:
+            return
+        index = self.grid_layout.index_at(self.grid_canvas.canvasx(event.x),
+                                          self.grid_canvas.canvasy(event.y))
+        if index is None:
+            return
+        previous = self.selected_pdf
+        self.selected_pdf = self.listed_path(index)
+        self.list_selection = {index}
+        self.list_anchor = self.list_active = index
+        self.list_window.see(index)
+        self.show_list_rows()
+        
+        # Redraw the cells whose highlight changed
+        for cell in list(self.grid_items):
+            if self.listed_path(cell) in (previous, self.selected_pdf):
+                self.clear_grid_cell(cell)
+                self.draw_grid_cell(cell)
+        self.preview_pdf()
+    
+    def run_in_worker(self, func, args, on_success, on_error, timeout=None, priority=PREVIEW,
+                      key=None, poll_ms=30):
+        """Run a function in a supervised worker process and deliver the outcome on the Tk thread
+        Args:
+            priority: Scheduler priority class (PREVIEW, SUGGESTION, PREFETCH or BULK)
+            key: Path of the file the task is for, so it is dropped if the file is renamed
+            poll_ms: How often the Tk thread checks for the result
+        Returns:
+            the task's future (cancel it to drop a request that is still queued)
+        """
+        future = self.scheduler.submit(func, *args, priority=priority, key=key, timeout=timeout)
+        self.deliver(future, on_success, on_error, poll_ms)
+        return future
+    
+    def deliver(self, future, on_success, on_error, poll_ms=30, timeout=None, on_timeout=None):
+        """Call on_success or on_error on the Tk thread once a future is done (not if cancelled)
+        Args:
+            timeout: Seconds after which on_timeout is called once; the outcome is
+                still delivered if the task finishes later
+        """
+        deadline = time.monotonic() + timeout if timeout else None
+        
+        def poll():
+            nonlocal deadline
+            if not future.done():
+                if deadline is not None and time.monotonic() > deadline:
+                    deadline = None
+                    on_timeout()
+                self.root.after(poll_ms, poll)
+                return
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is None:
+                on_success(future.result())
+            else:
+                on_error(error)
+        
+        self.root.after(poll_ms, poll)
+    
+    def run_file_operation(self, func, args, on_success, on_error, timeout=FILE_OPERATION_TIMEOUT):
+        """Run a rename or other file system call on an I/O thread
+        On a network share a rename can hang for minutes; the window stays responsive
+        and the operator is told when it takes longer than timeout seconds.
+        Returns:
+            the operation's future
+        """
+        def on_timeout():
+            messagebox.showwarning("השיתוף אינו מגיב",
+                                   f"הפעולה לא הסתיימה תוך {timeout} שניות.\n"
+                                   "היא תושלם ברקע כשהשיתוף יגיב.",
+                                   parent=self.root)
+        
+        future = self.scheduler.submit(func, *args, priority=PREVIEW, lane=IO)
+        self.deliver(future, on_success, on_error, poll_ms=20,
+                     timeout=timeout, on_timeout=on_timeout)
+        return future
+    
+    def toggle_tracing(self):
+        """Turn the timing spans on or off from the status bar"""
+        tracing.tracer.enable(self.tracing_var.get())
+        if not self.tracing_var.get():
+            self.timings = {}
+            self.timing_label.config(text="")
+    
+    def record_timing(self, label, name, started_ns):
+        """Record a preview or extraction span and show its stages in the status bar
+        Args:
+            label: Readout label (one entry per label, the latest replaces the last)
+            name: Span name
+            started_ns: time.perf_counter_ns() when the action started
+        """
+        if not tracing.tracer.enabled:
+            return
+        ended_ns = time.perf_counter_ns()
+        tracing.tracer.add(name, started_ns, ended_ns)
+        stages = tracing.tracer.totals(started_ns, ended_ns, TIMING_STAGES)
+        self.timings[label] = ((ended_ns - started_ns) / 1e6, stages)
+        
+        parts = []
+        for shown, (total, shown_stages) in self.timings.items():
+            breakdown = " · ".join(f"{stage} {shown_stages[stage]:.0f}" for stage in TIMING_STAGES
+                                   if stage in shown_stages)
+            parts.append(f"{shown}: {total:.0f} ms" + (f" ({breakdown})" if breakdown else ""))
+        self.timing_label.config(text="    ".join(parts))
+    
+    def export_trace(self):
+        """Save the recorded spans as a Chrome trace file"""
+        if not tracing.tracer.snapshot():
+            messagebox.showinfo("ייצוא מדידות",
+                              "אין מדידות לייצוא. סמן \"מדידת זמנים\" ובצע פעולות בתוכנה.",
                               parent=self.root)
+            return
+        path = filedialog.asksaveasfilename(title="שמירת מדידות", defaultextension=".json",
+                                            filetypes=[("Chrome trace", "*.json")],
+                                            parent=self.root)
+        if not path:
+            return
+        try:
+            tracing.tracer.export(path)
+        except OSError as e:
+            messagebox.showerror("שגיאה", f"לא ניתן לשמור את הקובץ:\n{str(e)}", parent=self.root)
+    
+    def quarantined(self, path):
+        """Return the quarantine record of a listed file, or None
+        Looked up by the identity the catalog listed, so the Tk thread never waits
+        on a slow share.
+        """
+        identity = self.file_identity(path)
+        if identity is None:
+            return None
+        return self.quarantine.get(path, identity)
     
-    def on_pdf_select(self, event):
-        """Handle PDF selection from list"""
-        selection = self.pdf_listbox.curselection()
-        if selection:
-            index = selection[0]
-            self.selected_pdf = self.pdf_files[index]
-            self.preview_pdf()
+    def check_quarantine(self, path):
+        """Return a message if the file is quarantined, otherwise None"""
+        record = self.quarantined(path)
+        if record is None:
+            return None
+        return f"הקובץ הועבר להסגר לאחר כשל קודם ({record['reason']}):\n{record['detail']}"
+    
+    def describe_worker_error(self, path, error):
+        """Quarantine a file whose worker hung, crashed or ran out of memory
+        Returns:
+            error message for display
+        """
+        if isinstance(error, TaskFailed):
+            identity = self.file_identity(path)
+            if identity is not None:
+                self.quarantine.add(path, error.reason, str(error), identity)
+            return f"עיבוד הקובץ הופסק והקובץ הועבר להסגר ({error.reason}):\n{error}"
+        return str(error)
     
     def preview_pdf(self):
-        """Render and display the first page of the selected PDF"""
+        """Show the selected PDF as a scrollable column of lazily rendered pages"""
         if not self.selected_pdf:
             return
         
-        try:
-            # Update filename display
+        # Keep background indexing off the disk while previews are being browsed
+        self.pause_indexing()
+        
+        # Update filename display
+        copies = len(self.duplicate_of.get(self.selected_pdf, [None])) - 1
+        if copies:
+            self.filename_label.config(text=f"{self.selected_pdf.name}  (+{copies} עותקים זהים)")
+        else:
             self.filename_label.config(text=self.selected_pdf.name)
-            
-            # Open PDF with PyMuPDF
-            pdf_document = fitz.open(self.selected_pdf)
-            
-            # Get the first page
-            first_page = pdf_document[0]
-            
-            # Render page to image (increase resolution for better quality)
-            zoom = 2.0  # Zoom factor for better quality
-            mat = fitz.Matrix(zoom, zoom)
-            pix = first_page.get_pixmap(matrix=mat)
-            
-            # Convert to PIL Image
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            
-            # Resize if too large (max width 800px)
-            max_width = 800
-            if img.width > max_width:
-                ratio = max_width / img.width
-                new_height = int(img.height * ratio)
-                img = img.resize((max_width, new_height), Image.LANCZOS)
-            
-            # Convert to PhotoImage for tkinter
-            self.current_preview_image = ImageTk.PhotoImage(img)
-            
-            # Clear canvas and display image
-            self.preview_canvas.delete("all")
-            self.preview_canvas.create_image(10, 10, anchor=tk.NW, 
-                                           image=self.current_preview_image)
-            
-            # Update scroll region
-            self.preview_canvas.config(scrollregion=self.preview_canvas.bbox("all"))
-            
-            pdf_document.close()
-            
-        except Exception as e:
-            messagebox.showerror("שגיאת תצוגה מקדימה", 
-                               f"לא ניתן להציג את קובץ ה-PDF:\n{str(e)}",
-                               parent=self.root)
-            self.preview_canvas.delete("all")
-            error_label = tk.Label(self.preview_canvas, 
-                                  text=f"שגיאה בטעינת PDF:\n{str(e)}", 
-                                  font=("Arial", 12), fg="red", bg="white")
-            self.preview_canvas.create_window(400, 300, window=error_label)
+        
+        # A newer selection replaces renders that have not started yet
+        self.cancel_page_renders()
+        
+        path = self.selected_pdf
+        message = self.check_quarantine(path)
+        if message:
+            self.show_preview_error(message)
+            return
+        self.preview_started = (path, time.perf_counter_ns())
+        
+        # Instant pass: a cached draft, or a cheap low-resolution render that also
+        # brings the page sizes for the layout
+        # A modified file is listed with a new identity, so it never gets a stale draft
+        draft_key = (path, self.file_identity(path))
+        draft = self.draft_cache.get(draft_key)
+        if draft is not None:
+            self.draft_cache.move_to_end(draft_key)
+            self.show_document(path, draft)
+        else:
+            self.preview_request = self.run_in_worker(
+                rendering.render_draft, (str(path),),
+                lambda result: self.on_draft_rendered(draft_key, result),
+                lambda error: self.on_preview_error(path, error),
+                timeout=PREVIEW_TIMEOUT, key=str(path), poll_ms=10)
+        
+        # Sharp pass, skipped while the user is still moving through the list
+        self.refine_after_id = self.root.after(PREVIEW_REFINE_DELAY,
+                                               lambda: self.refine_preview(path))
+    
+    def cancel_page_renders(self):
+        """Drop queued renders and the pending sharp pass of the current preview"""
+        if self.preview_request:
+            self.preview_request.cancel()
+        for request in list(self.page_requests.values()) + list(self.tile_requests.values()):
+            request.cancel()
+        self.page_requests = {}
+        self.tile_requests = {}
+        self.refined_path = None
+        if self.refine_after_id:
+            self.root.after_cancel(self.refine_after_id)
+            self.refine_after_id = None
+    
+    def on_draft_rendered(self, draft_key, result):
+        """Cache a draft render and show it"""
+        path = draft_key[0]
+        if self.catalog:
+            self.catalog.record_page_count(self.catalog_key(path), result["page_count"])
+        self.draft_cache[draft_key] = result
+        if len(self.draft_cache) > DRAFT_CACHE_SIZE:
+            self.draft_cache.popitem(last=False)
+        self.show_document(path, result)
+    
+    def reset_page_view(self):
+        """Clear the preview canvas and release every rendered page"""
+        self.preview_canvas.delete("all")
+        self.preview_canvas.config(scrollregion=(0, 0, 0, 0))
+        self.page_images = {}
+        self.tile_items = {}
+        self.page_layout = None
+        self.page_path = None
+    
+    def show_document(self, path, draft):
+        """Lay out all pages of a document and show the first page's draft
+        Args:
+            draft: render_draft result (page sizes and a small first page image)
+        """
+        if path != self.selected_pdf:
+            return
+        
+        # Free the previous document's pages before creating new ones
+        self.reset_page_view()
+        self.page_sizes = draft["page_sizes"]
+        self.page_points = draft["page_points"]
+        self.page_path = path
+        self.preview_error_path = None
+        self.zoom_index = 0
+        self.zoom_label.config(text="100%")
+        self.build_page_layout()
+        self.preview_canvas.xview_moveto(0)
+        self.preview_canvas.yview_moveto(0)
+        
+        # Scaled copy; the small draft itself stays in the cache
+        self.place_page(0, draft["image"].resize(draft["page_sizes"][0], Image.BILINEAR), "draft")
+        
+        if self.refined_path == path:
+            self.update_visible_pages()
+    
+    def build_page_layout(self):
+        """Lay out the previewed pages at the current zoom, with empty placeholders"""
+        self.preview_canvas.delete("all")
+        self.page_images = {}
+        self.tile_items = {}
+        self.page_layout = PageLayout(self.page_sizes, ZOOM_LEVELS[self.zoom_index])
+        
+        # Placeholders give the scroll region its full extent before any rendering
+        for page_number in range(len(self.page_layout)):
+            self.preview_canvas.create_rectangle(*self.page_layout.page_box(page_number),
+                                                 outline="#DDDDDD", fill="#F5F5F5")
+        self.preview_canvas.config(scrollregion=(0, 0, self.page_layout.total_width,
+                                                 self.page_layout.total_height))
+    
+    def place_page(self, page_number, image, quality):
+        """Put a rendered page on the canvas, replacing a lower quality version
+        Args:
+            quality: 'draft' or 'full'
+        """
+        old = self.page_images.pop(page_number, None)
+        if old:
+            self.preview_canvas.delete(old[1])
+        
+        # Convert to PhotoImage for tkinter; Tk keeps its own copy of the pixels
+        with tracing.span("PhotoImage", kind=quality):
+            photo = ImageTk.PhotoImage(image)
+        image.close()
+        x0, y0, _, _ = self.page_layout.page_box(page_number)
+        item = self.preview_canvas.create_image(x0, y0, anchor=tk.NW, image=photo)
+        self.page_images[page_number] = (photo, item, quality)
+        
+        # The preview is timed until its first page is shown, as a draft and sharp
+        if page_number == 0 and self.preview_started and self.preview_started[0] == self.page_path:
+            if quality == "full":
+                self.record_timing("תצוגה מקדימה", "preview", self.preview_started[1])
+                self.preview_started = None
+            else:
+                tracing.tracer.add("preview.draft", self.preview_started[1])
+    
+    def refine_preview(self, path):
+        """Start rendering the visible pages of a file that is still selected"""
+        self.refine_after_id = None
+        if path != self.selected_pdf:
+            return
+        self.refined_path = path
+        self.update_visible_pages()
+    
+    def on_preview_scroll(self, first, last):
+        """Keep the scrollbar in sync and render the pages scrolled into view"""
+        self.preview_scrollbar.set(first, last)
+        self.schedule_visible_pages()
+    
+    def on_preview_xscroll(self, first, last):
+        """Keep the horizontal scrollbar in sync and render the tiles panned into view"""
+        self.preview_xscrollbar.set(first, last)
+        self.schedule_visible_pages()
+    
+    def schedule_visible_pages(self, event=None):
+        """Update the rendered pages shortly (coalesces scroll and resize events)"""
+        if not self.viewport_after_id:
+            self.viewport_after_id = self.root.after(30, self.update_visible_pages)
+    
+    def change_zoom(self, step, x=None, y=None):
+        """Zoom the preview in or out by one level, keeping the point under the cursor
+        Args:
+            step: +1 to zoom in, -1 to zoom out
+            x, y: Anchor in window coordinates (default: center of the preview)
+        """
+        index = self.zoom_index + step
+        if not self.page_layout or not 0 <= index < len(ZOOM_LEVELS):
+            return
+        
+        if x is None:
+            x = self.preview_canvas.winfo_width() / 2
+            y = self.preview_canvas.winfo_height() / 2
+        canvas_x = self.preview_canvas.canvasx(x)
+        canvas_y = self.preview_canvas.canvasy(y)
+        page_number = self.page_layout.page_at(canvas_y)
+        x0, y0, x1, y1 = self.page_layout.page_box(page_number)
+        fraction_x = (canvas_x - x0) / (x1 - x0)
+        fraction_y = (canvas_y - y0) / (y1 - y0)
+        
+        # Renders for the old zoom are no longer wanted
+        for request in list(self.page_requests.values()) + list(self.tile_requests.values()):
+            request.cancel()
+        self.page_requests = {}
+        self.tile_requests = {}
+        self.zoom_index = index
+        self.zoom_label.config(text=f"{round(ZOOM_LEVELS[index] * 100)}%")
+        self.build_page_layout()
+        
+        x0, y0, x1, y1 = self.page_layout.page_box(page_number)
+        self.preview_canvas.xview_moveto(
+            (x0 + fraction_x * (x1 - x0) - x) / self.page_layout.total_width)
+        self.preview_canvas.yview_moveto(
+            (y0 + fraction_y * (y1 - y0) - y) / self.page_layout.total_height)
+        self.update_visible_pages()
+    
+    def update_visible_pages(self):
+        """Render the pages (or zoom tiles) in and near the viewport; evict the rest"""
+        self.viewport_after_id = None
+        path = self.page_path
+        if not self.page_layout or path != self.selected_pdf or self.refined_path != path:
+            return
+        
+        top = self.preview_canvas.canvasy(0)
+        bottom = self.preview_canvas.canvasy(self.preview_canvas.winfo_height())
+        if self.zoom_index > 0:
+            left = self.preview_canvas.canvasx(0)
+            right = self.preview_canvas.canvasx(self.preview_canvas.winfo_width())
+            self.update_visible_tiles(path, left, top, right, bottom)
+            return
+        
+        for page_number in self.page_layout.pages_to_evict(list(self.page_images), top, bottom):
+            self.preview_canvas.delete(self.page_images.pop(page_number)[1])
+        
+        wanted = self.page_layout.visible_pages(top, bottom)
+        for page_number, request in list(self.page_requests.items()):
+            if page_number not in wanted and request.cancel():
+                del self.page_requests[page_number]
+        
+        identity = self.file_identity(path)
+        for page_number in wanted:
+            shown = self.page_images.get(page_number)
+            if page_number in self.page_requests or (shown and shown[2] == "full"):
+                continue
+            # Supersampled render, scaled down to the size the layout reserved
+            request = self.get_render_service().request(
+                path, identity, page_number,
+                zoom=rendering.page_preview_zoom(*self.page_points[page_number]),
+                size=self.page_layout.sizes[page_number])
+            self.page_requests[page_number] = request
+            self.deliver(request,
+                         lambda image, n=page_number: self.on_page_rendered(path, n, image),
+                         lambda error: self.on_preview_error(path, error))
+    
+    def update_visible_tiles(self, path, left, top, right, bottom):
+        """Show the zoom tiles intersecting the viewport, rendering missing ones"""
+        wanted = {}
+        for page_number in self.page_layout.visible_pages(top, bottom, lookahead=0):
+            for column, row, box in self.page_layout.visible_tiles(page_number, left, top,
+                                                                   right, bottom):
+                wanted[(path, page_number, self.zoom_index, column, row)] = box
+        
+        # Tiles that left the view lose their canvas item but stay in the cache
+        for key in [key for key in self.tile_items if key not in wanted]:
+            self.preview_canvas.delete(self.tile_items.pop(key))
+        for key, request in list(self.tile_requests.items()):
+            if key not in wanted and request.cancel():
+                del self.tile_requests[key]
+        
+        for key, box in wanted.items():
+            if key in self.tile_items or key in self.tile_requests:
+                continue
+            if key in self.tile_cache:
+                self.tile_cache.move_to_end(key)
+                self.place_tile(key, box)
+                continue
+            page_number = key[1]
+            self.tile_requests[key] = self.run_in_worker(
+                rendering.render_tile,
+                (str(path), page_number, self.page_layout.sizes[page_number], box),
+                lambda image, key=key, box=box: self.on_tile_rendered(key, box, image),
+                lambda error: self.on_preview_error(path, error),
+                timeout=PREVIEW_TIMEOUT, key=str(path))
+    
+    def place_tile(self, key, box):
+        """Put a cached tile on the canvas"""
+        x0, y0, _, _ = self.page_layout.page_box(key[1])
+        self.tile_items[key] = self.preview_canvas.create_image(
+            x0 + box[0], y0 + box[1], anchor=tk.NW, image=self.tile_cache[key])
+    
+    def on_tile_rendered(self, key, box, image):
+        """Cache a rendered tile and show it if it belongs to the current view"""
+        self.tile_requests.pop(key, None)
+        with tracing.span("PhotoImage", kind="tile"):
+            self.tile_cache[key] = ImageTk.PhotoImage(image)
+        image.close()
+        while len(self.tile_cache) > TILE_CACHE_SIZE:
+            evicted, _ = self.tile_cache.popitem(last=False)
+            if evicted in self.tile_items:
+                self.preview_canvas.delete(self.tile_items.pop(evicted))
+        
+        if key[0] == self.page_path and key[2] == self.zoom_index and key not in self.tile_items:
+            self.place_tile(key, box)
+    
+    def on_page_rendered(self, path, page_number, image):
+        """Show a full-quality page (ignored if the selection or zoom moved on)"""
+        if path != self.page_path or path != self.selected_pdf or self.zoom_index:
+            return
+        self.page_requests.pop(page_number, None)
+        self.place_page(page_number, image, "full")
+    
+    def on_preview_error(self, path, error):
+        """Report a failed preview render"""
+        if path != self.selected_pdf or self.preview_error_path == path:
+            return  # Stale, or another render of the same file already failed
+        self.cancel_page_renders()
+        self.preview_error_path = path
+        message = self.describe_worker_error(path, error)
+        messagebox.showerror("שגיאת תצוגה מקדימה", 
+                           f"לא ניתן להציג את קובץ ה-PDF:\n{message}",
+                           parent=self.root)
+        self.show_preview_error(f"שגיאה בטעינת PDF:\n{message}")
+    
+    def show_preview_error(self, message):
+        """Replace the preview with an error message"""
+        self.reset_page_view()
+        error_label = tk.Label(self.preview_canvas, 
+                              text=message, 
+                              font=("Arial", 12), fg="red", bg="white")
+        self.preview_canvas.create_window(400, 300, window=error_label)
     
     def quick_rename(self):
         """Quick rename with inspection number prepended"""
@@ -267,56 +1602,62 @@ class PDFViewerApp:
         if not inspection_num:
             return  # User cancelled
         
-        # Clean the inspection number (remove invalid characters)
-        inspection_num = "".join(c for c in inspection_num 
-                                if c.isalnum() or c in ('-', '_'))
-        
-        if not inspection_num:
+        plan = core.plan_number_rename(self.selected_pdf, inspection_num)
+        if plan is None:
             messagebox.showerror("קלט לא תקין", 
                                "מספר הבדיקה לא יכול להיות רק תווים מיוחדים.",
                                parent=self.root)
             return
         
-        # Create new filename
-        original_name = self.selected_pdf.name
-        new_name = f"{inspection_num}_{original_name}"
-        new_path = self.selected_pdf.parent / new_name
-        
-        # Check if file already exists
-        if new_path.exists():
-            if not messagebox.askyesno("הקובץ קיים", 
-                                      f"קובץ בשם '{new_name}' כבר קיים.\nלהחליף אותו?",
-                                      parent=self.root):
-                return
+        self.apply_rename_plan(plan, core.clean_inspection_number(inspection_num),
+                               record_number=True)
+    
+    def apply_rename_plan(self, plan, inspection_num=None, record_number=False):
+        """Rename the selected file as planned and refresh the list and preview
+        Args:
+            inspection_num: Number being prepended, offered for identical copies too
+            record_number: Record the number in the catalog as entered manually
+        """
+        def rename(overwrite):
+            # The existence check and the rename are one call on an I/O thread, so a
+            # slow share costs a single round of waiting that never blocks the window
+            self.run_file_operation(core.apply_rename, (plan, overwrite), on_renamed, on_error)
         
-        try:
-            # Rename the file
-            self.selected_pdf.rename(new_path)
-            
+        def on_renamed(new_path):
             # Update internal state
-            old_index = self.pdf_files.index(self.selected_pdf)
-            self.selected_pdf = new_path
-            
-            # Reload file list without clearing preview
-            self.load_pdf_files(clear_preview=False)
-            
-            # Reselect the renamed file
-            new_index = self.pdf_files.index(self.selected_pdf)
-            self.pdf_listbox.selection_clear(0, tk.END)
-            self.pdf_listbox.selection_set(new_index)
-            self.pdf_listbox.see(new_index)
+            self.on_file_renamed(plan.source, new_path)
+            if self.selected_pdf == plan.source:
+                self.selected_pdf = new_path
+            if inspection_num:
+                if record_number and self.catalog:
+                    self.catalog.record_detection(self.catalog_key(new_path), [inspection_num],
+                                                  1.0, "manual")
+                self.rename_identical_copies(new_path, inspection_num)
+            
+            # Show the new name and reselect the renamed file
+            self.refresh_file_list()
             
             # Update filename display and refresh preview
-            self.filename_label.config(text=self.selected_pdf.name)
-            self.preview_pdf()  # Refresh the preview
+            if self.selected_pdf == new_path:
+                self.filename_label.config(text=self.selected_pdf.name)
+                self.preview_pdf()  # Refresh the preview
             
-            messagebox.showinfo("הצלחה", f"שם הקובץ שונה ל:\n{new_name}",
+            messagebox.showinfo("הצלחה", f"שם הקובץ שונה ל:\n{new_path.name}",
                               parent=self.root)
-            
-        except Exception as e:
+        
+        def on_error(error):
+            # The new name is taken: ask before replacing the other file
+            if isinstance(error, FileExistsError):
+                if messagebox.askyesno("הקובץ קיים", 
+                                      f"קובץ בשם '{plan.target.name}' כבר קיים.\nלהחליף אותו?",
+                                      parent=self.root):
+                    rename(overwrite=True)
+                return
             messagebox.showerror("שגיאה בשינוי שם", 
-                               f"לא ניתן לשנות את שם הקובץ:\n{str(e)}",
+                               f"לא ניתן לשנות את שם הקובץ:\n{str(error)}",
                                parent=self.root)
+        
+        rename(overwrite=False)
 
     def extract_text(self):
         """Extract text from the selected PDF and find inspection numbers using optimized detection"""
@@ -326,91 +1667,41 @@ class PDFViewerApp:
                                   parent=self.root)
             return
         
-        try:
-            # Open PDF with PyMuPDF
-            pdf_document = fitz.open(self.selected_pdf)
-            first_page = pdf_document[0]
-            
-            # Extract text with detailed information (font size, color, etc.)
-            text_blocks = first_page.get_text("dict")
-            
-            # Extract text from optimized top-left region (30% height, 50% width)
-            page_width = first_page.rect.width
-            page_height = first_page.rect.height
-            top_left_rect = fitz.Rect(0, 0, page_width * 0.5, page_height * 0.3)
-            top_left_text_blocks = []
-            
-            # Filter blocks that are in the top-left region
-            for block in text_blocks["blocks"]:
-                if "lines" in block:
-                    for line in block["lines"]:
-                        for span in line["spans"]:
-                            bbox = fitz.Rect(span["bbox"])
-                            if bbox.intersects(top_left_rect):
-                                top_left_text_blocks.append(span)
-            
-            # Find inspection numbers using optimized criteria
-            inspection_candidates = []
-            all_red_text = []
-            
-            for span in top_left_text_blocks:
-                # Check for red color (RGB values near 255,0,0)
-                is_red = False
-                if "color" in span:
-                    # PyMuPDF stores color as RGB integer, convert to separate components
-                    color_int = span["color"]
-                    r = (color_int >> 16) & 0xFF
-                    g = (color_int >> 8) & 0xFF
-                    b = color_int & 0xFF
-                    
-                    # Check if text is red (high red component, low green and blue)
-                    if r > 200 and g < 100 and b < 100:
-                        is_red = True
-                        all_red_text.append(span)
-                
-                # Extract 5-6 digit numbers from text
-                import re
-                inspection_pattern = r'\b\d{5,6}\b'  # Specifically 5-6 digits
-                numbers_in_span = re.findall(inspection_pattern, span["text"])
-                
-                for number in numbers_in_span:
-                    inspection_candidates.append({
-                        "number": number,
-                        "font_size": span["size"],
-                        "is_red": is_red,
-                        "text": span["text"],
-                        "bbox": span["bbox"],
-                        "is_perfect_match": is_red and len(number) >= 5  # Perfect match criteria
-                    })
-            
-            # Prioritize perfect matches (red text, 5-6 digits)
-            perfect_matches = [c for c in inspection_candidates if c["is_perfect_match"]]
-            other_candidates = [c for c in inspection_candidates if not c["is_perfect_match"]]
-            
-            # Sort perfect matches by font size (larger first)
-            perfect_matches.sort(key=lambda x: x["font_size"], reverse=True)
-            other_candidates.sort(key=lambda x: x["font_size"], reverse=True)
-            
-            # Combine results with perfect matches first
-            final_candidates = perfect_matches + other_candidates
-            
-            # Get regular text for display
-            full_text = first_page.get_text()
-            top_left_text = first_page.get_text("text", clip=top_left_rect)
+        path = self.selected_pdf
+        message = self.check_quarantine(path)
+        if message:
+            messagebox.showerror("שגיאה בחילוץ טקסט", message, parent=self.root)
+            return
+        started = time.perf_counter_ns()
+        
+        def on_success(result):
+            self.record_timing("חילוץ", "extraction.text", started)
+            if path != self.selected_pdf:
+                return  # Selection moved on; the results would rename the wrong file
+            final_candidates = result["candidates"]
             
-            pdf_document.close()
+            if self.catalog:
+                self.catalog.record_detection(self.catalog_key(path),
+                                              [c["number"] for c in final_candidates],
+                                              detection.text_confidence(final_candidates), "text")
             
             # Show optimized results
-            self.show_optimized_extraction_results(full_text, top_left_text, final_candidates, 
-                                                 all_red_text, top_left_rect, page_width, page_height)
-            
-        except Exception as e:
+            self.show_optimized_extraction_results(result["full_text"], result["region_text"],
+                                                 final_candidates, result["red_spans"],
+                                                 result["region"], result["page_width"],
+                                                 result["page_height"])
+        
+        def on_error(error):
             messagebox.showerror("שגיאה בחילוץ טקסט", 
-                               f"לא ניתן לחלץ טקסט מהקובץ:\n{str(e)}",
+                               f"לא ניתן לחלץ טקסט מהקובץ:\n{self.describe_worker_error(path, error)}",
                                parent=self.root)
+        
+        self.run_in_worker(detection.detect_text_numbers, (str(path),), on_success, on_error,
+                           timeout=EXTRACT_TIMEOUT, priority=SUGGESTION, key=str(path))
     
     def extract_text_with_ocr(self):
         """Extract text from scanned PDF using OCR with improved detection"""
+        self.ocr_after_id = None
         if not self.selected_pdf:
             messagebox.showwarning("לא נבחר קובץ", 
                                   "אנא בחר קובץ PDF תחילה.",
@@ -418,169 +1709,63 @@ class PDFViewerApp:
             return
         
         # Check if OCR is available
-        if not OCR_AVAILABLE:
+        if not detection.OCR_AVAILABLE:
             self.show_ocr_installation_guide()
             return
         
-        # Verify Tesseract is accessible
-        try:
-            import subprocess
-            result = subprocess.run(['tesseract', '--version'], 
-                                  capture_output=True, text=True, timeout=5)
-            if result.returncode != 0:
-                messagebox.showerror("שגיאת OCR", 
-                                   "Tesseract OCR מותקן אך לא נגיש.\n"
-                                   "ודא ש-Tesseract נמצא ב-PATH.\n"
-                                   f"שגיאה: {result.stderr}",
-                                   parent=self.root)
-                return
-        except (subprocess.TimeoutExpired, FileNotFoundError) as e:
-            messagebox.showerror("שגיאת OCR", 
-                               "Tesseract OCR לא נמצא ב-PATH.\n"
-                               "התקן את Tesseract OCR והוסף אותו ל-PATH.\n"
-                               f"פרטים: {str(e)}",
-                               parent=self.root)
+        # Tesseract is probed in the background (at startup, or again on retry);
+        # wait for that probe instead of running it on the Tk thread
+        if self.tesseract_probe is None or not self.tesseract_probe.done.is_set():
+            if self.ocr_after_id is None:
+                self.ocr_after_id = self.root.after(50, self.extract_text_with_ocr)
             return
-        except Exception as e:
-            messagebox.showerror("שגיאת OCR", 
-                               f"בעיה בבדיקת Tesseract:\n{str(e)}",
-                               parent=self.root)
+        error = detection.check_tesseract()  # The probe's cached result
+        if error:
+            if messagebox.askretrycancel("שגיאת OCR", error, parent=self.root):
+                self.tesseract_probe = WarmUp((), [
+                    lambda: detection.check_tesseract(retry=True),
+                ]).start()
+                self.extract_text_with_ocr()
             return
         
-        try:
-            # Open PDF with PyMuPDF
-            pdf_document = fitz.open(self.selected_pdf)
-            first_page = pdf_document[0]
-            
-            # Get page dimensions
-            page_width = first_page.rect.width
-            page_height = first_page.rect.height
-            
-            # Use the same optimized region as regular extraction (30% height, 50% width)
-            top_left_rect = fitz.Rect(0, 0, page_width * 0.5, page_height * 0.3)
-            
-            # Render the page to image with high resolution
-            zoom = 4.0  # Higher zoom for better OCR accuracy
-            mat = fitz.Matrix(zoom, zoom)
-            pix = first_page.get_pixmap(matrix=mat, clip=top_left_rect)
-            
-            # Convert to PIL Image
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            
-            # Enhanced preprocessing for better OCR
-            # Convert to grayscale
-            img_gray = img.convert('L')
-            
-            # Apply multiple preprocessing techniques
-            processed_images = []
-            
-            # 1. Basic threshold
-            threshold = 128
-            img_binary = img_gray.point(lambda p: p > threshold and 255)
-            processed_images.append(("בסיסי", img_binary))
-            
-            # 2. Adaptive threshold simulation (multiple levels)
-            for thresh in [100, 150, 180]:
-                img_adaptive = img_gray.point(lambda p: p > thresh and 255)
-                processed_images.append((f"סף {thresh}", img_adaptive))
-            
-            # 3. Inverted (for light text on dark background)
-            img_inverted = img_gray.point(lambda p: 255 - p)
-            processed_images.append(("הפוך", img_inverted))
-            
-            # Try OCR on each processed image
-            all_ocr_results = []
-            
-            for proc_name, proc_img in processed_images:
-                try:
-                    # Configure Tesseract for digit recognition
-                    digit_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789'
-                    general_config = r'--oem 3 --psm 6'
-                    
-                    # Extract digits only
-                    digit_text = pytesseract.image_to_string(proc_img, config=digit_config)
-                    
-                    # Extract general text for context
-                    general_text = pytesseract.image_to_string(proc_img, config=general_config)
-                    
-                    all_ocr_results.append({
-                        "process_name": proc_name,
-                        "digit_text": digit_text,
-                        "general_text": general_text,
-                        "image": proc_img
-                    })
-                    
-                except Exception as e:
-                    # Continue with other preprocessing methods
-                    continue
-            
-            # Find 5-6 digit numbers across all OCR results
-            numeric_pattern = r'\b\d{5,6}\b'
-            all_numbers = []
-            
-            for result in all_ocr_results:
-                numbers_in_digits = re.findall(numeric_pattern, result["digit_text"])
-                numbers_in_general = re.findall(numeric_pattern, result["general_text"])
-                
-                for number in numbers_in_digits + numbers_in_general:
-                    all_numbers.append({
-                        "number": number,
-                        "process": result["process_name"],
-                        "text": result["digit_text"] if number in result["digit_text"] else result["general_text"]
-                    })
-            
-            # Remove duplicates and score
-            unique_numbers = {}
-            for item in all_numbers:
-                num = item["number"]
-                if num not in unique_numbers:
-                    unique_numbers[num] = {
-                        "number": num,
-                        "processes": [],
-                        "score": 0,
-                        "text_samples": []
-                    }
-                
-                unique_numbers[num]["processes"].append(item["process"])
-                unique_numbers[num]["text_samples"].append(item["text"])
-            
-            # Score numbers
-            scored_numbers = []
-            for num, data in unique_numbers.items():
-                score = 0
-                
-                # Prefer numbers found in multiple preprocessing methods
-                score += len(set(data["processes"])) * 20
-                
-                # Prefer numbers found in digit-only extraction
-                if any("digits" in proc for proc in data["processes"]):
-                    score += 30
-                
-                # Position scoring (earlier in text is better)
-                for text_sample in data["text_samples"]:
-                    position = text_sample.find(num)
-                    if position >= 0:
-                        score += max(0, 50 - position // 10)
-                
-                scored_numbers.append({
-                    "number": data["number"],
-                    "score": score,
-                    "processes": data["processes"],
-                    "text_samples": data["text_samples"]
-                })
-            
-            # Sort by score (descending)
-            scored_numbers.sort(key=lambda x: x["score"], reverse=True)
+        path = self.selected_pdf
+        message = self.check_quarantine(path)
+        if message:
+            messagebox.showerror("שגיאה בחילוץ טקסט עם OCR", message, parent=self.root)
+            return
+        started = time.perf_counter_ns()
+        
+        def on_success(result):
+            self.record_timing("חילוץ", "extraction.ocr", started)
+            if path != self.selected_pdf:
+                return  # Selection moved on; the results would rename the wrong file
+            scored_numbers = result["candidates"]
             
-            pdf_document.close()
+            if self.catalog:
+                self.catalog.record_detection(self.catalog_key(path),
+                                              [n["number"] for n in scored_numbers],
+                                              detection.ocr_confidence(scored_numbers), "ocr")
             
             # Show enhanced OCR results
-            self.show_enhanced_ocr_results(scored_numbers, all_ocr_results, top_left_rect)
-            
-        except Exception as e:
+            self.show_enhanced_ocr_results(scored_numbers, result["ocr_results"],
+                                           detection.SEARCH_REGION)
+        
+        def on_error(error):
             messagebox.showerror("שגיאה בחילוץ טקסט עם OCR", 
-                               f"לא ניתן לחלץ טקסט עם OCR:\n{str(e)}",
+                               f"לא ניתן לחלץ טקסט עם OCR:\n{self.describe_worker_error(path, error)}",
                                parent=self.root)
+        
+        # The region raster comes from the shared render service: a cached raster
+        # that covers the region at the OCR zoom is cropped, otherwise only the
+        # region is rendered
+        def on_region_rendered(image):
+            self.run_in_worker(detection.ocr_image, (image,), on_success, on_error,
+                               timeout=OCR_TIMEOUT, priority=SUGGESTION, key=str(path))
+        
+        region = self.get_render_service().request(path, self.file_identity(path), 0,
+                                                   clip=detection.SEARCH_REGION,
+                                                   zoom=detection.OCR_ZOOM, priority=SUGGESTION)
+        self.deliver(region, on_region_rendered, on_error)
     
     def show_ocr_installation_guide(self):
         """Show installation guide for OCR functionality"""
@@ -873,46 +2058,18 @@ class PDFViewerApp:
         if not self.selected_pdf:
             return
         
-        # Create new filename
-        original_name = self.selected_pdf.name
-        new_name = f"{inspection_num}_{original_name}"
-        new_path = self.selected_pdf.parent / new_name
-        
-        # Check if file already exists
-        if new_path.exists():
-            if not messagebox.askyesno("הקובץ קיים", 
-                                      f"קובץ בשם '{new_name}' כבר קיים.\nלהחליף אותו?",
+        # Warn if another file already uses this inspection number
+        conflicts = self.find_number_conflicts(inspection_num)
+        if conflicts:
+            if not messagebox.askyesno("מספר בדיקה בשימוש", 
+                                      f"מספר הבדיקה {inspection_num} כבר בשימוש:\n"
+                                      + "\n".join(conflicts[:5]) + "\nלהמשיך בכל זאת?",
                                       parent=self.root):
                 return
         
-        try:
-            # Rename the file
-            self.selected_pdf.rename(new_path)
-            
-            # Update internal state
-            old_index = self.pdf_files.index(self.selected_pdf)
-            self.selected_pdf = new_path
-            
-            # Reload file list without clearing preview
-            self.load_pdf_files(clear_preview=False)
-            
-            # Reselect the renamed file
-            new_index = self.pdf_files.index(self.selected_pdf)
-            self.pdf_listbox.selection_clear(0, tk.END)
-            self.pdf_listbox.selection_set(new_index)
-            self.pdf_listbox.see(new_index)
-            
-            # Update filename display and refresh preview
-            self.filename_label.config(text=self.selected_pdf.name)
-            self.preview_pdf()  # Refresh the preview
-            
-            messagebox.showinfo("הצלחה", f"שם הקובץ שונה ל:\n{new_name}",
-                              parent=self.root)
-            
-        except Exception as e:
-            messagebox.showerror("שגיאה בשינוי שם", 
-                               f"לא ניתן לשנות את שם הקובץ:\n{str(e)}",
-                               parent=self.root)
+        plan = core.plan_number_rename(self.selected_pdf, inspection_num)
+        if plan is not None:
+            self.apply_rename_plan(plan, core.clean_inspection_number(inspection_num))
     
     def show_extraction_results(self, full_text, top_left_text, potential_numbers, contextual_numbers):
         """Display extracted text and potential inspection numbers"""
@@ -1169,8 +2326,8 @@ class PDFViewerApp:
         dialog.transient(self.root)
         dialog.resizable(False, False)
         
-        # Position dialog near the rename buttons
-        self.position_dialog_near_buttons(dialog)
+        # Position dialog near the rename buttons (taller to fit the conflict warning)
+        self.position_dialog_near_buttons(dialog, height=210)
           
         # Create content
         tk.Label(dialog, text="הזן מספר בדיקה להוספה לתחילת שם הקובץ:", 
@@ -1181,6 +2338,35 @@ class PDFViewerApp:
         entry.pack(pady=10, padx=20)
         entry.focus_set()
         
+        # Live warning when the typed number is already used by another file
+        conflict_label = tk.Label(dialog, text="", font=("Arial", 9), fg="#D32F2F",
+                                  wraplength=320, justify=tk.RIGHT)
+        conflict_label.pack(padx=20)
+        
+        def on_entry_change(*args):
+            conflicts = self.find_number_conflicts(entry_var.get().strip())
+            if conflicts:
+                names = ", ".join(Path(p).name for p in conflicts[:2])
+                conflict_label.config(text=f"⚠️ המספר כבר בשימוש ({len(conflicts)}): {names}")
+            else:
+                conflict_label.config(text="")
+        
+        entry_var.trace_add("write", on_entry_change)
+        
+        # Suggest the detected number; it runs ahead of everything but the preview
+        path = self.selected_pdf
+        
+        def on_detected(detected):
+            if detected["number"] and dialog.winfo_exists() and not entry_var.get():
+                entry_var.set(detected["number"])
+                entry.select_range(0, tk.END)
+        
+        if self.quarantined(path) is None:
+            suggestion = self.run_in_worker(core.detect, (str(path),), on_detected,
+                                            lambda error: None, timeout=EXTRACT_TIMEOUT,
+                                            priority=SUGGESTION, key=str(path))
+            dialog.bind("<Destroy>", lambda e: suggestion.cancel() if e.widget is dialog else None)
+        
         result = [None]  # Use list to store result from nested functions
         
         def on_ok():
@@ -1208,12 +2394,149 @@ class PDFViewerApp:
         dialog.bind('<Return>', lambda e: on_ok())
         dialog.bind('<Escape>', lambda e: on_cancel())
         
-        # Make dialog modal
+        # Make dialog modal; background work waits while the operator decides
         dialog.grab_set()
-        self.root.wait_window(dialog)
+        self.pause_background()
+        try:
+            self.root.wait_window(dialog)
+        finally:
+            self.resume_background()
         
         return result[0]
     
+    def find_number_conflicts(self, inspection_num):
+        """Return the other files already using an inspection number"""
+        if not self.number_index or not inspection_num:
+            return []
+        return self.number_index.conflicts(inspection_num, exclude=self.selected_pdf)
+    
+    def export_manifest(self):
+        """Stream a CSV or JSON Lines listing of the folder's files with their numbers"""
+        if not self.catalog:
+            messagebox.showwarning("לא נבחרה תיקייה", 
+                                  "אנא בחר תיקייה תחילה.",
+                                  parent=self.root)
+            return
+        
+        path = filedialog.asksaveasfilename(title="ייצוא רשימת קבצים", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")],
+                                            parent=self.root)
+        if not path:
+            return
+        
+        import manifest_export
+        folder = self.current_folder
+        recursive = self.recursive_var.get()
+        cancelled = threading.Event()
+        progress = {"written": 0}
+        
+        # Progress window; the export walks the catalog on an I/O thread and hands
+        # missing fields to the workers
+        dialog = tk.Toplevel(self.root)
+        dialog.title("ייצוא רשימת קבצים")
+        dialog.transient(self.root)
+        progress_label = tk.Label(dialog, text="מייצא...", font=("Arial", 10), padx=20, pady=10)
+        progress_label.pack()
+        tk.Button(dialog, text="ביטול", command=cancelled.set).pack(pady=(0, 10))
+        
+        def submit(func, *args):
+            # Missing page counts and numbers are bulk work for the shared workers
+            return self.scheduler.submit(func, *args, priority=BULK)
+        
+        def run():
+            # The catalog connection belongs to this thread; the viewer keeps its own
+            catalog = FolderCatalog(folder, recursive=recursive)
+            try:
+                return manifest_export.export_manifest(
+                    folder, path, entries=catalog.iter_entries(), catalog=catalog, submit=submit,
+                    workers=len(self.worker_pool.workers), cancelled=cancelled,
+                    on_progress=lambda written: progress.update(written=written))
+            finally:
+                catalog.close()
+        
+        def poll():
+            if future.done():
+                return
+            if dialog.winfo_exists():
+                progress_label.config(text=f"נכתבו {progress['written']} שורות...")
+            self.root.after(200, poll)
+        
+        def on_done(written):
+            if dialog.winfo_exists():
+                dialog.destroy()
+            if written is not None:
+                messagebox.showinfo("ייצוא רשימת קבצים", f"נכתבו {written} שורות אל:\n{path}",
+                                  parent=self.root)
+        
+        def on_error(error):
+            if dialog.winfo_exists():
+                dialog.destroy()
+            messagebox.showerror("שגיאה", f"לא ניתן לייצא את הרשימה:\n{str(error)}",
+                               parent=self.root)
+        
+        future = self.scheduler.submit(run, priority=BULK, lane=IO)
+        dialog.protocol("WM_DELETE_WINDOW", cancelled.set)
+        self.deliver(future, on_done, on_error, poll_ms=200)
+        poll()
+    
+    def show_duplicate_numbers_report(self):
+        """Index a whole folder tree and report inspection numbers used more than once"""
+        initial_dir = self.current_folder.parent if self.current_folder else None
+        root_path = filedialog.askdirectory(title="בחר תיקייה ראשית לבדיקת כפילויות",
+                                            initialdir=initial_dir)
+        if not root_path:
+            return
+        
+        if self.number_index is None:
+            self.number_index = InspectionNumberIndex()
+        
+        def on_listed(listings):
+            for folder, names in listings:
+                self.number_index.index_folder(folder, names)
+            self.show_duplicates_dialog(root_path, self.number_index.duplicates(root=root_path))
+        
+        def on_error(error):
+            messagebox.showerror("שגיאה בקריאת תיקייה", 
+                               f"לא ניתן לקרוא את התיקייה:\n{str(error)}",
+                               parent=self.root)
+        
+        self.deliver(self.scheduler.submit(list_tree_pdf_names, root_path, priority=SUGGESTION,
+                                           lane=IO),
+                     on_listed, on_error, poll_ms=100)
+    
+    def show_duplicates_dialog(self, root_path, duplicates):
+        """Display inspection numbers that are used by more than one file"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("מספרי בדיקה כפולים")
+        dialog.transient(self.root)
+        
+        # Position dialog near the buttons
+        self.position_dialog_near_buttons(dialog, width=600, height=500)
+        
+        if duplicates:
+            tk.Label(dialog, text=f"⚠️ נמצאו {len(duplicates)} מספרי בדיקה כפולים", 
+                    font=("Arial", 12, "bold"), fg="#F57C00").pack(pady=10)
+        else:
+            tk.Label(dialog, text="✅ לא נמצאו מספרי בדיקה כפולים", 
+                    font=("Arial", 12, "bold"), fg="#2E7D32").pack(pady=10)
+        
+        text_widget = tk.Text(dialog, wrap=tk.NONE, height=20, font=("Courier New", 9))
+        text_widget.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        for number, paths in duplicates.items():
+            text_widget.insert(tk.END, f"{number}:\n")
+            for path in paths:
+                text_widget.insert(tk.END, f"   {os.path.relpath(path, root_path)}\n")
+        text_widget.config(state=tk.DISABLED)
+        
+        # Close button
+        button_frame = tk.Frame(dialog)
+        button_frame.pack(pady=10)
+        
+        tk.Button(button_frame, text="סגור", command=dialog.destroy,
+                 font=("Arial", 10, "bold"), bg="#607D8B", fg="white",
+                 padx=30, pady=8, relief=tk.RAISED, bd=3,
+                 activebackground="#546E7A", activeforeground="white").pack()
+    
     def create_standard_rename_dialog(self, current_name):
         """Create a custom positioned dialog for standard rename"""
         # Create dialog window
@@ -1262,9 +2585,13 @@ class PDFViewerApp:
         dialog.bind('<Return>', lambda e: on_ok())
         dialog.bind('<Escape>', lambda e: on_cancel())
         
-        # Make dialog modal
+        # Make dialog modal; background work waits while the operator decides
         dialog.grab_set()
-        self.root.wait_window(dialog)
+        self.pause_background()
+        try:
+            self.root.wait_window(dialog)
+        finally:
+            self.resume_background()
         
         return result[0]
     
@@ -1336,67 +2663,425 @@ class PDFViewerApp:
         if not new_name:
             return  # User cancelled
         
-        # Clean the filename (remove invalid characters)
-        invalid_chars = '<>:"/\\|?*'
-        new_name = "".join(c for c in new_name if c not in invalid_chars)
-        
-        if not new_name:
+        plan = core.plan_name_rename(self.selected_pdf, new_name)
+        if plan is None:
             messagebox.showerror("קלט לא תקין", 
                                "שם הקובץ לא יכול להיות רק תווים מיוחדים.",
                                parent=self.root)
             return
         
-        # Add .pdf extension
-        new_name = f"{new_name}.pdf"
-        new_path = self.selected_pdf.parent / new_name
-        
         # Check if trying to rename to same name
-        if new_path == self.selected_pdf:
+        if plan.unchanged:
             messagebox.showinfo("אין שינוי", "שם הקובץ לא השתנה.",
                               parent=self.root)
             return
         
-        # Check if file already exists
-        if new_path.exists():
-            if not messagebox.askyesno("הקובץ קיים", 
-                                      f"קובץ בשם '{new_name}' כבר קיים.\nלהחליף אותו?",
-                                      parent=self.root):
+        self.apply_rename_plan(plan)
+    
+    def bulk_rename(self):
+        """Rename the selected files, or every listed file, by a name template"""
+        if not self.pdf_entries:
+            messagebox.showwarning("אין קבצים", 
+                                  "אנא בחר תיקייה עם קבצי PDF תחילה.",
+                                  parent=self.root)
+            return
+        
+        bulk = self.create_bulk_rename_dialog()
+        if bulk is None:
+            return  # User cancelled
+        
+        folder = self.current_folder
+        
+        def on_applied(outcome):
+            renamed, failed = outcome
+            if folder != self.current_folder:
                 return
+            for old_name, new_name in renamed:
+                old_path, new_path = folder / old_name, folder / new_name
+                self.on_file_renamed(old_path, new_path)
+                if self.selected_pdf == old_path:
+                    self.selected_pdf = new_path
+                    self.filename_label.config(text=new_path.name)
+            self.refresh_file_list()
+            if failed:
+                messagebox.showerror("שגיאה בשינוי שם", 
+                                   f"שמם של {len(renamed)} קבצים שונה, {len(failed)} נכשלו:\n"
+                                   + "\n".join(f"{name}: {error}" for name, error in failed[:5]),
+                                   parent=self.root)
+            else:
+                messagebox.showinfo("הצלחה", f"שמם של {len(renamed)} קבצים שונה.",
+                                  parent=self.root)
         
-        try:
-            # Rename the file
-            self.selected_pdf.rename(new_path)
-            
-            # Update internal state
-            self.selected_pdf = new_path
-            
-            # Reload file list without clearing preview
-            self.load_pdf_files(clear_preview=False)
-            
-            # Reselect the renamed file
-            new_index = self.pdf_files.index(self.selected_pdf)
-            self.pdf_listbox.selection_clear(0, tk.END)
-            self.pdf_listbox.selection_set(new_index)
-            self.pdf_listbox.see(new_index)
-            
-            # Update filename display and refresh preview
-            self.filename_label.config(text=self.selected_pdf.name)
-            self.preview_pdf()  # Refresh the preview
-            
-            messagebox.showinfo("הצלחה", f"שם הקובץ שונה ל:\n{new_name}",
-                              parent=self.root)
-            
-        except Exception as e:
+        def on_error(error):
             messagebox.showerror("שגיאה בשינוי שם", 
-                               f"לא ניתן לשנות את שם הקובץ:\n{str(e)}",
+                               f"לא ניתן לשנות את שמות הקבצים:\n{str(error)}",
                                parent=self.root)
+        
+        # The whole batch is one operation on an I/O thread; a large batch on a share
+        # legitimately takes longer than a single rename
+        self.run_file_operation(bulk.apply, (), on_applied, on_error, timeout=None)
+    
+    def create_bulk_rename_dialog(self):
+        """Dialog for a template rename with a lazily computed before/after table
+        Returns:
+            the checked bulk_rename.BulkRename to apply, or None if cancelled
+        """
+        import bulk_rename
+        
+        selected = [self.pdf_entries[i] for i in sorted(self.list_selection)]
+        existing = [entry.name for entry in self.file_model.entries]
+        
+        def number_of(name):
+            record = self.catalog.get(name) if self.catalog else None
+            return record["numbers"][0] if record and record["numbers"] else None
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("שינוי שם מרובה")
+        dialog.transient(self.root)
+        
+        scope_var = tk.StringVar(value="selected" if len(selected) > 1 else "listed")
+        scope_frame = tk.Frame(dialog)
+        scope_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        tk.Radiobutton(scope_frame, text=f"הקבצים שנבחרו ({len(selected)})", variable=scope_var,
+                      value="selected", state=tk.NORMAL if len(selected) > 1 else tk.DISABLED,
+                      font=("Arial", 10)).pack(side=tk.RIGHT)
+        tk.Radiobutton(scope_frame, text=f"כל הקבצים ברשימה ({len(self.pdf_entries)})",
+                      variable=scope_var, value="listed", font=("Arial", 10)).pack(side=tk.RIGHT)
+        
+        fields_frame = tk.Frame(dialog)
+        fields_frame.pack(fill=tk.X, padx=10, pady=5)
+        template_var = tk.StringVar(value="{stem}")
+        pattern_var = tk.StringVar()
+        replacement_var = tk.StringVar()
+        for row, (label, var) in enumerate([("תבנית שם (ללא סיומת .pdf):", template_var),
+                                            ("ביטוי רגולרי להחלפה בשם:", pattern_var),
+                                            ("החלפה:", replacement_var)]):
+            tk.Label(fields_frame, text=label, font=("Arial", 10)).grid(row=row, column=1, sticky=tk.E)
+            entry = tk.Entry(fields_frame, textvariable=var, font=("Arial", 11), width=40)
+            entry.grid(row=row, column=0, sticky=tk.EW, pady=2)
+            if row == 0:
+                template_entry = entry
+        fields_frame.columnconfigure(0, weight=1)
+        tk.Label(dialog, text="שדות: {number} {stem} {name} {mtime:%Y%m%d} {size} {counter:03d}",
+                font=("Arial", 9), fg="#555555").pack(padx=10, anchor=tk.E)
+        
+        # Before/after table: a fixed number of rows scrolled over the batch, so only
+        # the names of the rows in view are ever computed
+        table_frame = tk.Frame(dialog)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        table = ttk.Treeview(table_frame, columns=("old", "new"), show="headings",
+                             height=BULK_PREVIEW_ROWS, selectmode="none")
+        table.heading("old", text="שם נוכחי")
+        table.heading("new", text="שם חדש")
+        table.column("old", width=320)
+        table.column("new", width=320)
+        table.tag_configure("problem", background="#FFCDD2")
+        table_scrollbar = tk.Scrollbar(table_frame)
+        table_scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+        table.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        
+        status_label = tk.Label(dialog, text="", font=("Arial", 10))
+        status_label.pack(padx=10, anchor=tk.E)
+        
+        state = {"bulk": None, "offset": 0, "problems": {}, "pending": None}
+        result = [None]
+        
+        def build():
+            """Make a new batch from the fields, or say why they are invalid"""
+            state["pending"] = None
+            if not dialog.winfo_exists():
+                return
+            state["problems"] = {}
+            entries = selected if scope_var.get() == "selected" else self.pdf_entries
+            try:
+                template = bulk_rename.RenameTemplate(template_var.get(), pattern_var.get() or None,
+                                                      replacement_var.get())
+            except (ValueError, re.error) as e:
+                state["bulk"] = None
+                status_label.config(text=f"תבנית לא תקינה: {e}", fg="#C62828")
+                show_rows()
+                return
+            state["bulk"] = bulk_rename.BulkRename(self.current_folder, entries, template,
+                                                   existing, number_of)
+            status_label.config(text=f"{len(entries)} קבצים", fg="black")
+            show_rows()
+        
+        def schedule_build(*_):
+            # Rebuild once typing pauses rather than on every key
+            if state["pending"]:
+                dialog.after_cancel(state["pending"])
+            state["pending"] = dialog.after(150, build)
+        
+        def show_rows():
+            table.delete(*table.get_children())
+            bulk = state["bulk"]
+            if bulk is None:
+                table_scrollbar.set(0, 1)
+                return
+            offset = state["offset"] = max(0, min(state["offset"], len(bulk) - BULK_PREVIEW_ROWS))
+            for index, (old_name, new_name) in enumerate(bulk.rows(offset, offset + BULK_PREVIEW_ROWS),
+                                                       start=offset):
+                tags = ("problem",) if index in state["problems"] else ()
+                table.insert("", tk.END, values=(old_name, new_name or "—"), tags=tags)
+            total = max(1, len(bulk))
+            table_scrollbar.set(offset / total, min(1.0, (offset + BULK_PREVIEW_ROWS) / total))
+        
+        def on_scroll(action, amount, unit=None):
+            bulk = state["bulk"]
+            if bulk is None:
+                return
+            if action == "moveto":
+                state["offset"] = int(float(amount) * len(bulk))
+            else:
+                step = BULK_PREVIEW_ROWS if unit == "pages" else 1
+                state["offset"] += int(amount) * step
+            show_rows()
+        
+        def on_wheel(event):
+            direction = -1 if getattr(event, "delta", 0) > 0 or getattr(event, "num", 0) == 4 else 1
+            on_scroll("scroll", direction * 3, "units")
+            return "break"
+        
+        table_scrollbar.config(command=on_scroll)
+        table.bind("<MouseWheel>", on_wheel)
+        table.bind("<Button-4>", on_wheel)
+        table.bind("<Button-5>", on_wheel)
+        for var in (template_var, pattern_var, replacement_var, scope_var):
+            var.trace_add("write", schedule_build)
+        
+        def on_apply():
+            if state["pending"]:
+                build()
+            bulk = state["bulk"]
+            if bulk is None:
+                return
+            # Every new name is computed here, and checked against the listing in memory
+            problems = bulk.problems()
+            if problems:
+                state["problems"] = problems
+                state["offset"] = min(problems)
+                show_rows()
+                counts = {}
+                for problem in problems.values():
+                    counts[problem] = counts.get(problem, 0) + 1
+                status_label.config(text="; ".join(f"{BULK_PROBLEMS[problem]}: {count}"
+                                                   for problem, count in counts.items()),
+                                    fg="#C62828")
+                return
+            changes = bulk.changes()
+            if not changes:
+                messagebox.showinfo("אין שינוי", "שמות הקבצים לא השתנו.", parent=dialog)
+                return
+            if messagebox.askyesno("שינוי שם מרובה", f"לשנות את שמם של {len(changes)} קבצים?",
+                                   parent=dialog):
+                result[0] = bulk
+                dialog.destroy()
+        
+        button_frame = tk.Frame(dialog)
+        button_frame.pack(pady=10)
+        tk.Button(button_frame, text="החל", command=on_apply, 
+                 font=("Arial", 12, "bold"), bg="#4CAF50", fg="white", 
+                 padx=30, pady=5, relief=tk.RAISED, bd=3,
+                 activebackground="#45a049", activeforeground="white").pack(side=tk.RIGHT, padx=3)
+        tk.Button(button_frame, text="ביטול", command=dialog.destroy, 
+                 font=("Arial", 12, "bold"), bg="#f44336", fg="white", 
+                 padx=30, pady=5, relief=tk.RAISED, bd=3,
+                 activebackground="#da190b", activeforeground="white").pack(side=tk.RIGHT, padx=3)
+        dialog.bind('<Escape>', lambda e: dialog.destroy())
+        
+        build()
+        template_entry.focus_set()
+        template_entry.select_range(0, tk.END)
+        
+        # Make dialog modal; background work waits while the operator decides
+        dialog.grab_set()
+        self.pause_background()
+        try:
+            self.root.wait_window(dialog)
+        finally:
+            self.resume_background()
+        
+        return result[0]
 
 
-def main():
+def main(profile_startup=False, trace_path=None):
+    """Start the viewer
+    Args:
+        profile_startup: Print import, first-paint and warm-up milestones, then exit
+        trace_path: Record timing spans from the start and save them here on exit
+    """
+    profile = StartupProfile(STARTED) if profile_startup else None
+    if profile:
+        profile.mark("modules imported")
+    if trace_path:
+        tracing.tracer.enable()
     root = tk.Tk()
-    app = PDFViewerApp(root)
+    app = PDFViewerApp(root, profile)
     root.mainloop()
+    if trace_path:
+        tracing.tracer.export(trace_path)
+
+
+def daemon_main(argv):
+    """Run the headless watch-folder daemon (app.py --watch <folder> ...)"""
+    import argparse
+    import logging
+    from watch_daemon import POLL_INTERVAL, SETTLE_TIME, WatchDaemon
+
+    parser = argparse.ArgumentParser(description="Rename incoming PDFs by inspection number")
+    parser.add_argument("--watch", required=True, help="Folder the scanners write to")
+    parser.add_argument("--review", required=True, help="Folder for files that need manual review")
+    parser.add_argument("--done", help="Move renamed files here instead of renaming in place")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--threshold", type=float, default=detection.HIGH_CONFIDENCE,
+                        help="Minimum confidence for an automatic rename")
+    parser.add_argument("--no-ocr", action="store_true", help="Only use the text layer")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Polling interval (s)")
+    parser.add_argument("--settle", type=float, default=SETTLE_TIME,
+                        help="Seconds a file must stay unchanged before processing")
+    parser.add_argument("--status-file", help="JSON file updated with the daemon metrics")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    WatchDaemon(args.watch, args.review, done_dir=args.done, workers=args.workers,
+                threshold=args.threshold, allow_ocr=not args.no_ocr,
+                poll_interval=args.interval, settle_time=args.settle,
+                status_file=args.status_file).run_forever()
+
+
+def serve_main(argv):
+    """Run the local detection service (app.py --serve ...)"""
+    import argparse
+    import logging
+    from extraction_service import DEFAULT_MAX_QUEUE, DEFAULT_PORT, TASK_TIMEOUT, serve_forever
+
+    parser = argparse.ArgumentParser(description="Serve inspection number detection over HTTP on localhost")
+    parser.add_argument("--serve", action="store_true")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Files waiting before requests are refused with 503")
+    parser.add_argument("--timeout", type=float, default=TASK_TIMEOUT,
+                        help="Seconds a file may take before it is quarantined")
+    parser.add_argument("--no-ocr", action="store_true", help="Only use the text layer")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    serve_forever(port=args.port, workers=args.workers, max_queue=args.max_queue,
+                  allow_ocr=not args.no_ocr, timeout=args.timeout)
+
+
+def export_main(argv):
+    """Write a manifest of a folder's PDFs without the GUI (app.py --export <folder> ...)"""
+    import argparse
+    from manifest_export import DETECT_MODES, DETECT_TEXT, export_manifest, walk_entries
+
+    parser = argparse.ArgumentParser(description="Export a CSV or JSON Lines listing of a folder's PDFs")
+    parser.add_argument("--export", required=True, help="Folder to list")
+    parser.add_argument("--output", required=True, help="Manifest file (.csv or .jsonl)")
+    parser.add_argument("--recursive", action="store_true", help="Include subfolders")
+    parser.add_argument("--detect", choices=DETECT_MODES, default=DETECT_TEXT,
+                        help="How to find the numbers of files without one in their name")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    args = parser.parse_args(argv)
+
+    catalog = FolderCatalog(args.export, recursive=args.recursive)
+
+    def entries():
+        # Listed files are added to the catalog so computed fields are kept
+        for name, identity in walk_entries(args.export, recursive=args.recursive):
+            catalog.merge({name: identity})
+            yield name, identity
+
+    try:
+        with SupervisedPool(workers=args.workers) as pool:
+            written = export_manifest(
+                args.export, args.output, entries=entries(), catalog=catalog, submit=pool.submit,
+                workers=args.workers, detect=args.detect,
+                on_progress=lambda written: print(f"{written} rows written", flush=True))
+    except KeyboardInterrupt:
+        print("Interrupted; nothing was written.")
+        return
+    finally:
+        catalog.close()
+    print(f"Wrote {written} rows to {args.output}")
+
+
+def format_duration(seconds):
+    """Format seconds as H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def batch_main(argv):
+    """Run a resumable batch detection over a folder (app.py --batch <folder> ...)"""
+    import argparse
+    from batch_job import DEFAULT_RETRIES, DEFAULT_TASK_TIMEOUT, BatchJob
+    from supervisor import DEFAULT_MEMORY_LIMIT_MB
+
+    parser = argparse.ArgumentParser(description="Detect inspection numbers for a whole folder")
+    parser.add_argument("--batch", required=True, help="Folder to process")
+    parser.add_argument("--ocr", action="store_true", help="Run the full OCR pass on every file")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Retries per failing file in this run")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--checkpoint", help="Checkpoint database (default: per folder)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TASK_TIMEOUT,
+                        help="Seconds a file may take before it is quarantined")
+    parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT_MB,
+                        help="Worker memory limit in MB before a file is quarantined")
+    args = parser.parse_args(argv)
+
+    if args.ocr:
+        error = detection.check_tesseract() if detection.OCR_AVAILABLE else "pytesseract לא מותקן"
+        if error:
+            raise SystemExit(error)
+
+    quarantine = Quarantine()
+    job = BatchJob(args.batch, checkpoint_path=args.checkpoint, ocr_only=args.ocr,
+                   retries=args.retries, timeout=args.timeout,
+                   memory_limit_mb=args.memory_limit, quarantine=quarantine)
+    # Results also go to the folder catalog, so the viewer shows them right away
+    catalog = FolderCatalog(args.batch)
+    catalog.reconcile(scan_folder(args.batch))
+
+    def on_result(name, result):
+        catalog.record_detection(name, result["numbers"], result["confidence"], result["source"])
+
+    def on_progress(progress):
+        rate = progress["files_per_minute"]
+        eta = progress["eta_seconds"]
+        print(f"{progress['done']}/{progress['total']} done, {progress['failed']} failed, "
+              f"{progress['quarantined']} quarantined"
+              + (f", {rate:.1f} files/min" if rate else "")
+              + (f", ETA {format_duration(eta)}" if eta is not None else ""), flush=True)
+
+    try:
+        final = job.run(workers=args.workers, on_progress=on_progress, on_result=on_result)
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.")
+        return
+    finally:
+        catalog.close()
+        job.close()
+        quarantine.close()
+    print(f"Finished: {final['done']}/{final['total']} files done.")
+    if final["failed"]:
+        print(f"{final['failed']} files failed; run again to retry them.")
 
 
 if __name__ == "__main__":
-    main()
+    import sys
+    if "--watch" in sys.argv[1:]:
+        daemon_main(sys.argv[1:])
+    elif "--batch" in sys.argv[1:]:
+        batch_main(sys.argv[1:])
+    elif "--serve" in sys.argv[1:]:
+        serve_main(sys.argv[1:])
+    elif "--export" in sys.argv[1:]:
+        export_main(sys.argv[1:])
+    else:
+        trace_path = None
+        if "--trace" in sys.argv[1:-1]:
+            trace_path = sys.argv[sys.argv.index("--trace") + 1]
+        main(profile_startup="--profile-startup" in sys.argv[1:], trace_path=trace_path)
@@ -0,0 +1,255 @@
+"""
+Checkpointed, resumable batch detection over a folder.
+
+Every finished file is committed to a checkpoint database as soon as its result
+is known, so a crash or reboot loses at most the files that were in flight.
+Running the same job again skips finished work and only retries the failures.
+Throughput and ETA are computed from the recorded per-file durations, so they
+stay meaningful across restarts.
+"""
+
+import hashlib
+import json
+import sqlite3
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from pathlib import Path
+
+from catalog import is_numbered, scan_folder
+import core
+from supervisor import DEFAULT_MEMORY_LIMIT_MB, SupervisedPool, TaskFailed
+
+JOB_DIR = Path.home() / ".pdf_renamer" / "jobs"
+
+DEFAULT_RETRIES = 2
+DEFAULT_TASK_TIMEOUT = 120  # Seconds per file before it is quarantined
+THROUGHPUT_WINDOW = 50  # Recent completions used for throughput and ETA
+
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_QUARANTINED = "quarantined"  # Hung, crashed or ran out of memory; not retried
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    number TEXT,
+    numbers TEXT,
+    confidence REAL,
+    source TEXT,
+    error TEXT,
+    duration REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_job_finished ON job_files (status, finished_at);
+"""
+
+
+def checkpoint_path_for(folder, ocr_only=False):
+    """Return the checkpoint database path of a batch job over a folder"""
+    key = hashlib.sha1(str(Path(folder).resolve()).encode("utf-8")).hexdigest()
+    suffix = "-ocr" if ocr_only else ""
+    return JOB_DIR / f"{key}{suffix}.sqlite3"
+
+
+class BatchJob:
+    """A resumable detection run over the PDF files of one folder"""
+
+    def __init__(self, folder, checkpoint_path=None, ocr_only=False,
+                 retries=DEFAULT_RETRIES, unnumbered_only=True, timeout=DEFAULT_TASK_TIMEOUT,
+                 memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, quarantine=None):
+        """
+        Args:
+            folder: Folder whose PDF files are processed
+            checkpoint_path: Checkpoint database (default: under ~/.pdf_renamer/jobs)
+            ocr_only: Run the full OCR pass on every file
+            retries: How many times a failing file is retried within one run
+            unnumbered_only: Skip files that already have an inspection number
+            timeout: Wall-clock seconds a file may take
+            memory_limit_mb: Resident memory a worker may use on one file
+            quarantine: Optional Quarantine that records files which hung or crashed
+        """
+        self.folder = Path(folder)
+        self.ocr_only = ocr_only
+        self.retries = retries
+        self.unnumbered_only = unnumbered_only
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.quarantine = quarantine
+        self.checkpoint_path = (Path(checkpoint_path) if checkpoint_path
+                                else checkpoint_path_for(folder, ocr_only))
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.checkpoint_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.total = 0
+        self.workers = 1
+        self.statuses = {}  # Name -> checkpointed status of the current inputs
+        self.counts = Counter()  # Status -> number of current inputs with it
+
+    def close(self):
+        """Close the checkpoint database"""
+        self.conn.close()
+
+    def pending(self):
+        """List the files that still need processing
+        Finished and quarantined files are skipped unless they changed on disk since.
+        Returns:
+            dict mapping file name -> (size, mtime_ns)
+        """
+        entries = scan_folder(self.folder)
+        if self.unnumbered_only:
+            entries = {name: identity for name, identity in entries.items()
+                       if not is_numbered(name)}
+        self.total = len(entries)
+
+        # Rows of files renamed or modified since they were checkpointed do not count
+        self.statuses = {}
+        for name, size, mtime_ns, status in self.conn.execute(
+                "SELECT name, size, mtime_ns, status FROM job_files"):
+            if name in entries and tuple(entries[name]) == (size, mtime_ns):
+                self.statuses[name] = status
+        self.counts = Counter(self.statuses.values())
+        return {name: identity for name, identity in entries.items()
+                if self.statuses.get(name) not in (STATUS_DONE, STATUS_QUARANTINED)}
+
+    def set_status(self, name, status):
+        """Count the new checkpointed status of a current input"""
+        previous = self.statuses.get(name)
+        if previous is not None:
+            self.counts[previous] -= 1
+        self.statuses[name] = status
+        self.counts[status] += 1
+
+    def record_success(self, name, identity, result):
+        """Checkpoint a finished file"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO job_files (name, size, mtime_ns, status, attempts, number, numbers, "
+                "confidence, source, error, duration, finished_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, NULL, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET size = excluded.size, "
+                "mtime_ns = excluded.mtime_ns, status = excluded.status, "
+                "attempts = attempts + 1, number = excluded.number, numbers = excluded.numbers, "
+                "confidence = excluded.confidence, source = excluded.source, error = NULL, "
+                "duration = excluded.duration, finished_at = excluded.finished_at",
+                (name, identity[0], identity[1], STATUS_DONE, result["number"],
+                 json.dumps(result["numbers"]), result["confidence"], result["source"],
+                 result["duration"], time.time()))
+        self.set_status(name, STATUS_DONE)
+
+    def record_failure(self, name, identity, error, status=STATUS_FAILED):
+        """Checkpoint a failed attempt"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO job_files (name, size, mtime_ns, status, attempts, error, finished_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET size = excluded.size, "
+                "mtime_ns = excluded.mtime_ns, status = excluded.status, "
+                "attempts = attempts + 1, error = excluded.error, "
+                "finished_at = excluded.finished_at",
+                (name, identity[0], identity[1], status, str(error), time.time()))
+        self.set_status(name, status)
+
+    def results(self):
+        """Return the checkpointed rows as dicts, in name order"""
+        rows = self.conn.execute("SELECT * FROM job_files ORDER BY name").fetchall()
+        results = []
+        for row in rows:
+            record = dict(row)
+            record["numbers"] = json.loads(record["numbers"]) if record["numbers"] else []
+            results.append(record)
+        return results
+
+    def progress(self):
+        """Summarize the job from the checkpoint history
+        Counts cover the files listed by the last pending() call whose checkpoint
+        still matches their size and modification time.
+        Returns:
+            dict with total, done, failed, quarantined, remaining, files_per_minute
+            and eta_seconds (None until a file has finished)
+        """
+        done = self.counts[STATUS_DONE]
+        failed = self.counts[STATUS_FAILED]
+        quarantined = self.counts[STATUS_QUARANTINED]
+        remaining = max(0, self.total - done - quarantined)
+
+        durations = [row[0] for row in self.conn.execute(
+            "SELECT duration FROM job_files WHERE status = ? AND duration IS NOT NULL "
+            "ORDER BY finished_at DESC LIMIT ?", (STATUS_DONE, THROUGHPUT_WINDOW))]
+        files_per_minute = None
+        eta_seconds = None
+        if durations:
+            # Per-file work time survives restarts, unlike wall-clock gaps between files
+            seconds_per_file = sum(durations) / len(durations) / self.workers
+            if seconds_per_file > 0:
+                files_per_minute = 60 / seconds_per_file
+            eta_seconds = remaining * seconds_per_file
+        return {
+            "total": self.total,
+            "done": done,
+            "failed": failed,
+            "quarantined": quarantined,
+            "remaining": remaining,
+            "files_per_minute": files_per_minute,
+            "eta_seconds": eta_seconds,
+        }
+
+    def run(self, workers=1, on_progress=None, on_result=None):
+        """Process the pending files, checkpointing each one as it finishes
+        Args:
+            workers: Number of worker processes
+            on_progress: Optional callback(progress dict) after every file
+            on_result: Optional callback(name, result) for every successful file
+        Returns:
+            the final progress dict
+        """
+        self.workers = max(1, workers)
+        todo = self.pending()
+        queue = deque(todo)
+        attempts = {}
+
+        with SupervisedPool(workers=self.workers, timeout=self.timeout,
+                            memory_limit_mb=self.memory_limit_mb) as pool:
+            running = {}
+            try:
+                while queue or running:
+                    # Keep the workers fed without submitting the whole folder at once
+                    while queue and len(running) < self.workers * 2:
+                        name = queue.popleft()
+                        future = pool.submit(core.detect, str(self.folder / name), True,
+                                             self.ocr_only)
+                        running[future] = name
+
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        try:
+                            result = future.result()
+                        except TaskFailed as e:
+                            # Retrying a hang or a memory blow-up would only repeat it
+                            self.record_failure(name, todo[name], f"{e.reason}: {e}",
+                                                STATUS_QUARANTINED)
+                            if self.quarantine:
+                                self.quarantine.add(self.folder / name, e.reason, str(e))
+                        except Exception as e:
+                            self.record_failure(name, todo[name], e)
+                            attempts[name] = attempts.get(name, 0) + 1
+                            if attempts[name] <= self.retries:
+                                queue.append(name)
+                        else:
+                            self.record_success(name, todo[name], result)
+                            if on_result:
+                                on_result(name, result)
+                        if on_progress:
+                            on_progress(self.progress())
+            except KeyboardInterrupt:
+                # Everything finished so far is already checkpointed
+                raise
+        return self.progress()
@@ -0,0 +1,287 @@
+"""
+Benchmarks of the render, detection and listing hot paths.
+
+Each benchmark runs the GUI-free function behind one viewer action on a
+synthetic corpus (see synthetic_corpus.py), with warmup runs and repeats, and
+reports p50/p95 latency, throughput and the peak resident memory of the process
+during the runs. Results are saved as JSON baselines so two revisions can be
+compared:
+
+    python benchmark.py --output baseline.json
+    ... change something ...
+    python benchmark.py --compare baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+import detection
+import render_service
+import rendering
+import synthetic_corpus
+from catalog import FolderCatalog, scan_folder
+from file_filter import SORT_NATURAL, FileListModel
+from supervisor import process_rss
+
+DEFAULT_WARMUP = 1
+DEFAULT_REPEATS = 5
+DEFAULT_LARGE_FOLDER = 10_000
+REGRESSION_THRESHOLD = 0.10  # Relative p50 slowdown reported as a regression
+REGRESSION_MIN_MS = 0.1  # Smaller absolute slowdowns are timer noise
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+def percentile(values, fraction):
+    """Return the value at a fraction (0..1) of the sorted values, interpolated"""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class PeakRss:
+    """Samples the resident memory of this process on a thread while active"""
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        pid = os.getpid()
+        while True:
+            self.peak = max(self.peak, process_rss(pid) or 0)
+            if self.stop.wait(self.interval):
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop.set()
+        self.thread.join()
+
+
+def measure(func, inputs, warmup=DEFAULT_WARMUP, repeats=DEFAULT_REPEATS):
+    """Time func over every input, repeats times, after warmup passes
+    Returns:
+        dict with runs, p50_ms, p95_ms, mean_ms, per_second and peak_rss_mb
+    """
+    for _ in range(warmup):
+        for item in inputs:
+            func(item)
+
+    durations = []
+    with PeakRss() as rss:
+        for _ in range(repeats):
+            for item in inputs:
+                started = time.perf_counter()
+                func(item)
+                durations.append(time.perf_counter() - started)
+    total = sum(durations)
+    return {
+        "runs": len(durations),
+        "p50_ms": percentile(durations, 0.5) * 1000,
+        "p95_ms": percentile(durations, 0.95) * 1000,
+        "mean_ms": total / len(durations) * 1000,
+        "per_second": len(durations) / total if total > 0 else None,
+        "peak_rss_mb": rss.peak / (1024 * 1024) if rss.peak else None,
+    }
+
+
+def build_benchmarks(corpus_dir, large_dir):
+    """Return (name, function, inputs) for every benchmark
+    Args:
+        corpus_dir: Folder made by synthetic_corpus.generate_corpus
+        large_dir: Folder made by synthetic_corpus.generate_large_folder (or None)
+    """
+    records = synthetic_corpus.read_manifest(corpus_dir)
+
+    def paths(*kinds):
+        return [str(Path(corpus_dir) / r["name"]) for r in records if r["kind"] in kinds]
+
+    def page_requests(files):
+        # The zoom and layout size update_visible_pages requests the first page at
+        requests = []
+        for path in files:
+            with fitz.open(path) as document:
+                rect = document[0].rect
+            requests.append((path, rendering.page_preview_zoom(rect.width, rect.height),
+                             rendering.display_size(rect)))
+        return requests
+
+    def preview_page(request):
+        # The render service's worker render, then its downscale to the layout size
+        path, zoom, size = request
+        result = rendering.render_region(path, 0, None, zoom)
+        return render_service.derive(result["image"], render_service.FULL_PAGE,
+                                     render_service.FULL_PAGE, 1.0, size)
+
+    text_files = paths("text", "decoy", "unnumbered")
+    benchmarks = [
+        # preview_pdf: instant draft, then the sharp first page
+        ("preview_draft", rendering.render_draft, text_files),
+        ("preview_page", preview_page, page_requests(text_files)),
+        ("preview_page_oversized", preview_page, page_requests(paths("oversized"))),
+        ("thumbnail", rendering.render_thumbnail, text_files),
+        # extract_text: text layer of the search region
+        ("extract_text", detection.detect_text_numbers, text_files + paths("oversized")),
+    ]
+    if detection.OCR_AVAILABLE and detection.check_tesseract() is None:
+        # extract_text_with_ocr on scans without a text layer
+        benchmarks.append(("extract_text_with_ocr", detection.detect_ocr_numbers, paths("scanned")))
+
+    if large_dir:
+        # load_pdf_files: folder scan, catalog reconcile, then the filtered and sorted list
+        def load_folder(folder):
+            entries = scan_folder(folder)
+            with tempfile.TemporaryDirectory() as tmp:
+                catalog = FolderCatalog(folder, db_path=Path(tmp) / "catalog.sqlite3")
+                try:
+                    catalog.reconcile(entries)
+                    model = FileListModel()
+                    model.set_entries(catalog.entries())
+                    return model.query(sort_mode=SORT_NATURAL)
+                finally:
+                    catalog.close()
+
+        def refresh_list(entries):
+            # A fresh model each time: a repeated query would be served from its cache
+            model = FileListModel()
+            model.set_entries(entries)
+            model.query(sort_mode=SORT_NATURAL)
+            return model.query("scan_1", sort_mode=SORT_NATURAL)
+
+        entries = [(name, size, mtime_ns, None)
+                   for name, (size, mtime_ns) in scan_folder(large_dir).items()]
+        benchmarks.append(("load_pdf_files", load_folder, [str(large_dir)]))
+        benchmarks.append(("refresh_file_list", refresh_list, [entries]))
+    return benchmarks
+
+
+def git_revision():
+    """Return the current git revision of the checkout, or None"""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5, cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmarks(work_dir, per_kind=5, large_folder=DEFAULT_LARGE_FOLDER,
+                   warmup=DEFAULT_WARMUP, repeats=DEFAULT_REPEATS, only=None, log=print):
+    """Generate the corpus in work_dir and run every benchmark
+    Args:
+        large_folder: Files in the listing folder (0 = skip the listing benchmarks)
+        only: Optional collection of benchmark names to run
+        log: Callable receiving progress lines
+    Returns:
+        baseline dict (revision, environment and results by benchmark name)
+    """
+    work_dir = Path(work_dir)
+    corpus_dir = work_dir / "corpus"
+    large_dir = work_dir / "large" if large_folder else None
+    log(f"Generating corpus ({per_kind} per kind)...")
+    synthetic_corpus.generate_corpus(corpus_dir, per_kind)
+    if large_dir:
+        log(f"Generating listing folder ({large_folder} files)...")
+        synthetic_corpus.generate_large_folder(large_dir, large_folder)
+
+    results = {}
+    for name, func, inputs in build_benchmarks(corpus_dir, large_dir):
+        if only and name not in only:
+            continue
+        results[name] = measure(func, inputs, warmup, repeats)
+        log(format_result(name, results[name]))
+    return {
+        "revision": git_revision(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"per_kind": per_kind, "large_folder": large_folder,
+                     "warmup": warmup, "repeats": repeats},
+        "results": results,
+    }
+
+
+def format_result(name, result):
+    """Return one printable line for a benchmark result"""
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] else "?"
+    per_second = f"{result['per_second']:.1f}/s" if result["per_second"] else "-"
+    return (f"{name:<24} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+            f"{per_second:>10}  peak RSS {rss}")
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Compare two baselines by p50 latency
+    Returns:
+        list of (name, baseline p50, current p50, relative change, regressed) for
+        the benchmarks present in both
+    """
+    rows = []
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        slowdown = result["p50_ms"] - before["p50_ms"]
+        change = slowdown / before["p50_ms"] if before["p50_ms"] else 0.0
+        rows.append((name, before["p50_ms"], result["p50_ms"], change,
+                     change > threshold and slowdown > REGRESSION_MIN_MS))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the render, detection and listing hot paths")
+    parser.add_argument("--per-kind", type=int, default=5, help="Documents per corpus kind")
+    parser.add_argument("--large-folder", type=int, default=DEFAULT_LARGE_FOLDER,
+                        help="Files in the listing benchmark folder (0 = skip)")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP)
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS)
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks")
+    parser.add_argument("--output", help="Save the results as a JSON baseline")
+    parser.add_argument("--compare", help="Compare with a saved JSON baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative p50 slowdown counted as a regression")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        current = run_benchmarks(work_dir, args.per_kind, args.large_folder, args.warmup,
+                                 args.repeats, args.only)
+    if args.output:
+        Path(args.output).write_text(json.dumps(current, indent=2), encoding="utf-8")
+        print(f"Saved baseline to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\nCompared with {baseline.get('revision') or args.compare}:")
+        if baseline.get("settings") != current["settings"]:
+            print("Note: the baseline was run with different settings "
+                  f"({baseline.get('settings')})")
+        regressions = 0
+        for name, before, after, change, regressed in compare(baseline, current, args.threshold):
+            regressions += regressed
+            marker = "  REGRESSION" if regressed else ""
+            print(f"{name:<24} {before:9.2f} -> {after:9.2f} ms  ({change:+.0%}){marker}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Template-based bulk rename of many files in one pass.
+
+A template builds each new name from fields of the file:
+
+    {stem}      the current name without .pdf, after the optional regex substitution
+    {name}      the current name with .pdf
+    {number}    the inspection number (name prefix or detected), empty if unknown
+    {mtime}     modification time; takes a strftime format: {mtime:%Y%m%d}
+    {size}      size in bytes
+    {counter}   position in the batch; takes an integer format: {counter:03d}
+
+New names are computed lazily, so the before/after table of a large selection
+only computes the rows shown. Collisions are checked in memory against the
+folder listing the viewer already holds, without touching the (possibly remote)
+file system, and the batch is applied in one pass. Files that trade names, or
+move onto a name another file of the batch is leaving, go through temporary
+names first. A file that appeared under a target name since the listing is
+never replaced: that rename fails instead.
+"""
+
+import os
+import re
+import string
+import uuid
+from datetime import datetime
+
+from core import clean_file_name
+from number_index import parse_inspection_number
+
+FIELDS = ("stem", "name", "number", "mtime", "size", "counter")
+
+# Validation problems
+EMPTY = "empty"  # The template produced no usable name
+DUPLICATE = "duplicate"  # Another file of the batch gets the same name
+EXISTS = "exists"  # A file outside the batch already has the name
+
+
+def name_key(name):
+    """Collision key of a name: shares are usually case-insensitive"""
+    return name.casefold()
+
+
+class RenameTemplate:
+    """A name template with an optional regex substitution on the stem"""
+
+    def __init__(self, template="{stem}", pattern=None, replacement="", counter_start=1):
+        """
+        Args:
+            template: New name without .pdf, with fields such as {number}_{stem}
+            pattern: Regular expression replaced in the current stem (None = no substitution)
+            replacement: Replacement for pattern matches (\\1 refers to groups)
+            counter_start: Value of {counter} for the first file
+        Raises:
+            ValueError for unknown fields, re.error for an invalid pattern
+        """
+        for _, field, spec, conversion in string.Formatter().parse(template):
+            if field is None:
+                continue
+            if field not in FIELDS:
+                raise ValueError(f"unknown field {{{field}}}")
+            if conversion:
+                raise ValueError(f"conversions are not supported: {{{field}!{conversion}}}")
+        self.template = template
+        self.pattern = re.compile(pattern) if pattern else None
+        self.replacement = replacement
+        self.counter_start = counter_start
+
+    def render(self, name, index=0, number=None, mtime_ns=None, size=None):
+        """Return the new file name (with .pdf) of one file
+        Args:
+            name: Current file name (without folders)
+            index: Position of the file in the batch
+        Returns:
+            the new name, or None if no valid characters are left
+        Raises:
+            ValueError if a field's format spec does not suit its value,
+            re.error for a replacement referring to a missing group
+        """
+        stem = name[:-4] if name.lower().endswith(".pdf") else name
+        if self.pattern is not None:
+            stem = self.pattern.sub(self.replacement, stem)
+        fields = {
+            "stem": stem,
+            "name": name,
+            "number": number or parse_inspection_number(name) or "",
+            "mtime": datetime.fromtimestamp(mtime_ns / 1e9) if mtime_ns is not None else datetime.min,
+            "size": size or 0,
+            "counter": self.counter_start + index,
+        }
+        new_stem = clean_file_name(self.template.format(**fields)).strip()
+        return f"{new_stem}.pdf" if new_stem else None
+
+
+class BulkRename:
+    """New names for a batch of files, computed on demand"""
+
+    def __init__(self, folder, entries, template, existing=(), number_of=None):
+        """
+        Args:
+            folder: Folder the names are relative to
+            entries: FileEntry objects (name, size, mtime_ns) to rename, in list order
+            template: RenameTemplate
+            existing: Names of every file in the folder, for collision checks
+            number_of: Optional callable(name) -> detected inspection number or None
+        """
+        self.folder = folder
+        self.entries = list(entries)
+        self.template = template
+        self.existing = {name_key(name) for name in existing}
+        self.number_of = number_of
+        self.targets = {}  # Index -> new relative name (None = invalid), computed on demand
+
+    def __len__(self):
+        return len(self.entries)
+
+    def target(self, index):
+        """Return the new relative name of a file, or None if the template yields nothing"""
+        if index not in self.targets:
+            entry = self.entries[index]
+            subfolder, _, name = entry.name.rpartition("/")
+            number = self.number_of(entry.name) if self.number_of else None
+            try:
+                new_name = self.template.render(name, index, number, entry.mtime_ns, entry.size)
+            except (ValueError, KeyError, IndexError, re.error):
+                new_name = None  # A format spec or group reference that does not fit
+            if new_name is not None and subfolder:
+                new_name = f"{subfolder}/{new_name}"
+            self.targets[index] = new_name
+        return self.targets[index]
+
+    def rows(self, start, stop):
+        """Return (current name, new name) of the files in [start, stop)"""
+        stop = min(stop, len(self.entries))
+        return [(self.entries[i].name, self.target(i)) for i in range(start, stop)]
+
+    def changes(self):
+        """Return (old name, new name) of every file whose name changes"""
+        return [(entry.name, self.target(i)) for i, entry in enumerate(self.entries)
+                if self.target(i) is not None and self.target(i) != entry.name]
+
+    def problems(self):
+        """Check the whole batch for collisions, in memory
+        Returns:
+            dict of index -> EMPTY, DUPLICATE or EXISTS
+        """
+        sources = {name_key(entry.name) for entry in self.entries}
+        claimed = {}
+        problems = {}
+        for i, entry in enumerate(self.entries):
+            target = self.target(i)
+            if target is None:
+                problems[i] = EMPTY
+                continue
+            key = name_key(target)
+            if key in claimed:
+                problems[i] = problems[claimed[key]] = DUPLICATE
+            else:
+                claimed[key] = i
+            # A name held by a file outside the batch (files of the batch move away)
+            if key in self.existing and key not in sources:
+                problems.setdefault(i, EXISTS)
+        return problems
+
+    def apply(self):
+        """Rename every changed file in one pass
+        Call only once problems() is empty.
+        Returns:
+            (renamed, failed): lists of (old name, new name) and (old name, error)
+        """
+        changes = self.changes()
+        leaving = {name_key(old) for old, _ in changes}
+        renamed = []
+        failed = []
+        direct = []
+        staged = []
+        # Targets still held by a file of the batch are reached through a temporary
+        # name, after every direct rename has vacated its old name
+        for old, new in changes:
+            if name_key(new) in leaving and name_key(new) != name_key(old):
+                temporary = f"{old}.{uuid.uuid4().hex[:8]}.renaming"
+                try:
+                    os.rename(self.folder / old, self.folder / temporary)
+                except OSError as e:
+                    failed.append((old, str(e)))
+                    continue
+                staged.append((old, temporary, new))
+            else:
+                direct.append((old, old, new))
+
+        held = set()  # Names still in use because their file could not be renamed
+        for old, current, new in direct + staged:
+            error = None
+            if name_key(new) in held:
+                error = f"'{new}' is still in use"
+            elif name_key(new) != name_key(old) and os.path.lexists(self.folder / new):
+                # os.rename replaces an existing file on POSIX
+                error = f"'{new}' already exists"
+            else:
+                try:
+                    os.rename(self.folder / current, self.folder / new)
+                except OSError as e:
+                    error = str(e)
+            if error is None:
+                renamed.append((old, new))
+                continue
+            failed.append((old, error))
+            if current != old:
+                try:
+                    os.rename(self.folder / current, self.folder / old)
+                except OSError:
+                    continue  # Left under its temporary name, reported above
+            held.add(name_key(old))
+        return renamed, failed
@@ -0,0 +1,223 @@
+"""
+Per-folder SQLite catalog of PDF files.
+
+The catalog remembers what was learned about each file in a folder (page count,
+detected inspection numbers, confidence, renamed status) so reopening a large
+folder can populate the list immediately and only reconcile the differences.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+# Catalogs live in a local cache directory rather than inside the folder itself:
+# the folders are often on network shares, where SQLite WAL mode is not safe.
+CATALOG_DIR = Path.home() / ".pdf_renamer" / "catalogs"
+
+# Same pattern the app uses to recognize already-renamed files
+NUMBERED_PATTERN = re.compile(r'^\d+_.*\.pdf$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    page_count INTEGER,
+    numbers TEXT,
+    confidence REAL,
+    source TEXT,
+    is_numbered INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_files_numbered ON files (is_numbered, name);
+"""
+
+
+def catalog_path_for(folder, recursive=False):
+    """Return the catalog database path used for the given folder
+    Args:
+        recursive: Catalog of the whole folder tree rather than direct children
+    """
+    key = hashlib.sha1(str(Path(folder).resolve()).encode("utf-8")).hexdigest()
+    suffix = "-tree" if recursive else ""
+    return CATALOG_DIR / f"{key}{suffix}.sqlite3"
+
+
+def is_numbered(name):
+    """Check if a cataloged file (name or relative path) has an inspection number prefix"""
+    return NUMBERED_PATTERN.match(name.rsplit("/", 1)[-1]) is not None
+
+
+def scan_folder(folder):
+    """List the PDF files directly inside a folder
+    Returns:
+        dict mapping file name -> (size, mtime_ns)
+    """
+    entries = {}
+    with os.scandir(folder) as it:
+        for entry in it:
+            if not entry.name.lower().endswith('.pdf'):
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                stat = entry.stat()
+            except OSError:
+                # File vanished or is unreadable between listing and stat
+                continue
+            entries[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return entries
+
+
+class FolderCatalog:
+    """SQLite-backed record of the PDF files in one folder
+    Files are keyed by their path relative to the folder, which is just the file
+    name unless the catalog covers a whole tree.
+    """
+
+    def __init__(self, folder, db_path=None, recursive=False):
+        self.folder = Path(folder)
+        self.db_path = Path(db_path) if db_path else catalog_path_for(folder, recursive)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.conn.close()
+
+    def files(self, unnumbered_only=False, numbered_only=False):
+        """Return the cataloged file names in sort order
+        Args:
+            unnumbered_only: Only return files without an inspection number prefix
+            numbered_only: Only return files with an inspection number prefix
+        """
+        if unnumbered_only or numbered_only:
+            rows = self.conn.execute(
+                "SELECT name FROM files WHERE is_numbered = ? ORDER BY name",
+                (int(numbered_only),))
+        else:
+            rows = self.conn.execute("SELECT name FROM files ORDER BY name")
+        return [row[0] for row in rows]
+
+    def entries(self):
+        """Return (name, size, mtime_ns, is_numbered) for every cataloged file"""
+        return self.conn.execute(
+            "SELECT name, size, mtime_ns, is_numbered FROM files ORDER BY name").fetchall()
+
+    def iter_entries(self, batch_size=1000):
+        """Yield (name, (size, mtime_ns)) for every cataloged file in name order
+        Reads batch_size rows at a time, so very large catalogs are walked in
+        constant memory and records may be updated during the walk.
+        """
+        last = ""
+        while True:
+            rows = self.conn.execute(
+                "SELECT name, size, mtime_ns FROM files WHERE name > ? ORDER BY name LIMIT ?",
+                (last, batch_size)).fetchall()
+            for name, size, mtime_ns in rows:
+                yield name, (size, mtime_ns)
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][0]
+
+    def count(self):
+        """Return the number of cataloged files"""
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def get(self, name):
+        """Return the stored record for a file as a dict, or None"""
+        row = self.conn.execute("SELECT * FROM files WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record["numbers"] = json.loads(record["numbers"]) if record["numbers"] else []
+        return record
+
+    def reconcile(self, entries):
+        """Bring the catalog in line with a fresh directory listing
+        Args:
+            entries: dict mapping file name -> (size, mtime_ns), as returned by scan_folder
+        Returns:
+            True if anything in the catalog changed
+        """
+        known = {row[0]: (row[1], row[2]) for row in
+                 self.conn.execute("SELECT name, size, mtime_ns FROM files")}
+
+        removed = [(name,) for name in known if name not in entries]
+        if removed:
+            with self.conn:
+                self.conn.executemany("DELETE FROM files WHERE name = ?", removed)
+        return self._apply(entries, known) or bool(removed)
+
+    def merge(self, entries):
+        """Add or update files from a partial listing, without removing anything
+        Args:
+            entries: dict mapping file name -> (size, mtime_ns)
+        Returns:
+            True if anything in the catalog changed
+        """
+        known = {}
+        for name in entries:
+            row = self.conn.execute("SELECT size, mtime_ns FROM files WHERE name = ?",
+                                    (name,)).fetchone()
+            if row is not None:
+                known[name] = tuple(row)
+        return self._apply(entries, known)
+
+    def _apply(self, entries, known):
+        """Insert new files and invalidate changed ones, given the known identities"""
+        added = []
+        changed = []
+        for name, identity in entries.items():
+            if name not in known:
+                added.append((name, identity[0], identity[1], int(is_numbered(name))))
+            elif known[name] != tuple(identity):
+                # Content changed: anything learned about the old file is stale
+                changed.append((identity[0], identity[1], name))
+
+        if not (added or changed):
+            return False
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO files (name, size, mtime_ns, is_numbered) VALUES (?, ?, ?, ?)",
+                added)
+            self.conn.executemany(
+                "UPDATE files SET size = ?, mtime_ns = ?, page_count = NULL, numbers = NULL, "
+                "confidence = NULL, source = NULL WHERE name = ?",
+                changed)
+        return True
+
+    def record_page_count(self, name, page_count):
+        """Store the page count of a file"""
+        with self.conn:
+            self.conn.execute("UPDATE files SET page_count = ? WHERE name = ?",
+                              (page_count, name))
+
+    def record_detection(self, name, numbers, confidence, source):
+        """Store detected inspection numbers for a file
+        Args:
+            numbers: Candidate numbers, best first
+            confidence: 0.0 - 1.0 confidence of the best candidate
+            source: How the numbers were obtained ('text', 'ocr' or 'manual')
+        """
+        with self.conn:
+            self.conn.execute(
+                "UPDATE files SET numbers = ?, confidence = ?, source = ? WHERE name = ?",
+                (json.dumps(list(numbers)), confidence, source, name))
+
+    def rename(self, old_name, new_name):
+        """Move a record to a new name, keeping what was learned about the file"""
+        with self.conn:
+            # A replaced target file no longer exists under its own identity
+            self.conn.execute("DELETE FROM files WHERE name = ?", (new_name,))
+            self.conn.execute(
+                "UPDATE files SET name = ?, is_numbered = ? WHERE name = ?",
+                (new_name, int(is_numbered(new_name)), old_name))
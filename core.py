@@ -0,0 +1,182 @@
+"""
+GUI-free core: detect, render, plan a rename and apply it.
+
+The Tk viewer, the watch-folder daemon, batch jobs and worker processes all call
+these functions. They return plain data and raise exceptions instead of showing
+dialogs, and importing this module never imports tkinter, so a worker process
+only pays for PyMuPDF and Pillow.
+"""
+
+import os
+import time
+from pathlib import Path
+
+import detection
+import pdf_buffer
+import rendering
+from file_filter import has_inspection_number
+
+INVALID_FILENAME_CHARS = '<>:"/\\|?*'
+
+
+def detect(pdf_path, allow_ocr=True, ocr_only=False):
+    """Detect the inspection number of a file
+    Args:
+        allow_ocr: Fall back to OCR when the text layer is not certain
+        ocr_only: Always run the full OCR pass instead of trying the text layer first
+    Returns:
+        dict with number (or None), numbers, candidates (number and confidence
+        of each), confidence, source ('text' or 'ocr') and duration (seconds)
+    """
+    started = time.perf_counter()
+    if ocr_only:
+        result = detection.ocr_result(detection.detect_ocr_numbers(pdf_path)["candidates"])
+    else:
+        result = detection.detect_best_number(pdf_path, allow_ocr)
+    result["duration"] = time.perf_counter() - started
+    return result
+
+
+def warm_up():
+    """Load the detection modules and probe Tesseract in a fresh worker process
+    Returns:
+        the worker's process id
+    """
+    if detection.OCR_AVAILABLE and detection.check_tesseract() is None:
+        import pytesseract  # Loaded now rather than on the first OCR request
+    return os.getpid()
+
+
+def describe(pdf_path, detect_numbers=True, allow_ocr=False):
+    """Page count and, optionally, the detected inspection number of a file
+    Returns:
+        dict with page_count, plus the keys of detect() if detect_numbers
+    """
+    with pdf_buffer.open_pdf(pdf_path) as pdf_document:
+        page_count = pdf_document.page_count
+    # The buffer just read is reused by the detection
+    result = detect(pdf_path, allow_ocr) if detect_numbers else {}
+    result["page_count"] = page_count
+    return result
+
+
+def render(pdf_path, page_number=0, max_width=rendering.PREVIEW_MAX_WIDTH):
+    """Render a page at preview size
+    Returns:
+        dict with page_count and image (PIL RGB image)
+    """
+    return rendering.render_page(pdf_path, page_number, max_width=max_width)
+
+
+def clean_inspection_number(text):
+    """Keep only the characters allowed in an inspection number prefix"""
+    return "".join(c for c in text if c.isalnum() or c in ('-', '_'))
+
+
+def clean_file_name(text):
+    """Remove the characters Windows does not allow in file names"""
+    return "".join(c for c in text if c not in INVALID_FILENAME_CHARS)
+
+
+def numbered_name(inspection_number, name):
+    """Return a file name with an inspection number prepended"""
+    return f"{inspection_number}_{name}"
+
+
+class RenamePlan:
+    """A rename of one file, checked but not yet applied"""
+
+    __slots__ = ("source", "target")
+
+    def __init__(self, source, target):
+        self.source = Path(source)
+        self.target = Path(target)
+
+    @property
+    def unchanged(self):
+        """The new name is the current name"""
+        return self.target == self.source
+
+    @property
+    def target_exists(self):
+        """Another file already has the new name"""
+        return not self.unchanged and self.target.exists()
+
+    def __repr__(self):
+        return f"RenamePlan({self.source.name!r} -> {self.target.name!r})"
+
+
+def plan_number_rename(pdf_path, inspection_number):
+    """Plan prepending an inspection number to a file's name
+    Returns:
+        RenamePlan, or None if the number has no valid characters
+    """
+    inspection_number = clean_inspection_number(inspection_number)
+    if not inspection_number:
+        return None
+    pdf_path = Path(pdf_path)
+    return RenamePlan(pdf_path, pdf_path.parent / numbered_name(inspection_number, pdf_path.name))
+
+
+def plan_name_rename(pdf_path, new_stem):
+    """Plan giving a file a new name (the .pdf extension is added)
+    Returns:
+        RenamePlan, or None if the name has no valid characters
+    """
+    new_stem = clean_file_name(new_stem)
+    if not new_stem:
+        return None
+    pdf_path = Path(pdf_path)
+    return RenamePlan(pdf_path, pdf_path.parent / f"{new_stem}.pdf")
+
+
+def plan_copy_renames(paths, inspection_number):
+    """Plan prepending an inspection number to identical copies of a file
+    Copies that already have a number, or whose new name is taken, are skipped:
+    nothing is overwritten in a batch.
+    Returns:
+        list of RenamePlan
+    """
+    plans = []
+    for path in paths:
+        if has_inspection_number(Path(path).name):
+            continue
+        plan = plan_number_rename(path, inspection_number)
+        if plan is not None and not plan.target_exists:
+            plans.append(plan)
+    return plans
+
+
+def rename_copies(paths, inspection_number):
+    """Prepend an inspection number to identical copies of a file (see plan_copy_renames)
+    Copies that fail to rename are skipped as well.
+    Returns:
+        list of (old path, new path) of the copies renamed
+    """
+    renamed = []
+    for plan in plan_copy_renames(paths, inspection_number):
+        try:
+            renamed.append((plan.source, apply_rename(plan)))
+        except OSError:
+            continue
+    return renamed
+
+
+def apply_rename(plan, overwrite=False):
+    """Carry out a planned rename
+    Args:
+        overwrite: Replace an existing file with the new name
+    Returns:
+        the new path
+    Raises:
+        FileExistsError if the new name is taken and overwrite is False;
+        OSError if the rename fails
+    """
+    if plan.target_exists:
+        if not overwrite:
+            raise FileExistsError(f"'{plan.target.name}' already exists")
+        # replace() also overwrites on Windows, where rename() refuses to
+        plan.source.replace(plan.target)
+    else:
+        plan.source.rename(plan.target)
+    return plan.target
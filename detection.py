@@ -0,0 +1,415 @@
+"""
+Inspection number detection without any GUI dependency.
+
+The text-layer and OCR detectors used by the viewer, returning plain data so the
+same code can run in the Tk app, in worker processes and in headless modes.
+"""
+
+import importlib.util
+import re
+import subprocess
+import threading
+
+import fitz  # PyMuPDF
+from PIL import ImageChops
+
+from pdf_buffer import open_pdf
+from rendering import release_render_memory, render_clip
+import tracing
+
+# pytesseract is optional, and only imported once OCR actually runs
+OCR_AVAILABLE = importlib.util.find_spec("pytesseract") is not None
+
+# Inspection numbers are always 5-6 digits
+INSPECTION_PATTERN = re.compile(r'\b\d{5,6}\b')
+
+# Confidence at or above which a detected number is trusted without review
+HIGH_CONFIDENCE = 0.9
+
+# OCR reads every digit on the page alike, the black reference numbers and dates
+# included. A reading is only trusted when the red-ink pass read it too (and a
+# grayscale pass agrees); otherwise its confidence stays below HIGH_CONFIDENCE.
+OCR_UNCONFIRMED_CONFIDENCE = 0.6
+RED_PASS = "אדום"  # Name of the OCR pass over the red pixels only
+
+# Where inspection numbers are printed, as fractions of the page: the top-left
+# 50% of the width and 30% of the height
+SEARCH_REGION = (0.0, 0.0, 0.5, 0.3)
+OCR_ZOOM = 4.0  # Higher zoom for better OCR accuracy
+
+
+def search_region(page):
+    """Return the optimized top-left search region of a page (30% height, 50% width)"""
+    x0, y0, x1, y1 = SEARCH_REGION
+    return fitz.Rect(page.rect.width * x0, page.rect.height * y0,
+                     page.rect.width * x1, page.rect.height * y1)
+
+
+def is_red(color_int):
+    """Check if a PyMuPDF span color (RGB integer) is red"""
+    r = (color_int >> 16) & 0xFF
+    g = (color_int >> 8) & 0xFF
+    b = color_int & 0xFF
+    # High red component, low green and blue
+    return r > 200 and g < 100 and b < 100
+
+
+def detect_text_numbers(pdf_path):
+    """Find inspection numbers in the text layer of the first page
+    Returns:
+        dict with candidates (perfect matches first), red_spans, full_text,
+        region_text, region, page_width and page_height
+    """
+    pdf_document = open_pdf(pdf_path)
+    try:
+        first_page = pdf_document[0]
+
+        # Extract text with detailed information (font size, color, etc.)
+        with tracing.span("get_text"):
+            text_blocks = first_page.get_text("dict")
+
+        # Extract text from optimized top-left region (30% height, 50% width)
+        top_left_rect = search_region(first_page)
+        top_left_spans = []
+
+        # Filter blocks that are in the top-left region
+        for block in text_blocks["blocks"]:
+            if "lines" in block:
+                for line in block["lines"]:
+                    for span in line["spans"]:
+                        bbox = fitz.Rect(span["bbox"])
+                        if bbox.intersects(top_left_rect):
+                            top_left_spans.append(span)
+
+        # Find inspection numbers using optimized criteria
+        inspection_candidates = []
+        all_red_text = []
+
+        for span in top_left_spans:
+            # Check for red color (RGB values near 255,0,0)
+            span_is_red = "color" in span and is_red(span["color"])
+            if span_is_red:
+                all_red_text.append(span)
+
+            # Extract 5-6 digit numbers from text
+            for number in INSPECTION_PATTERN.findall(span["text"]):
+                inspection_candidates.append({
+                    "number": number,
+                    "font_size": span["size"],
+                    "is_red": span_is_red,
+                    "text": span["text"],
+                    "bbox": span["bbox"],
+                    "is_perfect_match": span_is_red and len(number) >= 5  # Perfect match criteria
+                })
+
+        # Prioritize perfect matches (red text, 5-6 digits)
+        perfect_matches = [c for c in inspection_candidates if c["is_perfect_match"]]
+        other_candidates = [c for c in inspection_candidates if not c["is_perfect_match"]]
+
+        # Sort perfect matches by font size (larger first)
+        perfect_matches.sort(key=lambda x: x["font_size"], reverse=True)
+        other_candidates.sort(key=lambda x: x["font_size"], reverse=True)
+
+        return {
+            # Combine results with perfect matches first
+            "candidates": perfect_matches + other_candidates,
+            "red_spans": all_red_text,
+            # Regular text for display
+            "full_text": first_page.get_text(),
+            "region_text": first_page.get_text("text", clip=top_left_rect),
+            "region": top_left_rect,
+            "page_width": first_page.rect.width,
+            "page_height": first_page.rect.height,
+        }
+    finally:
+        pdf_document.close()
+
+
+def text_confidence(candidates):
+    """Confidence of the best text-layer candidate (red 5-6 digits is certain)"""
+    if not candidates:
+        return 0.0
+    return 1.0 if candidates[0]["is_perfect_match"] else 0.5
+
+
+_tesseract_lock = threading.Lock()
+_tesseract_checked = False
+_tesseract_error = None
+
+
+def check_tesseract(retry=False):
+    """Verify Tesseract is accessible
+    The probe result, success or failure, is cached for the life of the process.
+    Args:
+        retry: Probe again, e.g. after Tesseract was installed
+    Returns:
+        None if OCR can run, otherwise an error message (Hebrew, for display)
+    """
+    global _tesseract_checked, _tesseract_error
+    # Concurrent callers wait for a probe already running instead of starting another
+    with _tesseract_lock:
+        if retry or not _tesseract_checked:
+            _tesseract_error = probe_tesseract()
+            _tesseract_checked = True
+        return _tesseract_error
+
+
+def probe_tesseract():
+    """Run `tesseract --version` once
+    Returns:
+        None if OCR can run, otherwise an error message (Hebrew, for display)
+    """
+    try:
+        result = subprocess.run(['tesseract', '--version'],
+                                capture_output=True, text=True, timeout=5)
+        if result.returncode != 0:
+            return ("Tesseract OCR מותקן אך לא נגיש.\n"
+                    "ודא ש-Tesseract נמצא ב-PATH.\n"
+                    f"שגיאה: {result.stderr}")
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        return ("Tesseract OCR לא נמצא ב-PATH.\n"
+                "התקן את Tesseract OCR והוסף אותו ל-PATH.\n"
+                f"פרטים: {str(e)}")
+    except Exception as e:
+        return f"בעיה בבדיקת Tesseract:\n{str(e)}"
+    return None
+
+
+def detect_ocr_numbers(pdf_path):
+    """Find inspection numbers by OCR of the first page's search region
+    Returns:
+        dict with candidates (scored, best first), ocr_results (per preprocessing
+        method) and region
+    """
+    pdf_document = open_pdf(pdf_path)
+    try:
+        first_page = pdf_document[0]
+
+        # Use the same optimized region as regular extraction (30% height, 50% width)
+        top_left_rect = search_region(first_page)
+
+        # Render the region in color with high resolution (the red ink is checked
+        # separately); the zoom is lowered on very large pages so the image stays
+        # within the render budget
+        img = render_clip(first_page, OCR_ZOOM, clip=top_left_rect)
+    finally:
+        pdf_document.close()
+        release_render_memory()
+
+    result = ocr_image(img)
+    result["region"] = top_left_rect
+    return result
+
+
+def red_mask(img):
+    """Return the red pixels of an RGB image as black on white, for OCR
+    Looser than is_red(): scanned and anti-aliased ink is not pure red.
+    """
+    r, g, b = img.split()
+    red = ImageChops.multiply(r.point(lambda p: 255 if p > 150 else 0),
+                              ImageChops.multiply(g.point(lambda p: 255 if p < 110 else 0),
+                                                  b.point(lambda p: 255 if p < 110 else 0)))
+    return ImageChops.invert(red)
+
+
+def ocr_image(img):
+    """Find inspection numbers by OCR of an already rendered search region
+    Args:
+        img: RGB or grayscale region; only an RGB region gets the red-ink pass,
+            without which no reading reaches HIGH_CONFIDENCE
+    Returns:
+        dict with candidates (scored, best first) and ocr_results (per preprocessing method)
+    """
+    import pytesseract
+
+    img_gray = img.convert("L") if img.mode != "L" else img
+
+    # Enhanced preprocessing for better OCR: apply multiple techniques
+    processed_images = []
+
+    # 1. Basic threshold
+    threshold = 128
+    img_binary = img_gray.point(lambda p: p > threshold and 255)
+    processed_images.append(("בסיסי", img_binary))
+
+    # 2. Adaptive threshold simulation (multiple levels)
+    for thresh in [100, 150, 180]:
+        img_adaptive = img_gray.point(lambda p: p > thresh and 255)
+        processed_images.append((f"סף {thresh}", img_adaptive))
+
+    # 3. Inverted (for light text on dark background)
+    img_inverted = img_gray.point(lambda p: 255 - p)
+    processed_images.append(("הפוך", img_inverted))
+
+    # 4. Red ink only: inspection numbers are printed in red, decoys in black
+    if img.mode == "RGB":
+        processed_images.append((RED_PASS, red_mask(img)))
+
+    # Try OCR on each processed image
+    all_ocr_results = []
+
+    for proc_name, proc_img in processed_images:
+        try:
+            # Configure Tesseract for digit recognition
+            digit_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789'
+            general_config = r'--oem 3 --psm 6'
+
+            with tracing.span("tesseract", method=proc_name):
+                # Extract digits only
+                digit_text = pytesseract.image_to_string(proc_img, config=digit_config)
+
+                # Extract general text for context
+                general_text = pytesseract.image_to_string(proc_img, config=general_config)
+
+            all_ocr_results.append({
+                "process_name": proc_name,
+                "digit_text": digit_text,
+                "general_text": general_text,
+                "image": proc_img
+            })
+
+        except Exception:
+            # Continue with other preprocessing methods
+            continue
+
+    return {
+        "candidates": score_ocr_results(all_ocr_results),
+        "ocr_results": all_ocr_results,
+    }
+
+
+def score_ocr_results(all_ocr_results):
+    """Find 5-6 digit numbers across all OCR results and score them, best first"""
+    all_numbers = []
+
+    for result in all_ocr_results:
+        numbers_in_digits = INSPECTION_PATTERN.findall(result["digit_text"])
+        numbers_in_general = INSPECTION_PATTERN.findall(result["general_text"])
+
+        for number in numbers_in_digits + numbers_in_general:
+            all_numbers.append({
+                "number": number,
+                "process": result["process_name"],
+                "text": result["digit_text"] if number in result["digit_text"] else result["general_text"]
+            })
+
+    # Remove duplicates and score
+    unique_numbers = {}
+    for item in all_numbers:
+        num = item["number"]
+        if num not in unique_numbers:
+            unique_numbers[num] = {
+                "number": num,
+                "processes": [],
+                "score": 0,
+                "text_samples": []
+            }
+
+        unique_numbers[num]["processes"].append(item["process"])
+        unique_numbers[num]["text_samples"].append(item["text"])
+
+    gray_passes = {r["process_name"] for r in all_ocr_results} - {RED_PASS}
+
+    # Score numbers
+    scored_numbers = []
+    for num, data in unique_numbers.items():
+        score = 0
+
+        # Prefer numbers found in multiple preprocessing methods
+        score += len(set(data["processes"])) * 20
+
+        # Prefer numbers found in digit-only extraction
+        if any("digits" in proc for proc in data["processes"]):
+            score += 30
+
+        # Position scoring (earlier in text is better)
+        for text_sample in data["text_samples"]:
+            position = text_sample.find(num)
+            if position >= 0:
+                score += max(0, 50 - position // 10)
+
+        passes = set(data["processes"])
+        scored_numbers.append({
+            "number": data["number"],
+            "score": score,
+            "confidence": reading_confidence(RED_PASS in passes, len(passes - {RED_PASS}),
+                                             len(gray_passes)),
+            "processes": data["processes"],
+            "text_samples": data["text_samples"]
+        })
+
+    # Sort by confidence, then score (descending)
+    scored_numbers.sort(key=lambda x: (x["confidence"], x["score"]), reverse=True)
+    return scored_numbers
+
+
+def reading_confidence(red, gray_agreeing, gray_passes):
+    """Probability-like confidence of an OCR reading
+    Args:
+        red: The red-ink pass read the number
+        gray_agreeing: Grayscale passes that read the number
+        gray_passes: Grayscale passes that ran
+    """
+    agreement = gray_agreeing / gray_passes if gray_passes else 0.0
+    if red and gray_agreeing:
+        # Red ink read the same way by two kinds of pass
+        return HIGH_CONFIDENCE + (1.0 - HIGH_CONFIDENCE) * agreement
+    if red:
+        return OCR_UNCONFIRMED_CONFIDENCE / 2  # A red reading no other pass confirms
+    # Black ink: however many passes agree, never trusted without review
+    return OCR_UNCONFIRMED_CONFIDENCE * agreement
+
+
+def ocr_confidence(scored_numbers):
+    """Confidence of the best OCR candidate (see reading_confidence)"""
+    if not scored_numbers:
+        return 0.0
+    return scored_numbers[0]["confidence"]
+
+
+def detect_best_number(pdf_path, allow_ocr=True):
+    """Run the text detector, falling back to OCR when it is not certain
+    Returns:
+        dict with number (or None), confidence, source ('text' or 'ocr') and numbers
+    """
+    text_candidates = detect_text_numbers(pdf_path)["candidates"]
+    if not needs_ocr(text_candidates, allow_ocr):
+        return choose_best(text_candidates)
+    return choose_best(text_candidates, detect_ocr_numbers(pdf_path)["candidates"])
+
+
+def needs_ocr(text_candidates, allow_ocr=True):
+    """Check whether the text-layer result is uncertain enough to try OCR"""
+    return allow_ocr and OCR_AVAILABLE and text_confidence(text_candidates) < HIGH_CONFIDENCE
+
+
+def choose_best(text_candidates, ocr_candidates=None):
+    """Pick the more confident of the text-layer and OCR results
+    Returns:
+        dict with number (or None), confidence, source ('text' or 'ocr'),
+        numbers and candidates (number and confidence of each, best first)
+    """
+    best = {
+        "number": text_candidates[0]["number"] if text_candidates else None,
+        "confidence": text_confidence(text_candidates),
+        "source": "text",
+        "numbers": [c["number"] for c in text_candidates],
+        "candidates": [{"number": c["number"], "confidence": text_confidence([c])}
+                       for c in text_candidates],
+    }
+    confidence = ocr_confidence(ocr_candidates or [])
+    if ocr_candidates and confidence > best["confidence"]:
+        best = ocr_result(ocr_candidates)
+    return best
+
+
+def ocr_result(ocr_candidates):
+    """Describe scored OCR candidates like choose_best() does"""
+    return {
+        "number": ocr_candidates[0]["number"] if ocr_candidates else None,
+        "confidence": ocr_confidence(ocr_candidates),
+        "source": "ocr",
+        "numbers": [n["number"] for n in ocr_candidates],
+        "candidates": [{"number": n["number"], "confidence": ocr_confidence([n])}
+                       for n in ocr_candidates],
+    }
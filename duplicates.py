@@ -0,0 +1,108 @@
+"""
+Content-based duplicate PDF detection.
+
+Files are grouped by size first, then by a cheap partial hash of their first and
+last blocks, and only files that still collide get a full content hash. Hashing
+uses memory-mapped reads spread across a thread pool (hashlib releases the GIL
+while hashing large buffers), so several files are read from disk at once.
+"""
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Bytes hashed from each end of a file for the partial hash
+PARTIAL_BLOCK = 64 * 1024
+
+# Chunk size fed to the hash when hashing a whole mapped file
+FULL_CHUNK = 8 * 1024 * 1024
+
+
+def partial_hash(path):
+    """Hash the first and last blocks of a file"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return hashlib.blake2b(b"").hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            digest = hashlib.blake2b(mapped[:PARTIAL_BLOCK])
+            if size > PARTIAL_BLOCK:
+                digest.update(mapped[max(PARTIAL_BLOCK, size - PARTIAL_BLOCK):])
+            return digest.hexdigest()
+
+
+def full_hash(path):
+    """Hash the whole content of a file"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        digest = hashlib.blake2b()
+        if size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, FULL_CHUNK):
+                    digest.update(view[offset:offset + FULL_CHUNK])
+            finally:
+                view.release()
+        return digest.hexdigest()
+
+
+def _safe(func):
+    """Wrap a hash function so unreadable files are skipped instead of failing the scan"""
+    def wrapper(path):
+        try:
+            return func(path)
+        except (OSError, ValueError):
+            return None
+    return wrapper
+
+
+def _hash_all(executor, func, groups):
+    """Hash every file of the given groups in parallel
+    Returns:
+        list of groups split by hash, keeping only groups with more than one file
+    """
+    files = [path for group in groups for path in group]
+    hashes = dict(zip(files, executor.map(_safe(func), files)))
+
+    collisions = []
+    for group in groups:
+        by_hash = {}
+        for path in group:
+            if hashes[path] is not None:
+                by_hash.setdefault(hashes[path], []).append(path)
+        collisions.extend(g for g in by_hash.values() if len(g) > 1)
+    return collisions
+
+
+def find_duplicate_files(paths, max_workers=None):
+    """Find files with identical content
+    Args:
+        paths: Files to compare
+        max_workers: Hashing threads (defaults to the executor's default)
+    Returns:
+        list of duplicate groups, each a sorted list of Paths with identical content
+    """
+    by_size = {}
+    for path in set(map(Path, paths)):
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            continue
+        by_size.setdefault(size, []).append(path)
+
+    small = [g for size, g in by_size.items() if len(g) > 1 and size <= 2 * PARTIAL_BLOCK]
+    large = [g for size, g in by_size.items() if len(g) > 1 and size > 2 * PARTIAL_BLOCK]
+    if not (small or large):
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # For small files the partial hash already covers the whole content
+        duplicates = _hash_all(executor, partial_hash, small)
+        duplicates += _hash_all(executor, full_hash,
+                                _hash_all(executor, partial_hash, large))
+
+    return sorted(sorted(group) for group in duplicates)
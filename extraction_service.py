@@ -0,0 +1,321 @@
+"""
+Local HTTP/JSON service exposing inspection number detection.
+
+Other tools (intake scripts, upload jobs) get the viewer's detection without
+driving the GUI. The service listens on localhost only and keeps a pool of
+supervised worker processes that have PyMuPDF and Tesseract loaded, so a
+request pays for the detection alone.
+
+Endpoints:
+    POST /detect   JSON {"path": ...} or {"paths": [...]}, and/or
+                   {"documents": [{"name": ..., "data": <base64 PDF>}]};
+                   optional "ocr" (default true) and "ocr_only" (default false).
+                   A raw PDF body (Content-Type: application/pdf) is detected
+                   as one uploaded document; ?ocr=0 and ?ocr_only=1 apply.
+    GET  /metrics  queue depth, counts, throughput and latency
+    GET  /health   worker count and whether OCR is available
+
+Every detection returns {"name", "number", "confidence", "source",
+"candidates": [{"number", "confidence"}], "duration"} or {"name", "error",
+"reason"}. A request that would take the number of waiting files past the
+queue limit is refused with 503 and a Retry-After header instead of queuing
+without bound; one with more files than the limit itself is refused with 413.
+"""
+
+import base64
+import binascii
+import json
+import logging
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import core
+import detection
+from quarantine import Quarantine
+from supervisor import DEFAULT_MEMORY_LIMIT_MB, PoolShutDown, SupervisedPool, TaskFailed
+from watch_daemon import DaemonMetrics
+
+log = logging.getLogger("extraction_service")
+
+HOST = "127.0.0.1"  # Never reachable from other machines
+DEFAULT_PORT = 8765
+DEFAULT_MAX_QUEUE = 64  # Files accepted but not finished before requests are refused
+TASK_TIMEOUT = 120.0  # Seconds detection may take on one file
+MAX_BODY_BYTES = 200 * 1024 * 1024
+RETRY_AFTER = 2  # Seconds a refused client is asked to wait
+
+
+class RequestError(Exception):
+    """A request that cannot be served, with its HTTP status"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class ExtractionService:
+    """Detection requests served by a warm pool of supervised workers"""
+
+    def __init__(self, workers=2, max_queue=DEFAULT_MAX_QUEUE, allow_ocr=True,
+                 timeout=TASK_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, quarantine=None):
+        """
+        Args:
+            workers: Detection worker processes
+            max_queue: Files accepted but not finished before requests get 503
+            allow_ocr: Let requests fall back to OCR (they can opt out per request)
+            timeout: Wall-clock seconds detection may take on one file
+            quarantine: Quarantine that files which hang or crash a worker are added
+                to (uploaded documents are not recorded)
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.allow_ocr = allow_ocr
+        self.quarantine = quarantine
+        self.metrics = DaemonMetrics(outcomes=("found", "not_found", "failed", "rejected"))
+        self.lock = threading.Lock()
+        self.accepted = 0  # Files accepted and not finished
+        self.upload_dir = tempfile.TemporaryDirectory(prefix="extraction_service_")
+        self.pool = SupervisedPool(workers=workers, timeout=timeout,
+                                   memory_limit_mb=memory_limit_mb)
+        # One warm-up task per worker loads the detection modules before the first request
+        self.warm_ups = [self.pool.submit(core.warm_up) for _ in range(workers)]
+        self.server = None
+
+    def wait_until_warm(self, timeout=None):
+        """Block until every worker has finished its warm-up"""
+        for future in self.warm_ups:
+            future.result(timeout=timeout)
+
+    def reserve(self, count):
+        """Accept count more files, or refuse the request when the queue is full"""
+        with self.lock:
+            if count > self.max_queue:
+                # Would never fit, however long the client waits
+                self.metrics.count("rejected")
+                raise RequestError(413, f"{count} files in one request (limit {self.max_queue})")
+            if self.accepted + count > self.max_queue:
+                self.metrics.count("rejected")
+                raise RequestError(503, f"queue full ({self.accepted} files waiting)",
+                                   {"Retry-After": str(RETRY_AFTER)})
+            self.accepted += count
+
+    def release(self, count):
+        """Forget count finished files"""
+        with self.lock:
+            self.accepted -= count
+
+    def detect(self, files, allow_ocr=True, ocr_only=False):
+        """Detect the numbers of several files at once
+        Args:
+            files: (name, path, uploaded) tuples; uploaded files are deleted afterwards
+        Returns:
+            list of result dicts, in the order of files
+        """
+        allow_ocr = allow_ocr and self.allow_ocr
+        started = time.monotonic()
+        try:
+            self.reserve(len(files))
+            try:
+                submitted = []
+                for name, path, uploaded in files:
+                    self.metrics.started()
+                    error = None
+                    if not uploaded and not Path(path).is_file():
+                        error = ("not_found", "file not found")
+                    elif not uploaded and self.quarantine:
+                        record = self.quarantine.get(path)
+                        if record is not None:
+                            error = ("quarantined", record["detail"])
+                    future = None if error else self.pool.submit(core.detect, str(path),
+                                                                 allow_ocr, ocr_only)
+                    submitted.append((name, path, uploaded, future, error))
+                return [self.collect(*entry, started=started) for entry in submitted]
+            finally:
+                self.release(len(files))
+        finally:
+            for _, path, uploaded in files:
+                if uploaded:
+                    Path(path).unlink(missing_ok=True)
+
+    def collect(self, name, path, uploaded, future, error, started):
+        """Wait for one file's detection and describe the outcome"""
+        if future is not None:
+            try:
+                result = future.result()
+            except TaskFailed as e:
+                if self.quarantine and not uploaded and not isinstance(e, PoolShutDown):
+                    self.quarantine.add(path, e.reason, str(e))
+                error = (e.reason, str(e))
+            except Exception as e:
+                error = ("error", f"{type(e).__name__}: {e}")
+        if error is not None:
+            self.metrics.finished("failed", time.monotonic() - started)
+            return {"name": name, "error": error[1], "reason": error[0]}
+
+        self.metrics.finished("found" if result["number"] else "not_found",
+                              time.monotonic() - started)
+        return {
+            "name": name,
+            "number": result["number"],
+            "confidence": result["confidence"],
+            "source": result["source"],
+            "candidates": result["candidates"],
+            "duration": round(result["duration"], 4),
+        }
+
+    def save_upload(self, name, data):
+        """Write an uploaded document where the workers can open it
+        Returns:
+            path of the temporary copy
+        """
+        with tempfile.NamedTemporaryFile(dir=self.upload_dir.name, suffix=".pdf",
+                                         delete=False) as f:
+            f.write(data)
+        return f.name
+
+    def snapshot(self):
+        """Return the service metrics as a plain dict"""
+        snapshot = self.metrics.snapshot(max(0, self.metrics.in_flight - self.workers))
+        snapshot.update(workers=self.workers, max_queue=self.max_queue)
+        return snapshot
+
+    def serve(self, port=DEFAULT_PORT):
+        """Create the HTTP server on localhost
+        Returns:
+            the ThreadingHTTPServer (call serve_forever(); port 0 picks a free port)
+        """
+        self.server = ThreadingHTTPServer((HOST, port), make_handler(self))
+        self.server.daemon_threads = True
+        return self.server
+
+    def close(self):
+        """Stop the HTTP server and the workers"""
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        self.pool.shutdown()
+        self.upload_dir.cleanup()
+
+
+def parse_request(service, content_type, body, query):
+    """Turn a /detect request into (files, allow_ocr, ocr_only)
+    Raises:
+        RequestError for malformed requests
+    """
+    options = {key: values[-1] for key, values in parse_qs(query).items()}
+    if content_type == "application/pdf":
+        if not body.startswith(b"%PDF"):
+            raise RequestError(400, "body is not a PDF")
+        name = options.get("name", "upload.pdf")
+        files = [(name, service.save_upload(name, body), True)]
+        return files, options.get("ocr", "1") != "0", options.get("ocr_only", "0") == "1"
+
+    try:
+        request = json.loads(body.decode("utf-8"))
+    except (UnicodeDecodeError, ValueError):
+        raise RequestError(400, "body must be JSON or a PDF")
+    if not isinstance(request, dict):
+        raise RequestError(400, "JSON body must be an object")
+
+    paths = request.get("paths", [])
+    if "path" in request:
+        paths = [request["path"]] + list(paths)
+    if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+        raise RequestError(400, "paths must be a list of strings")
+    files = [(path, path, False) for path in paths]
+    try:
+        for index, document in enumerate(request.get("documents", [])):
+            try:
+                data = base64.b64decode(document["data"], validate=True)
+            except (KeyError, TypeError, binascii.Error):
+                raise RequestError(400, f"documents[{index}].data must be base64")
+            name = document.get("name") or f"document_{index}.pdf"
+            files.append((name, service.save_upload(name, data), True))
+    except RequestError:
+        # The request is not detected, so nothing else deletes the documents saved so far
+        for _, path, uploaded in files:
+            if uploaded:
+                Path(path).unlink(missing_ok=True)
+        raise
+    if not files:
+        raise RequestError(400, "no path, paths or documents given")
+    return files, bool(request.get("ocr", True)), bool(request.get("ocr_only", False))
+
+
+def make_handler(service):
+    """Return a request handler class bound to a service"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/metrics":
+                self.send_json(200, service.snapshot())
+            elif path == "/health":
+                self.send_json(200, {"status": "ok", "workers": service.workers,
+                                     "ocr": service.allow_ocr and detection.OCR_AVAILABLE})
+            else:
+                self.send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = None
+            try:
+                if url.path != "/detect":
+                    raise RequestError(404, "not found")
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > MAX_BODY_BYTES:
+                    raise RequestError(413, "request too large")
+                body = self.rfile.read(length)
+                content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+                files, allow_ocr, ocr_only = parse_request(service, content_type, body, url.query)
+                results = service.detect(files, allow_ocr, ocr_only)
+            except RequestError as e:
+                headers = e.headers
+                if body is None:
+                    # The unread body would be parsed as the next request on the connection
+                    headers = dict(headers, Connection="close")
+                self.send_json(e.status, {"error": str(e)}, headers)
+                return
+            self.send_json(200, {"results": results})
+
+        def log_message(self, format, *args):
+            log.debug("%s - %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def serve_forever(port=DEFAULT_PORT, workers=2, max_queue=DEFAULT_MAX_QUEUE, allow_ocr=True,
+                  timeout=TASK_TIMEOUT):
+    """Run the service until interrupted"""
+    quarantine = Quarantine()
+    service = ExtractionService(workers=workers, max_queue=max_queue, allow_ocr=allow_ocr,
+                                timeout=timeout, quarantine=quarantine)
+    server = service.serve(port)
+    log.info("Serving detection on http://%s:%d with %d workers", HOST,
+             server.server_address[1], workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("Stopping")
+    finally:
+        server.server_close()
+        service.server = None
+        service.close()
+        quarantine.close()
@@ -0,0 +1,219 @@
+"""
+Filter and sort layer over the in-memory file list.
+
+Sort keys are computed once when the list is loaded and every sort order is
+cached, so typing in the filter box only runs a precompiled match over names.
+When the filter text grows by appending characters, only the previous result is
+searched again instead of the whole folder.
+"""
+
+import re
+
+from catalog import NUMBERED_PATTERN, is_numbered
+
+SORT_NAME = "name"
+SORT_NATURAL = "natural"
+SORT_MTIME = "mtime"
+SORT_SIZE = "size"
+
+# Numbered filter values
+SHOW_ALL = None
+SHOW_NUMBERED = True
+SHOW_UNNUMBERED = False
+
+DIGITS = re.compile(r'(\d+)')
+
+
+def has_inspection_number(filename):
+    """Check if filename already has an inspection number pattern"""
+    return NUMBERED_PATTERN.match(filename) is not None
+
+
+def natural_key(name):
+    """Sort key that orders embedded numbers by value ("file2" before "file10")"""
+    parts = DIGITS.split(name.lower())
+    # Odd positions are digit runs; pair them so strings never compare with ints
+    return tuple((0, int(part), "") if i % 2 else (1, 0, part) for i, part in enumerate(parts))
+
+
+class FileEntry:
+    """One file of the list with its precomputed sort and filter keys
+    In recursive mode the name is a path relative to the root ("site/2024/a.pdf");
+    name sorts group the files by subfolder.
+    """
+
+    __slots__ = ("name", "size", "mtime_ns", "numbered", "lower", "grouped", "natural")
+
+    def __init__(self, name, size, mtime_ns, numbered=None):
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.numbered = is_numbered(name) if numbered is None else bool(numbered)
+        self.lower = name.lower()
+        folder, _, base = name.rpartition("/")
+        self.grouped = (folder, base)
+        self.natural = (natural_key(folder), natural_key(base))
+
+
+class FileListModel:
+    """Filters and sorts the files of a folder"""
+
+    SORT_KEYS = {
+        SORT_NAME: lambda e: e.grouped,
+        SORT_NATURAL: lambda e: e.natural,
+        SORT_MTIME: lambda e: (e.mtime_ns, e.name),
+        SORT_SIZE: lambda e: (e.size, e.name),
+    }
+
+    def __init__(self):
+        self.entries = []
+        self.positions = {}  # Name -> index in entries
+        self.sorted_cache = {}
+        self.last_query = None
+        self.last_result = None
+
+    def set_entries(self, entries):
+        """Replace the file list
+        Args:
+            entries: iterable of FileEntry or (name, size, mtime_ns, numbered) tuples
+        """
+        self.entries = [e if isinstance(e, FileEntry) else FileEntry(*e) for e in entries]
+        self.positions = {e.name: i for i, e in enumerate(self.entries)}
+        self.sorted_cache = {}
+        self.last_query = None
+        self.last_result = None
+
+    def add_entries(self, entries):
+        """Add the files of a partial listing, or update the ones that changed
+        Sort orders already computed are merged with the new files instead of
+        being sorted again, so a tree walk can add its batches as they arrive.
+        Args:
+            entries: iterable of FileEntry or (name, size, mtime_ns, numbered) tuples
+        Returns:
+            True if the list changed
+        """
+        added = []
+        replaced = False
+        for e in entries:
+            e = e if isinstance(e, FileEntry) else FileEntry(*e)
+            index = self.positions.get(e.name)
+            if index is None:
+                self.positions[e.name] = len(self.entries)
+                self.entries.append(e)
+                added.append(e)
+            elif (self.entries[index].size, self.entries[index].mtime_ns) != (e.size, e.mtime_ns):
+                self.entries[index] = e
+                replaced = True
+        if not (added or replaced):
+            return False
+
+        if replaced:
+            self.sorted_cache = {}
+        for (sort_mode, reverse), cached in self.sorted_cache.items():
+            # Two sorted runs: the sort merges them in linear time
+            run = sorted(added, key=self.SORT_KEYS[sort_mode], reverse=reverse)
+            self.sorted_cache[(sort_mode, reverse)] = sorted(
+                cached + run, key=self.SORT_KEYS[sort_mode], reverse=reverse)
+        self.last_query = None
+        self.last_result = None
+        return True
+
+    def rename_entry(self, old_name, new_name):
+        """Move a file to its new name, without rebuilding the list
+        A file that had the new name (replaced by the rename) is dropped.
+        Returns:
+            True if the list changed
+        """
+        index = self.positions.pop(old_name, None)
+        if index is None:
+            return False
+        old = self.entries[index]
+        entry = FileEntry(new_name, old.size, old.mtime_ns)
+        self.entries[index] = entry
+        dropped = [old]
+        target = self.positions.get(new_name)
+        if target is None:
+            self.positions[new_name] = index
+        else:
+            dropped.append(self.entries[target])
+            del self.entries[target]
+            self.positions = {e.name: i for i, e in enumerate(self.entries)}
+
+        for (sort_mode, reverse), cached in self.sorted_cache.items():
+            for e in dropped:
+                cached.remove(e)
+            # Binary search for the new place: only about log2(n) keys are computed
+            key = self.SORT_KEYS[sort_mode]
+            wanted = key(entry)
+            low, high = 0, len(cached)
+            while low < high:
+                middle = (low + high) // 2
+                current = key(cached[middle])
+                if (current > wanted) if reverse else (current < wanted):
+                    low = middle + 1
+                else:
+                    high = middle
+            cached.insert(low, entry)
+        self.last_query = None
+        self.last_result = None
+        return True
+
+    def sorted_entries(self, sort_mode, reverse=False):
+        """Return all entries in the given order (cached per order)"""
+        key = (sort_mode, reverse)
+        if key not in self.sorted_cache:
+            self.sorted_cache[key] = sorted(self.entries, key=self.SORT_KEYS[sort_mode],
+                                            reverse=reverse)
+        return self.sorted_cache[key]
+
+    @staticmethod
+    def compile_filter(text, use_regex=False):
+        """Build a name predicate for the filter text
+        Returns:
+            predicate taking a FileEntry, or None if the regex is invalid
+        """
+        if use_regex:
+            try:
+                pattern = re.compile(text, re.IGNORECASE)
+            except re.error:
+                return None
+            search = pattern.search
+            return lambda e: search(e.name) is not None
+        needle = text.lower()
+        return lambda e: needle in e.lower
+
+    def query(self, text="", use_regex=False, numbered=SHOW_ALL, sort_mode=SORT_NAME,
+              reverse=False, allowed_names=None):
+        """Return the entries matching the filters, in sort order
+        Args:
+            text: Name filter (substring, case-insensitive, or a regex)
+            use_regex: Treat text as a regular expression
+            numbered: SHOW_ALL, SHOW_NUMBERED or SHOW_UNNUMBERED
+            sort_mode: One of the SORT_* modes
+            allowed_names: Optional set of names to restrict to (e.g. content search hits)
+        Returns:
+            list of FileEntry, or None if the regex is invalid
+        """
+        predicate = self.compile_filter(text, use_regex) if text else None
+        if text and predicate is None:
+            return None
+
+        context = (use_regex, numbered, sort_mode, reverse, id(allowed_names))
+        candidates = None
+        if (not use_regex and self.last_query is not None
+                and self.last_query[1:] == context
+                and text.lower().startswith(self.last_query[0].lower())):
+            # Narrowing a substring filter: only the previous hits can still match
+            candidates = self.last_result
+        if candidates is None:
+            candidates = self.sorted_entries(sort_mode, reverse)
+            if numbered is not SHOW_ALL:
+                candidates = [e for e in candidates if e.numbered == numbered]
+            if allowed_names is not None:
+                candidates = [e for e in candidates if e.name in allowed_names]
+
+        result = [e for e in candidates if predicate(e)] if predicate else list(candidates)
+
+        self.last_query = (text,) + context
+        self.last_result = result
+        return result
@@ -0,0 +1,201 @@
+"""
+Streaming manifest export of a folder's PDFs for auditors.
+
+Every PDF is written as one CSV or JSON Lines row with its inspection number,
+how the number was obtained, its page count, size and modification time. Rows
+are written as the folder is walked: at most a window of files is held in
+memory at any time, so a 100,000-file tree exports in constant memory.
+
+Fields already known from the folder catalog (the viewer's detection cache) are
+used as they are; missing page counts, and the numbers of files without a number
+in their name, are computed in parallel worker processes and stored back in the
+catalog. Rows keep the walk order.
+
+The number of a row is the file name's inspection number prefix when it has
+one, otherwise the best detected number. Its source is 'text', 'ocr' or
+'manual' as recorded for that number, or 'filename' for a renamed file whose
+number was never detected or entered in the viewer.
+"""
+
+import csv
+import json
+import os
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from catalog import scan_folder
+import core
+from number_index import parse_inspection_number
+from tree_walker import TreeWalker
+
+FIELDS = ("path", "number", "source", "confidence", "page_count", "size", "modified", "error")
+FORMATS = ("csv", "jsonl")
+
+DETECT_NONE = "none"  # Only what the catalog already knows, plus page counts
+DETECT_TEXT = "text"  # Text layer for files without a known number
+DETECT_OCR = "ocr"  # Text layer, OCR when it is uncertain
+DETECT_MODES = (DETECT_NONE, DETECT_TEXT, DETECT_OCR)
+
+WINDOW_PER_WORKER = 4  # Files in flight per worker before the writer waits
+
+
+def format_for(path):
+    """Return the export format implied by a file name ('jsonl' or 'csv')"""
+    return "jsonl" if Path(path).suffix.lower() in (".jsonl", ".json") else "csv"
+
+
+def walk_entries(folder, recursive=False, max_depth=None, pattern="*.pdf"):
+    """Yield (name, (size, mtime_ns)) for the PDFs of a folder, listing by listing
+    Args:
+        recursive: Walk the whole tree (names are relative paths)
+    """
+    if not recursive:
+        yield from sorted(scan_folder(folder).items())
+        return
+    walker = TreeWalker(folder, max_depth=max_depth, pattern=pattern)
+    walker.start()
+    try:
+        while True:
+            batch = walker.results.get()
+            if batch is None:
+                return
+            yield from sorted(batch[1].items())
+    finally:
+        walker.cancel()
+
+
+class ManifestWriter:
+    """Writes manifest rows to a CSV or JSON Lines file"""
+
+    def __init__(self, f, fmt="csv"):
+        self.fmt = fmt
+        self.f = f
+        if fmt == "csv":
+            self.csv = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+            self.csv.writeheader()
+
+    def write(self, row):
+        if self.fmt == "csv":
+            self.csv.writerow(row)
+        else:
+            self.f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def cached_row(name, identity, record):
+    """Build a row from the listing and the catalog record (if still current)
+    Returns:
+        (row, (page count unknown, number unknown))
+    """
+    size, mtime_ns = identity
+    row = dict.fromkeys(FIELDS)
+    row.update(path=name, size=size,
+               modified=datetime.fromtimestamp(mtime_ns / 1e9).isoformat(timespec="seconds"))
+    if record is not None and (record["size"], record["mtime_ns"]) != (size, mtime_ns):
+        record = None  # Cataloged before the file changed
+    if record is not None:
+        row["page_count"] = record["page_count"]
+    apply_numbers(row, record["numbers"] if record else [],
+                  record["confidence"] if record else None, record["source"] if record else None)
+    return row, (row["page_count"] is None, row["number"] is None)
+
+
+def apply_numbers(row, numbers, confidence, source):
+    """Fill the number, source and confidence of a row (see the module docstring)"""
+    prefix = parse_inspection_number(row["path"].rsplit("/", 1)[-1])
+    if prefix is not None:
+        matches = bool(numbers) and numbers[0] == prefix
+        row.update(number=prefix, source=source if matches else "filename",
+                   confidence=confidence if matches else None)
+    elif numbers:
+        row.update(number=numbers[0], source=source, confidence=confidence)
+    else:
+        row.update(number=None, source=None, confidence=None)
+
+
+def export_manifest(folder, output, entries=None, catalog=None, submit=None, workers=1,
+                    detect=DETECT_TEXT, fmt=None, on_progress=None, cancelled=None):
+    """Stream the manifest of a folder to a file
+    Args:
+        entries: Iterable of (name, (size, mtime_ns)) to export (default: the folder's PDFs)
+        catalog: FolderCatalog of the folder, read for known fields and updated
+            with computed ones (opened by the caller on this thread)
+        submit: Callable submit(func, *args) -> Future running func in a worker;
+            None leaves missing page counts and numbers empty
+        workers: Workers behind submit, which sets how many files are in flight
+        detect: DETECT_NONE, DETECT_TEXT or DETECT_OCR for files without a known number
+        fmt: 'csv' or 'jsonl' (default: from the output name)
+        on_progress: Optional callback(rows written) every 100 rows
+        cancelled: Optional threading.Event; the partial file is discarded when set
+    Returns:
+        number of rows written, or None if cancelled
+    """
+    folder = Path(folder)
+    output = Path(output)
+    fmt = fmt or format_for(output)
+    entries = walk_entries(folder) if entries is None else entries
+    window = max(1, workers) * WINDOW_PER_WORKER
+    partial = output.with_name(output.name + ".partial")
+    pending = deque()  # (row, future), in walk order
+    written = 0
+    completed = False
+
+    def finish(row, future):
+        """Complete a row with its worker result and write it"""
+        nonlocal written
+        if future is not None:
+            try:
+                result = future.result()
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+            else:
+                if row["page_count"] is None:
+                    row["page_count"] = result["page_count"]
+                    if catalog:
+                        catalog.record_page_count(row["path"], result["page_count"])
+                if "numbers" in result and row["number"] is None:
+                    apply_numbers(row, result["numbers"], result["confidence"], result["source"])
+                    if catalog and result["numbers"]:
+                        catalog.record_detection(row["path"], result["numbers"],
+                                                 result["confidence"], result["source"])
+        writer.write(row)
+        written += 1
+        if on_progress and written % 100 == 0:
+            on_progress(written)
+
+    newline = "" if fmt == "csv" else "\n"
+    encoding = "utf-8-sig" if fmt == "csv" else "utf-8"  # Excel needs the BOM for Hebrew
+    try:
+        with open(partial, "w", encoding=encoding, newline=newline) as f:
+            writer = ManifestWriter(f, fmt)
+            for name, identity in entries:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                row, (needs_pages, needs_number) = cached_row(
+                    name, identity, catalog.get(name) if catalog else None)
+                detect_numbers = needs_number and detect != DETECT_NONE
+                future = None
+                if submit is not None and (needs_pages or detect_numbers):
+                    future = submit(core.describe, str(folder / name), detect_numbers,
+                                    detect == DETECT_OCR)
+                pending.append((row, future))
+
+                # Write finished rows at the head; wait for the oldest when the window is full
+                while pending and (len(pending) >= window or pending[0][1] is None
+                                   or pending[0][1].done()):
+                    finish(*pending.popleft())
+            while pending:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+                finish(*pending.popleft())
+        completed = True
+    finally:
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
+        if not completed:
+            partial.unlink(missing_ok=True)
+    os.replace(partial, output)
+    if on_progress:
+        on_progress(written)
+    return written
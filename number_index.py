@@ -0,0 +1,149 @@
+"""
+Index of inspection numbers already used in file names.
+
+Maps each inspection number (the digits before the first underscore of a renamed
+file) to the files that carry it, so conflicts can be checked while typing and
+duplicates reported across a whole folder tree. The index is kept in memory and
+persisted to SQLite so numbers seen in other folders are remembered.
+"""
+
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+INDEX_PATH = Path.home() / ".pdf_renamer" / "number_index.sqlite3"
+
+# Same prefix the app recognizes as "already has an inspection number"
+INSPECTION_PREFIX = re.compile(r'^(\d+)_.*\.pdf$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS numbered_files (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    number TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_numbered_files_number ON numbered_files (number);
+CREATE INDEX IF NOT EXISTS idx_numbered_files_folder ON numbered_files (folder);
+"""
+
+
+def parse_inspection_number(filename):
+    """Return the inspection number prefix of a file name, or None"""
+    match = INSPECTION_PREFIX.match(filename)
+    return match.group(1) if match else None
+
+
+def list_tree_pdf_names(root):
+    """Walk a folder tree and list the PDF names of every folder
+    Returns:
+        list of (folder, names) tuples
+    """
+    listings = []
+    for folder, _dirs, files in os.walk(root):
+        listings.append((folder, [f for f in files if f.lower().endswith('.pdf')]))
+    return listings
+
+
+class InspectionNumberIndex:
+    """In-memory inspection number -> files map, persisted to SQLite"""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path) if db_path else INDEX_PATH
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+        self.by_number = {}  # number -> set of path strings
+        self.by_folder = {}  # folder -> set of numbered path strings
+        for path, folder, number in self.conn.execute(
+                "SELECT path, folder, number FROM numbered_files"):
+            self.by_number.setdefault(number, set()).add(path)
+            self.by_folder.setdefault(folder, set()).add(path)
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.conn.close()
+
+    def _add(self, path, number):
+        folder = str(Path(path).parent)
+        self.by_number.setdefault(number, set()).add(path)
+        self.by_folder.setdefault(folder, set()).add(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO numbered_files (path, folder, number) VALUES (?, ?, ?)",
+            (path, folder, number))
+
+    def _remove(self, path):
+        number = parse_inspection_number(Path(path).name)
+        if number is None:
+            return
+        paths = self.by_number.get(number)
+        if paths is not None:
+            paths.discard(path)
+            if not paths:
+                del self.by_number[number]
+        folder_paths = self.by_folder.get(str(Path(path).parent))
+        if folder_paths is not None:
+            folder_paths.discard(path)
+        self.conn.execute("DELETE FROM numbered_files WHERE path = ?", (path,))
+
+    def index_folder(self, folder, names):
+        """Replace the indexed contents of one folder with a fresh listing
+        Args:
+            folder: Folder that was listed
+            names: File names currently in the folder
+        """
+        folder = str(Path(folder))
+        current = {}
+        for name in names:
+            number = parse_inspection_number(name)
+            if number is not None:
+                current[str(Path(folder) / name)] = number
+
+        known = self.by_folder.get(folder, set())
+        with self.conn:
+            for path in known - set(current):
+                self._remove(path)
+            for path in set(current) - known:
+                self._add(path, current[path])
+
+    def rename(self, old_path, new_path):
+        """Update the index after a file was renamed"""
+        old_path, new_path = str(old_path), str(new_path)
+        with self.conn:
+            self._remove(old_path)
+            # A replaced target file loses its own entry
+            self._remove(new_path)
+            number = parse_inspection_number(Path(new_path).name)
+            if number is not None:
+                self._add(new_path, number)
+
+    def conflicts(self, number, exclude=None):
+        """Return the files already using an inspection number
+        Args:
+            number: Inspection number to look up
+            exclude: Path to ignore (the file being renamed)
+        """
+        paths = self.by_number.get(number, ())
+        exclude = str(exclude) if exclude is not None else None
+        return sorted(p for p in paths if p != exclude)
+
+    def duplicates(self, root=None):
+        """Return inspection numbers used by more than one file
+        Args:
+            root: Only consider files inside this folder tree
+        Returns:
+            dict mapping number -> sorted list of paths
+        """
+        prefix = None
+        if root is not None:
+            prefix = os.path.join(str(Path(root)), "")
+        result = {}
+        for number, paths in self.by_number.items():
+            if prefix is not None:
+                paths = [p for p in paths if p.startswith(prefix)]
+            if len(paths) > 1:
+                result[number] = sorted(paths)
+        return dict(sorted(result.items()))
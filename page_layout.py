@@ -0,0 +1,198 @@
+"""
+Layout of a document's pages in the scrolling preview.
+
+Every page is placed from its size alone, so the scroll extent is correct before
+anything is rendered. The viewer renders only the pages that intersect the
+viewport (plus a small lookahead) and drops pages that scrolled far away, so a
+300-page report opens as fast as a one-page letter.
+
+The thumbnail grid is virtualized the same way: a 10,000-file folder only ever
+has the cells of the visible rows on the canvas, and the file name list only
+ever holds the names of the rows in view.
+"""
+
+import bisect
+import math
+
+PAGE_MARGIN = 10  # Pixels around the page column
+PAGE_GAP = 10  # Pixels between pages
+LOOKAHEAD = 1  # Pages rendered beyond each edge of the viewport
+KEEP_DISTANCE = 4  # Rendered pages further than this from the viewport are evicted
+
+# Zoom steps relative to the fit-to-width preview; above 1.0 pages are shown as
+# tiles so only the visible part of a page is rasterized at that scale
+ZOOM_LEVELS = (1.0, 1.5, 2.0, 3.0, 4.0)
+TILE_SIZE = 256  # Tile edge in pixels
+
+GRID_CELL_WIDTH = 136  # Thumbnail grid cell: thumbnail plus padding
+GRID_CELL_HEIGHT = 164  # Thumbnail plus two lines of file name
+
+
+class PageLayout:
+    """Vertical column of pages with their canvas positions"""
+
+    def __init__(self, page_sizes, zoom=1.0, margin=PAGE_MARGIN, gap=PAGE_GAP):
+        """
+        Args:
+            page_sizes: (width, height) in pixels of every page at fit-to-width size
+            zoom: Scale applied to every page
+        """
+        self.zoom = zoom
+        self.sizes = [(max(1, round(w * zoom)), max(1, round(h * zoom))) for w, h in page_sizes]
+        self.margin = margin
+        self.tops = []
+        y = margin
+        for _, height in self.sizes:
+            self.tops.append(y)
+            y += height + gap
+        self.total_height = (y - gap + margin) if self.sizes else 2 * margin
+        self.total_width = max((w for w, _ in self.sizes), default=0) + 2 * margin
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def page_box(self, page_number):
+        """Return the (x0, y0, x1, y1) canvas box of a page"""
+        width, height = self.sizes[page_number]
+        top = self.tops[page_number]
+        return self.margin, top, self.margin + width, top + height
+
+    def page_at(self, y):
+        """Return the page at (or just above) canvas coordinate y"""
+        return max(0, bisect.bisect_right(self.tops, y) - 1)
+
+    def visible_pages(self, top, bottom, lookahead=LOOKAHEAD):
+        """Return the page numbers to render for a viewport, nearest to its top first
+        Args:
+            top, bottom: Viewport extent in canvas coordinates
+        """
+        if not self.sizes:
+            return []
+        first = max(0, self.page_at(top) - lookahead)
+        last = min(len(self.sizes) - 1, self.page_at(bottom) + lookahead)
+        anchor = self.page_at(top)
+        return sorted(range(first, last + 1), key=lambda n: (n < anchor, abs(n - anchor)))
+
+    def pages_to_evict(self, rendered, top, bottom, keep=KEEP_DISTANCE):
+        """Return the rendered pages that are too far from the viewport to keep"""
+        first = self.page_at(top) - keep
+        last = self.page_at(bottom) + keep
+        return [n for n in rendered if n < first or n > last]
+
+    def visible_tiles(self, page_number, left, top, right, bottom, tile_size=TILE_SIZE):
+        """Return the tiles of a page that intersect a viewport
+        Returns:
+            list of (column, row, box), box being (x0, y0, x1, y1) in page pixels
+        """
+        x0, y0, x1, y1 = self.page_box(page_number)
+        left, top = max(left, x0), max(top, y0)
+        right, bottom = min(right, x1), min(bottom, y1)
+        if left >= right or top >= bottom:
+            return []
+        width, height = self.sizes[page_number]
+        tiles = []
+        for row in range(int((top - y0) // tile_size), math.ceil((bottom - y0) / tile_size)):
+            for column in range(int((left - x0) // tile_size), math.ceil((right - x0) / tile_size)):
+                box = (column * tile_size, row * tile_size,
+                       min((column + 1) * tile_size, width), min((row + 1) * tile_size, height))
+                tiles.append((column, row, box))
+        return tiles
+
+
+class GridLayout:
+    """Rows of equally sized thumbnail cells filling the width of the view"""
+
+    def __init__(self, count, width, cell_width=GRID_CELL_WIDTH, cell_height=GRID_CELL_HEIGHT,
+                 margin=PAGE_MARGIN):
+        """
+        Args:
+            count: Number of cells
+            width: Width of the view in pixels
+        """
+        self.count = count
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.margin = margin
+        self.columns = max(1, int((width - margin) // (cell_width + margin)))
+        self.rows = math.ceil(count / self.columns)
+        self.total_height = margin + self.rows * (cell_height + margin)
+
+    def cell_box(self, index):
+        """Return the (x0, y0, x1, y1) canvas box of a cell"""
+        row, column = divmod(index, self.columns)
+        x0 = self.margin + column * (self.cell_width + self.margin)
+        y0 = self.margin + row * (self.cell_height + self.margin)
+        return x0, y0, x0 + self.cell_width, y0 + self.cell_height
+
+    def index_at(self, x, y):
+        """Return the cell at canvas coordinates (x, y), or None between cells"""
+        column, x_offset = divmod(x - self.margin, self.cell_width + self.margin)
+        row, y_offset = divmod(y - self.margin, self.cell_height + self.margin)
+        if x < self.margin or y < self.margin or column >= self.columns:
+            return None
+        if x_offset >= self.cell_width or y_offset >= self.cell_height:
+            return None
+        index = int(row) * self.columns + int(column)
+        return index if index < self.count else None
+
+    def visible_range(self, top, bottom, lookahead=LOOKAHEAD):
+        """Return the range of cells in the rows of a viewport, plus lookahead rows"""
+        pitch = self.cell_height + self.margin
+        first_row = max(0, int((top - self.margin) // pitch) - lookahead)
+        last_row = int((bottom - self.margin) // pitch) + lookahead
+        return range(min(self.count, first_row * self.columns),
+                     min(self.count, (last_row + 1) * self.columns))
+
+
+class ListWindow:
+    """The rows of a long list that are in view; only these are put in the listbox"""
+
+    def __init__(self, count=0, rows=1):
+        """
+        Args:
+            count: Number of rows in the list
+            rows: Rows that fit in the view
+        """
+        self.count = count
+        self.rows = max(1, rows)
+        self.top = 0
+
+    def resize(self, count=None, rows=None):
+        """Change the list length or the view height, keeping the top row if possible"""
+        if count is not None:
+            self.count = count
+        if rows is not None:
+            self.rows = max(1, rows)
+        self.scroll_to(self.top)
+
+    def scroll_to(self, top):
+        """Put row top at the top of the view (clamped to the list)
+        Returns:
+            True if the view moved
+        """
+        top = max(0, min(int(top), self.count - self.rows))
+        moved = top != self.top
+        self.top = top
+        return moved
+
+    def moveto(self, fraction):
+        """Scroll to a fraction of the list, as a scrollbar drag asks"""
+        return self.scroll_to(round(float(fraction) * self.count))
+
+    def see(self, index):
+        """Scroll the least distance that brings row index into view"""
+        if index < self.top:
+            return self.scroll_to(index)
+        if index >= self.top + self.rows:
+            return self.scroll_to(index - self.rows + 1)
+        return False
+
+    def visible(self):
+        """Return the range of rows in view"""
+        return range(self.top, min(self.count, self.top + self.rows))
+
+    def fractions(self):
+        """Return the (first, last) scrollbar fractions of the view"""
+        if not self.count:
+            return 0.0, 1.0
+        return self.top / self.count, min(1.0, (self.top + self.rows) / self.count)
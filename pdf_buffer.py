@@ -0,0 +1,137 @@
+"""
+Read-once PDF buffers for folders on network shares.
+
+Opening a PDF by path makes MuPDF read it in many small random reads (the
+trailer, the xref table, then each object), and on an SMB share every one of
+them is a round-trip. open_pdf() instead reads the whole file with one large
+sequential read and opens the document from memory.
+
+The buffers are kept per process in a cache bounded by total size and keyed by
+the file's path, size and modification time, so the draft, the full preview,
+the thumbnail and the number extraction of the same file, run one after the
+other in a worker process, read it from the share once. Files too large to
+buffer are opened by path as before.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+
+import tracing
+
+CACHE_BYTES = 128 * 1024 * 1024  # Buffers kept per process
+MAX_BUFFERED_FILE = 64 * 1024 * 1024  # Larger files are opened by path
+READ_CHUNK = 8 * 1024 * 1024  # Size of each sequential read request
+
+
+class BufferCache:
+    """File contents by (path, size, mtime), least recently used dropped first"""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.buffers = OrderedDict()  # (path, size, mtime_ns) -> bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            data = self.buffers.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self.buffers.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.buffers or len(data) > self.max_bytes:
+                return
+            self.buffers[key] = data
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, dropped = self.buffers.popitem(last=False)
+                self.size -= len(dropped)
+
+    def clear(self):
+        with self.lock:
+            self.buffers.clear()
+            self.size = 0
+
+
+# The buffers of this process, shared by rendering and detection
+_cache = BufferCache()
+
+
+def read_file(path, size=None):
+    """Read a whole file with large sequential reads
+    Args:
+        size: Expected size in bytes (from a stat already made), to read in one go
+    Returns:
+        the file's bytes
+    """
+    with tracing.span("read_file") as span:
+        with open(path, "rb", buffering=0) as f:
+            if size is not None and size <= READ_CHUNK:
+                data = f.read(size + 1)  # One extra byte to see that it did not grow
+                if len(data) > size:
+                    data += f.read()
+            else:
+                chunks = []
+                while True:
+                    chunk = f.read(READ_CHUNK)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                data = b"".join(chunks)
+        span.set(bytes=len(data))
+    return data
+
+
+def read_pdf(path, cache=True):
+    """Return the contents of a PDF, from this process's buffers when unchanged
+    Args:
+        cache: Keep the contents for the next open (False for one-off bulk reads)
+    Returns:
+        bytes, or None if the file is too large to buffer
+    """
+    stat = os.stat(path)
+    if stat.st_size > MAX_BUFFERED_FILE:
+        return None
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    data = _cache.get(key) if cache else None
+    if data is None:
+        data = read_file(path, stat.st_size)
+        if cache and len(data) == stat.st_size:
+            _cache.put(key, data)
+    return data
+
+
+def open_pdf(path, cache=True):
+    """Open a PDF from a single sequential read of the file
+    The document does not keep the file open, so the file can be renamed while
+    the document is in use.
+    Args:
+        cache: Keep the contents for the next open (False for one-off bulk reads)
+    Returns:
+        fitz.Document (close it when done)
+    """
+    data = read_pdf(path, cache)
+    with tracing.span("fitz.open"):
+        if data is None:
+            return fitz.open(path)
+        return fitz.open(stream=data, filetype="pdf")
+
+
+def cache_stats():
+    """Return (hits, misses, bytes held) of this process's buffers"""
+    return _cache.hits, _cache.misses, _cache.size
+
+
+def clear_cache():
+    """Drop every buffer of this process"""
+    _cache.clear()
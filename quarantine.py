@@ -0,0 +1,100 @@
+"""
+Record of PDF files that hung, crashed or exhausted memory in a worker.
+
+A quarantined file is skipped by the viewer and by batch jobs until it changes
+on disk, so one pathological file costs a single timeout instead of one per
+attempt.
+"""
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+QUARANTINE_PATH = Path.home() / ".pdf_renamer" / "quarantine.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quarantine (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    detail TEXT,
+    recorded_at REAL NOT NULL
+);
+"""
+
+
+def file_identity(path):
+    """Return (size, mtime_ns) of a file, or None if it cannot be read"""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Quarantine:
+    """SQLite-backed list of quarantined files, keyed by absolute path"""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path) if db_path else QUARANTINE_PATH
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Used from worker callbacks as well as the caller's thread
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.conn.close()
+
+    def add(self, path, reason, detail="", identity=None):
+        """Quarantine a file in its current state
+        Args:
+            reason: Short failure kind ('timeout', 'memory', 'crash')
+            detail: Human-readable description of the failure
+            identity: (size, mtime_ns) the caller already listed; the path must then
+                be resolved, and the file system is not touched
+        """
+        if identity is None:
+            path, identity = Path(path).resolve(), file_identity(path) or (-1, -1)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO quarantine VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path), identity[0], identity[1], reason, detail, time.time()))
+
+    def get(self, path, identity=None):
+        """Return the quarantine record of a file as a dict, or None
+        A record is ignored once the file has changed since it was quarantined.
+        Args:
+            identity: (size, mtime_ns) the caller already listed; the path must then
+                be resolved, and the file system is not touched
+        """
+        if identity is None:
+            path, identity = Path(path).resolve(), file_identity(path)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, reason, detail, recorded_at FROM quarantine WHERE path = ?",
+                (str(path),)).fetchone()
+        if row is None or tuple(identity or ()) != (row[0], row[1]):
+            return None
+        return {"reason": row[2], "detail": row[3], "recorded_at": row[4]}
+
+    def is_quarantined(self, path):
+        """Check if a file is quarantined in its current state"""
+        return self.get(path) is not None
+
+    def release(self, path):
+        """Remove a file from quarantine"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM quarantine WHERE path = ?",
+                              (str(Path(path).resolve()),))
+
+    def entries(self):
+        """Return (path, reason, detail, recorded_at) for every record, newest first"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT path, reason, detail, recorded_at FROM quarantine "
+                "ORDER BY recorded_at DESC").fetchall()
@@ -0,0 +1,216 @@
+"""
+One place through which the viewer requests page rasters.
+
+Preview pages and the OCR region used to be rendered by separate code paths,
+each opening the file and rasterizing from scratch. The service sits in front of
+the scheduler's worker processes and:
+
+- hands identical requests made while a render is running the same pending
+  render instead of starting another one,
+- keeps finished rasters in a cache bounded by pixel count, and
+- serves a request from a cached raster of the same page that covers the
+  requested region at the requested resolution or finer, by cropping and
+  downscaling, which is much cheaper than opening and rendering the page again.
+
+Clips are fractions of the page (0..1), so requests can be made without knowing
+the page size in points. Rasters are keyed by the file's (size, mtime_ns) as the
+caller listed it, so requests never touch the file system on the caller's thread.
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from PIL import Image
+
+import rendering
+import tracing
+from scheduler import PREVIEW
+
+CACHE_PIXELS = 24_000_000  # Rasters kept, in pixels (about 72 MB of RGB)
+DERIVE_MAX_RATIO = 16  # Derive only when the crop has at most this many pixels per output pixel
+ZOOM_TOLERANCE = 0.01  # Cached rasters this much coarser still count as the same resolution
+
+FULL_PAGE = (0.0, 0.0, 1.0, 1.0)
+
+
+def contains(outer, inner):
+    """Check whether fractional clip outer covers clip inner"""
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and outer[2] >= inner[2] and outer[3] >= inner[3])
+
+
+def derive(image, image_clip, clip, scale, size=None, gray=False):
+    """Crop and scale a raster to a region it covers
+    Args:
+        image: Raster of image_clip
+        clip: Requested region, inside image_clip
+        scale: Output pixels per raster pixel (at most 1)
+        size: Exact output size (overrides scale)
+        gray: Convert to grayscale
+    Returns:
+        new PIL image
+    """
+    x_scale = image.width / (image_clip[2] - image_clip[0])
+    y_scale = image.height / (image_clip[3] - image_clip[1])
+    box = (round((clip[0] - image_clip[0]) * x_scale), round((clip[1] - image_clip[1]) * y_scale),
+           round((clip[2] - image_clip[0]) * x_scale), round((clip[3] - image_clip[1]) * y_scale))
+    with tracing.span("resize", width=image.width, height=image.height):
+        result = image.crop(box) if box != (0, 0, image.width, image.height) else image.copy()
+        if gray and result.mode != "L":
+            result = result.convert("L")
+        if size is None:
+            size = (max(1, round(result.width * scale)), max(1, round(result.height * scale)))
+        if result.size != tuple(size):
+            result = result.resize(size, Image.LANCZOS)
+    return result
+
+
+class RenderService:
+    """Deduplicating, caching front end to page renders in worker processes"""
+
+    def __init__(self, scheduler, cache_pixels=CACHE_PIXELS, timeout=None):
+        """
+        Args:
+            scheduler: Scheduler whose CPU lane runs rendering.render_region
+            cache_pixels: Total size of the cached rasters
+            timeout: Seconds a render may take (default: the worker pool's)
+        """
+        self.scheduler = scheduler
+        self.cache_pixels = cache_pixels
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()  # Raster key -> (image, effective zoom), least recent first
+        self.cached_pixels = 0
+        self.in_flight = {}  # Raster key -> (scheduler future, list of waiting futures)
+        # Crops and downscales run off the caller's (Tk) thread
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = {"rendered": 0, "cached": 0, "derived": 0, "shared": 0}
+
+    @staticmethod
+    def raster_key(pdf_path, identity, page_number, clip, zoom, gray):
+        """Identify a raster; a modified file gets new keys"""
+        return (str(pdf_path), identity, page_number, tuple(clip), round(zoom, 4), gray)
+
+    def request(self, pdf_path, identity, page_number=0, clip=None, zoom=rendering.PREVIEW_ZOOM,
+                gray=False, size=None, priority=PREVIEW):
+        """Request a raster of (part of) a page
+        Args:
+            identity: (size, mtime_ns) of the file as listed, None if unknown
+            clip: Region as fractions of the page (x0, y0, x1, y1); None = whole page
+            zoom: Resolution of the render
+            gray: Grayscale instead of RGB
+            size: Scale the result to this (width, height)
+            priority: Scheduler priority class of the render; a render shared
+                by several requests keeps the class of the first
+        Returns:
+            concurrent.futures.Future with a PIL image owned by the caller; cancel
+            it to drop the request (the render stops if nobody else waits for it)
+        """
+        clip = tuple(clip) if clip is not None else FULL_PAGE
+        key = self.raster_key(pdf_path, identity, page_number, clip, zoom, gray)
+        future = Future()
+        render = None
+
+        with self.lock:
+            source = self._find_source(key)
+            if source is not None:
+                self.stats["cached" if source[0] == key else "derived"] += 1
+                self._derive(future, key, source, size)
+                return future
+
+            entry = self.in_flight.get(key)
+            if entry is not None:
+                self.stats["shared"] += 1
+            else:
+                render = self.scheduler.submit(rendering.render_region, str(pdf_path), page_number,
+                                               clip, zoom, gray, priority=priority,
+                                               key=str(pdf_path), timeout=self.timeout)
+                entry = (render, [])
+                self.in_flight[key] = entry
+            entry[1].append((future, size))
+
+        # Registered outside the lock: the callback runs at once if the render is done
+        if render is not None:
+            render.add_done_callback(lambda f, key=key: self._on_rendered(key, f))
+        future.add_done_callback(lambda f, key=key: self._on_cancelled(key, f))
+        return future
+
+    def _find_source(self, key):
+        """Return (key, image, zoom) of a cached raster that can serve key, or None"""
+        path, identity, page_number, clip, zoom, gray = key
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            return (key,) + self.cache[key]
+        for cached_key, (image, cached_zoom) in reversed(self.cache.items()):
+            if cached_key[:3] != (path, identity, page_number) or (cached_key[5] and not gray):
+                continue
+            if cached_zoom < zoom * (1 - ZOOM_TOLERANCE) or not contains(cached_key[3], clip):
+                continue
+            # Downscaling a much finer raster costs more than a fresh render
+            if (cached_zoom / zoom) ** 2 > DERIVE_MAX_RATIO:
+                continue
+            self.cache.move_to_end(cached_key)
+            return cached_key, image, cached_zoom
+        return None
+
+    def _derive(self, future, key, source, size):
+        """Fill future from a cached raster on the service thread"""
+        source_key, image, source_zoom = source
+        zoom = key[4]
+
+        def work():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(derive(image, source_key[3], key[3],
+                                         min(1.0, zoom / source_zoom), size, key[5]))
+            except Exception as e:
+                future.set_exception(e)
+
+        self.executor.submit(work)
+
+    def _on_rendered(self, key, render):
+        """Cache a finished render and serve everyone waiting for it"""
+        with self.lock:
+            _, waiting = self.in_flight.pop(key, (None, []))
+            error = None if render.cancelled() else render.exception()
+            if not render.cancelled() and error is None:
+                result = render.result()
+                self._store(key, result["image"], result["zoom"])
+                self.stats["rendered"] += 1
+        for future, size in waiting:
+            if render.cancelled():
+                future.cancel()
+                continue
+            if error is not None:
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(error)
+            else:
+                self._derive(future, key, (key, result["image"], result["zoom"]), size)
+
+    def _on_cancelled(self, key, future):
+        """Stop a queued render once every request waiting for it was cancelled"""
+        if not future.cancelled():
+            return
+        with self.lock:
+            entry = self.in_flight.get(key)
+            if entry is None or not all(f.cancelled() for f, _ in entry[1]):
+                return
+        # Outside the lock: cancelling runs _on_rendered, which drops the entry
+        entry[0].cancel()
+
+    def _store(self, key, image, zoom):
+        """Add a raster to the cache, evicting the least recently used ones"""
+        pixels = image.width * image.height
+        if pixels > self.cache_pixels:
+            return
+        self.cache[key] = (image, zoom)
+        self.cached_pixels += pixels
+        while self.cached_pixels > self.cache_pixels:
+            _, (evicted, _) = self.cache.popitem(last=False)
+            self.cached_pixels -= evicted.width * evicted.height
+
+    def shutdown(self):
+        """Stop the service thread (the scheduler is owned by the caller)"""
+        self.executor.shutdown(wait=False)
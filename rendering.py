@@ -0,0 +1,240 @@
+"""
+Page rendering without any GUI dependency.
+
+Functions here return PIL images, so they can run in supervised worker processes
+and hand their result back to the viewer.
+
+Render sizes are derived from the page rectangle rather than a fixed zoom: a
+fixed zoom that suits A4 produces pixmaps of hundreds of megabytes on A0 plan
+sheets. The zoom is capped by a pixel budget, and regions that are still larger
+than one tile are rendered tile by tile, so the pixmap peak stays flat whatever
+page sizes show up.
+"""
+
+import math
+import os
+from collections import OrderedDict
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+import tracing
+from pdf_buffer import open_pdf
+
+PREVIEW_ZOOM = 2.0  # Zoom factor for better quality
+PREVIEW_MAX_WIDTH = 800
+PREVIEW_SUPERSAMPLE = 1.5  # Render this much wider than shown, for a sharp downscale
+DRAFT_SCALE = 0.25  # Size of the instant low-resolution preview relative to the full one
+THUMBNAIL_SIZE = 120  # Longest side of a grid thumbnail in pixels
+
+MAX_RENDER_PIXELS = 16_000_000  # Largest image a single render may produce
+TILE_PIXELS = 4_000_000  # Largest pixmap rendered in one piece
+
+# Zoom tiles are drawn from display lists kept by each worker process, so panning
+# over a heavy drawing interprets its content once rather than once per tile
+DISPLAY_LIST_CACHE_SIZE = 4
+_display_lists = OrderedDict()  # (path, mtime_ns, page) -> (document, display list, rect)
+
+
+def capped_zoom(rect, zoom, max_pixels=MAX_RENDER_PIXELS):
+    """Return the largest zoom (at most `zoom`) at which rect fits in max_pixels"""
+    pixels = rect.width * rect.height * zoom * zoom
+    if pixels <= max_pixels:
+        return zoom
+    return zoom * math.sqrt(max_pixels / pixels)
+
+
+def preview_zoom(rect, zoom=PREVIEW_ZOOM, max_width=PREVIEW_MAX_WIDTH):
+    """Zoom for a preview max_width pixels wide: more detail would be scaled away"""
+    zoom = min(zoom, max_width * PREVIEW_SUPERSAMPLE / rect.width)
+    return capped_zoom(rect, zoom)
+
+
+def page_preview_zoom(width, height, max_width=PREVIEW_MAX_WIDTH):
+    """preview_zoom() of a page given its size in points"""
+    return preview_zoom(fitz.Rect(0, 0, width, height), max_width=max_width)
+
+
+def pixmap_to_image(pix):
+    """Copy a pixmap into a PIL image (grayscale or RGB) without an extra bytes copy"""
+    mode = "L" if pix.n == 1 else "RGB"
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples_mv)
+
+
+def release_render_memory():
+    """Empty MuPDF's resource store so the worker's memory returns to its baseline"""
+    fitz.TOOLS.store_shrink(100)
+
+
+def render_clip(page, zoom, clip=None, gray=False, max_pixels=MAX_RENDER_PIXELS,
+                tile_pixels=TILE_PIXELS):
+    """Render (part of) a page to a PIL image within a memory budget
+    Args:
+        zoom: Requested zoom; lowered if the result would exceed max_pixels
+        clip: Region of the page in points (None = whole page)
+        gray: Render grayscale (one byte per pixel instead of three)
+        tile_pixels: Larger renders are split into clip tiles of about this size
+    Returns:
+        PIL image of the region
+    """
+    clip = fitz.Rect(clip) if clip is not None else page.rect
+    zoom = capped_zoom(clip, zoom, max_pixels)
+    matrix = fitz.Matrix(zoom, zoom)
+    colorspace = fitz.csGRAY if gray else fitz.csRGB
+
+    target = (clip * matrix).irect
+    if target.width * target.height <= tile_pixels:
+        with tracing.span("get_pixmap", width=target.width, height=target.height):
+            pix = page.get_pixmap(matrix=matrix, clip=clip, colorspace=colorspace, alpha=False)
+            img = pixmap_to_image(pix)
+            pix = None
+        return img
+
+    # Square tiles in page points; each is rendered, pasted and released in turn
+    step = math.sqrt(tile_pixels) / zoom
+    img = Image.new("L" if gray else "RGB", (target.width, target.height),
+                    255 if gray else (255, 255, 255))
+    y = clip.y0
+    while y < clip.y1:
+        x = clip.x0
+        while x < clip.x1:
+            tile = fitz.Rect(x, y, min(x + step, clip.x1), min(y + step, clip.y1))
+            with tracing.span("get_pixmap", tiled=True):
+                pix = page.get_pixmap(matrix=matrix, clip=tile, colorspace=colorspace, alpha=False)
+                img.paste(pixmap_to_image(pix), (pix.x - target.x0, pix.y - target.y0))
+                pix = None
+            x += step
+        y += step
+    return img
+
+
+def display_size(rect, max_width=PREVIEW_MAX_WIDTH):
+    """Return the (width, height) in pixels at which a page is shown in the preview"""
+    width = max(1, min(max_width, round(rect.width * preview_zoom(rect, max_width=max_width))))
+    return width, max(1, round(rect.height * width / rect.width))
+
+
+def render_page(pdf_path, page_number=0, zoom=PREVIEW_ZOOM, max_width=PREVIEW_MAX_WIDTH):
+    """Render one page of a PDF for the preview
+    Returns:
+        dict with page_count and image (PIL RGB image at the page's display size)
+    """
+    pdf_document = open_pdf(pdf_path)
+    try:
+        page_count = pdf_document.page_count
+        page = pdf_document[page_number]
+        size = display_size(page.rect, max_width)
+        img = render_clip(page, preview_zoom(page.rect, zoom, max_width))
+    finally:
+        pdf_document.close()
+        release_render_memory()
+
+    # Scale the supersampled render down to the size the layout reserved
+    if img.size != size:
+        with tracing.span("resize", width=size[0], height=size[1]):
+            img = img.resize(size, Image.LANCZOS)
+    return {"page_count": page_count, "image": img}
+
+
+def render_region(pdf_path, page_number=0, clip=None, zoom=PREVIEW_ZOOM, gray=False):
+    """Render (part of) a page for the render service
+    Args:
+        clip: Region as fractions of the page (x0, y0, x1, y1); None = whole page
+    Returns:
+        dict with image and zoom (the zoom actually used, after the pixel budget)
+    """
+    pdf_document = open_pdf(pdf_path)
+    try:
+        page = pdf_document[page_number]
+        rect = page.rect
+        if clip is not None:
+            rect = fitz.Rect(rect.x0 + clip[0] * rect.width, rect.y0 + clip[1] * rect.height,
+                             rect.x0 + clip[2] * rect.width, rect.y0 + clip[3] * rect.height)
+        img = render_clip(page, zoom, clip=rect, gray=gray)
+    finally:
+        pdf_document.close()
+        release_render_memory()
+    return {"image": img, "zoom": capped_zoom(rect, zoom)}
+
+
+def render_draft(pdf_path, max_width=PREVIEW_MAX_WIDTH, scale=DRAFT_SCALE):
+    """Cheap low-resolution render of the first page, shown while the full preview renders
+    Also reads the display size of every page, which is all the viewer needs to
+    lay out the whole document.
+    Returns:
+        dict with page_count, page_sizes, page_points (page sizes in points) and
+        image (about scale x the preview width; the viewer scales it up to
+        page_sizes[0])
+    """
+    pdf_document = open_pdf(pdf_path)
+    try:
+        page_sizes = []
+        page_points = []
+        for page in pdf_document:
+            page_sizes.append(display_size(page.rect, max_width))
+            page_points.append((page.rect.width, page.rect.height))
+        first_page = pdf_document[0]
+        img = render_clip(first_page, page_sizes[0][0] * scale / first_page.rect.width)
+    finally:
+        pdf_document.close()
+        release_render_memory()
+    return {"page_count": len(page_sizes), "page_sizes": page_sizes, "page_points": page_points,
+            "image": img}
+
+
+def render_thumbnail(pdf_path, size=THUMBNAIL_SIZE):
+    """Low-resolution render of the first page for the thumbnail grid
+    Returns:
+        PIL RGB image whose longest side is size pixels
+    """
+    pdf_document = open_pdf(pdf_path)
+    try:
+        first_page = pdf_document[0]
+        rect = first_page.rect
+        img = render_clip(first_page, size / max(rect.width, rect.height))
+    finally:
+        pdf_document.close()
+        release_render_memory()
+    return img
+
+
+def page_display_list(pdf_path, page_number):
+    """Return (display list, page rect) of a page, cached per worker process"""
+    key = (str(pdf_path), os.stat(pdf_path).st_mtime_ns, page_number)
+    entry = _display_lists.get(key)
+    if entry is not None:
+        _display_lists.move_to_end(key)
+        return entry[1], entry[2]
+
+    # Opened from memory: a cached document must not hold the file open, which
+    # would block renaming it on Windows
+    pdf_document = open_pdf(pdf_path)
+    with tracing.span("get_displaylist"):
+        page = pdf_document[page_number]
+        entry = (pdf_document, page.get_displaylist(), page.rect)
+    _display_lists[key] = entry
+    if len(_display_lists) > DISPLAY_LIST_CACHE_SIZE:
+        _display_lists.popitem(last=False)[1][0].close()
+    return entry[1], entry[2]
+
+
+def render_tile(pdf_path, page_number, page_size, box):
+    """Render one zoom tile of a page
+    Args:
+        page_size: (width, height) in pixels of the whole page at this zoom
+        box: (x0, y0, x1, y1) of the tile in those page pixels
+    Returns:
+        PIL RGB image of exactly the box size
+    """
+    display_list, rect = page_display_list(pdf_path, page_number)
+    scale = page_size[0] / rect.width
+    x0, y0, x1, y1 = box
+    clip = fitz.Rect(rect.x0 + x0 / scale, rect.y0 + y0 / scale,
+                     rect.x0 + x1 / scale, rect.y0 + y1 / scale)
+    with tracing.span("get_pixmap", width=x1 - x0, height=y1 - y0):
+        pix = display_list.get_pixmap(matrix=fitz.Matrix(scale, scale), clip=clip, alpha=False)
+        img = pixmap_to_image(pix)
+        pix = None
+    if img.size != (x1 - x0, y1 - y0):
+        img = img.resize((x1 - x0, y1 - y0), Image.BILINEAR)
+    return img
@@ -0,0 +1,218 @@
+"""
+One scheduler for the viewer's background work, by priority class.
+
+Previews, the quick-rename suggestion, thumbnails and bulk jobs (indexing,
+reports) all compete for the same CPU and disk. Tasks are queued here by
+priority class and started only when their lane has a free slot, so a preview
+requested while a thousand thumbnails are waiting is the next thing to run:
+
+    PREVIEW     the file the operator is looking at
+    SUGGESTION  the number suggested in the quick-rename dialog, reports the
+                operator asked for
+    PREFETCH    thumbnails and other work for files that may be looked at next
+    BULK        indexing and other folder-wide work
+
+CPU-bound work (rendering, OCR) runs in the supervised worker processes and is
+limited to one task per worker. I/O-bound work (listing folders, reading files)
+runs on threads with a separate limit, so a slow network share does not hold
+up renders and the other way round.
+
+Tasks can carry a key (the file's path): cancel_key() drops every queued task
+of a file that was renamed or scrolled away. While paused (a rename dialog is
+open) prefetch and bulk tasks stay queued; tasks already running finish.
+"""
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+PREVIEW = 0
+SUGGESTION = 1
+PREFETCH = 2
+BULK = 3
+PAUSABLE = PREFETCH  # Classes from this one on wait while the scheduler is paused
+
+CPU = "cpu"
+IO = "io"
+DEFAULT_IO_WORKERS = 4
+
+
+class _Task:
+    """A queued call and the future handed to the caller"""
+
+    __slots__ = ("future", "func", "args", "priority", "key", "timeout")
+
+    def __init__(self, future, func, args, priority, key, timeout):
+        self.future = future
+        self.func = func
+        self.args = args
+        self.priority = priority
+        self.key = key
+        self.timeout = timeout
+
+
+class _Lane:
+    """Priority queue and running count of one kind of work"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.queue = []  # (priority, sequence, task)
+        self.running = 0
+
+
+class Scheduler:
+    """Runs background work by priority class, with per-lane concurrency limits"""
+
+    def __init__(self, pool, io_workers=DEFAULT_IO_WORKERS, cpu_slots=None):
+        """
+        Args:
+            pool: SupervisedPool that runs the CPU lane's tasks
+            io_workers: Threads running I/O lane tasks at the same time
+            cpu_slots: CPU tasks handed to the pool at a time (default: one per worker)
+        """
+        self.pool = pool
+        self.lock = threading.Lock()
+        self.lanes = {CPU: _Lane(cpu_slots or len(pool.workers)), IO: _Lane(io_workers)}
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers,
+                                              thread_name_prefix="scheduler-io")
+        self.sequence = itertools.count()  # Keeps submission order within a class
+        self.keyed = {}  # Key -> set of its queued and running tasks
+        self.pause_count = 0
+
+    def submit(self, func, *args, priority=BULK, key=None, lane=CPU, timeout=None):
+        """Queue func(*args)
+        Args:
+            priority: PREVIEW, SUGGESTION, PREFETCH or BULK
+            key: Groups tasks for cancel_key(), usually the file's path
+            lane: CPU (supervised worker process) or IO (thread in this process)
+            timeout: Seconds a CPU task may run (default: the pool's); not
+                enforced for IO tasks, which cannot be stopped
+        Returns:
+            concurrent.futures.Future; cancelling it drops the task if it has not started
+        """
+        future = Future()
+        task = _Task(future, func, args, priority, key, timeout)
+        with self.lock:
+            heapq.heappush(self.lanes[lane].queue, (priority, next(self.sequence), task))
+            if key is not None:
+                self.keyed.setdefault(key, set()).add(task)
+        future.add_done_callback(lambda f, task=task: self._forget(task))
+        self._dispatch()
+        return future
+
+    def cancel_key(self, key):
+        """Drop every queued task of a key (tasks already running finish)
+        Returns:
+            number of tasks cancelled
+        """
+        with self.lock:
+            tasks = list(self.keyed.get(key, ()))
+        # Outside the lock: cancelling runs the futures' callbacks
+        return sum(task.future.cancel() for task in tasks)
+
+    def pause(self):
+        """Hold prefetch and bulk tasks until resume() (calls nest)"""
+        with self.lock:
+            self.pause_count += 1
+
+    def resume(self):
+        """Undo one pause() and start the tasks that were held"""
+        with self.lock:
+            self.pause_count = max(0, self.pause_count - 1)
+        self._dispatch()
+
+    @contextmanager
+    def paused(self):
+        """Hold prefetch and bulk tasks for the duration of a with block"""
+        self.pause()
+        try:
+            yield
+        finally:
+            self.resume()
+
+    def pending(self, lane=None):
+        """Return the number of queued tasks (of one lane, or of both)"""
+        with self.lock:
+            lanes = [self.lanes[lane]] if lane else self.lanes.values()
+            return sum(1 for l in lanes for _, _, task in l.queue if not task.future.done())
+
+    def _forget(self, task):
+        """Remove a finished or cancelled task from its key"""
+        if task.key is None:
+            return
+        with self.lock:
+            tasks = self.keyed.get(task.key)
+            if tasks is not None:
+                tasks.discard(task)
+                if not tasks:
+                    del self.keyed[task.key]
+
+    def _dispatch(self):
+        """Start the most urgent queued tasks while their lane has free slots"""
+        starts = []
+        with self.lock:
+            for name, lane in self.lanes.items():
+                while lane.queue and lane.running < lane.limit:
+                    priority, _, task = lane.queue[0]
+                    if self.pause_count and priority >= PAUSABLE:
+                        break  # Everything after it in the heap is held too
+                    heapq.heappop(lane.queue)
+                    if task.future.done():
+                        continue  # Cancelled while queued
+                    lane.running += 1
+                    starts.append((name, task))
+
+        for name, task in starts:
+            if not task.future.set_running_or_notify_cancel():
+                self._finished(name)
+            elif name == CPU:
+                self._start_cpu(task)
+            else:
+                self.io_executor.submit(self._run_io, task)
+
+    def _finished(self, name):
+        """Free a lane slot and start the next task"""
+        with self.lock:
+            self.lanes[name].running -= 1
+        self._dispatch()
+
+    def _start_cpu(self, task):
+        """Hand a task to the worker pool and copy its outcome back when done"""
+        try:
+            inner = self.pool.submit(task.func, *task.args, timeout=task.timeout)
+        except Exception as e:
+            task.future.set_exception(e)
+            self._finished(CPU)
+            return
+
+        def done(inner):
+            if inner.cancelled():
+                task.future.set_exception(CancelledError())
+            elif inner.exception() is not None:
+                task.future.set_exception(inner.exception())
+            else:
+                task.future.set_result(inner.result())
+            self._finished(CPU)
+
+        inner.add_done_callback(done)
+
+    def _run_io(self, task):
+        """Run an I/O task on a scheduler thread"""
+        try:
+            task.future.set_result(task.func(*task.args))
+        except Exception as e:
+            task.future.set_exception(e)
+        finally:
+            self._finished(IO)
+
+    def shutdown(self):
+        """Cancel queued tasks and stop the I/O threads (the pool is owned by the caller)"""
+        with self.lock:
+            tasks = [task for lane in self.lanes.values() for _, _, task in lane.queue]
+            for lane in self.lanes.values():
+                lane.queue = []
+        for task in tasks:
+            task.future.cancel()
+        self.io_executor.shutdown(wait=False)
@@ -0,0 +1,92 @@
+"""
+Cold-start helpers: deferred module imports, background warm-up and a startup
+milestone report.
+
+PyMuPDF and Pillow take a noticeable share of the time before the window
+appears, and far more on slow virtual desktops. The viewer refers to them
+through DeferredModule stand-ins, shows its window, and then imports them on a
+background thread, so they are usually loaded by the time the user picks a file.
+"""
+
+import importlib
+import threading
+import time
+
+
+class DeferredModule:
+    """Stands in for a module until one of its attributes is first used"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            # The import lock makes this wait for a warm-up thread importing it
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+
+class WarmUp:
+    """Runs imports and other slow one-time tasks on a background thread"""
+
+    def __init__(self, module_names, tasks=(), profile=None):
+        """
+        Args:
+            module_names: Modules to import
+            tasks: Callables run after the imports (errors are kept, not raised)
+            profile: Optional StartupProfile to mark when imports and tasks finish
+        """
+        self.module_names = module_names
+        self.tasks = tasks
+        self.profile = profile
+        self.errors = []
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        """Start the background thread"""
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for name in self.module_names:
+                importlib.import_module(name)
+            if self.profile:
+                self.profile.mark("modules warmed up")
+            for task in self.tasks:
+                try:
+                    task()
+                except Exception as e:
+                    self.errors.append(e)
+            if self.profile:
+                self.profile.mark("warm-up tasks done")
+        except Exception as e:
+            # The module is imported again, and fails visibly, where it is used
+            self.errors.append(e)
+        finally:
+            self.done.set()
+
+
+class StartupProfile:
+    """Startup milestones, in milliseconds since the profile was created"""
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.milestones = []
+
+    def mark(self, name):
+        """Record a milestone (only the first time it is reached)"""
+        if name not in dict(self.milestones):
+            self.milestones.append((name, (time.perf_counter() - self.started) * 1000))
+
+    def report(self):
+        """Return the milestones as printable lines"""
+        lines = []
+        previous = 0.0
+        for name, elapsed in self.milestones:
+            lines.append(f"{name:<24} {elapsed:8.1f} ms  (+{elapsed - previous:.1f})")
+            previous = elapsed
+        return lines
@@ -0,0 +1,261 @@
+"""
+Supervised worker processes for rendering and extraction.
+
+Some PDFs (malformed xref tables, gigantic vector drawings, decompression bombs)
+make PyMuPDF hang for minutes or allocate gigabytes. Each task runs in a worker
+process that is watched by a supervisor thread: a task that exceeds its
+wall-clock timeout or memory limit, or whose worker dies, has its worker killed
+and replaced, and its future fails with a TaskFailed subclass instead of
+stalling the caller.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+
+import tracing
+
+# psutil is optional; without it the memory limit is read from /proc (Linux only)
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_TIMEOUT = 60.0  # Seconds per task
+DEFAULT_MEMORY_LIMIT_MB = 1536  # Resident memory per worker
+POLL_INTERVAL = 0.1  # Seconds between timeout and memory checks
+
+
+class TaskFailed(Exception):
+    """A supervised task was stopped or lost its worker"""
+    reason = "failed"
+
+
+class TaskTimeout(TaskFailed):
+    """The task ran longer than its timeout"""
+    reason = "timeout"
+
+
+class TaskMemoryExceeded(TaskFailed):
+    """The worker's resident memory exceeded the limit"""
+    reason = "memory"
+
+
+class WorkerCrashed(TaskFailed):
+    """The worker process died while running the task"""
+    reason = "crash"
+
+
+class PoolShutDown(TaskFailed):
+    """The pool was shut down while the task was running; the task itself did nothing wrong"""
+    reason = "shutdown"
+
+
+def process_rss(pid):
+    """Return the resident memory of a process in bytes, or None if unknown"""
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker_main(conn):
+    """Worker loop: run (func, args, trace) tasks until None is received
+    Sends (ok, result or exception, spans recorded while tracing) for each task.
+    """
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        func, args, trace = task
+        tracing.tracer.enable(trace)
+        try:
+            with tracing.span(f"worker.{func.__name__}"):
+                result = (True, func(*args))
+        except Exception as e:
+            result = (False, e)
+        spans = tracing.tracer.drain() if trace else None
+        try:
+            conn.send(result + (spans,))
+        except Exception as e:
+            # Result (or exception) could not be pickled
+            conn.send((False, RuntimeError(f"{type(e).__name__}: {e}"), spans))
+
+
+class _Worker:
+    """One worker process and the task it is running"""
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None  # (future, started_at, timeout, name, trace start) while busy
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+        self.conn.close()
+
+
+class SupervisedPool:
+    """Runs picklable functions in worker processes with a timeout and memory limit
+    Futures returned by submit() work with concurrent.futures.wait().
+    """
+
+    def __init__(self, workers=1, timeout=DEFAULT_TIMEOUT,
+                 memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB, poll_interval=POLL_INTERVAL):
+        """
+        Args:
+            workers: Number of worker processes
+            timeout: Wall-clock seconds a task may run (None = no limit)
+            memory_limit_mb: Resident memory a worker may use (None = no limit)
+        """
+        self.timeout = timeout
+        self.memory_limit = memory_limit_mb * 1024 * 1024 if memory_limit_mb else None
+        self.poll_interval = poll_interval
+        self.context = multiprocessing.get_context("spawn")
+        self.tasks = deque()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.closed = False
+        # Workers start right away so their imports overlap with the caller's startup
+        self.workers = [_Worker(self.context) for _ in range(max(1, workers))]
+        self.thread = threading.Thread(target=self._supervise, daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, timeout=None):
+        """Queue func(*args) for a worker
+        Args:
+            timeout: Overrides the pool's timeout for this task
+        Returns:
+            concurrent.futures.Future with the result, or failing with the task's
+            exception or a TaskFailed subclass
+        """
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("pool is shut down")
+            # Tasks submitted while tracing is on record spans in their worker too
+            trace = time.perf_counter_ns() if tracing.tracer.enabled else None
+            self.tasks.append((future, func, args, timeout or self.timeout, trace))
+        self.wakeup.set()
+        return future
+
+    def shutdown(self):
+        """Cancel queued tasks, stop the workers and wait for the supervisor"""
+        with self.lock:
+            self.closed = True
+            while self.tasks:
+                self.tasks.popleft()[0].cancel()
+        self.wakeup.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def _assign(self):
+        """Hand queued tasks to idle workers"""
+        for worker in self.workers:
+            if worker.task is not None:
+                continue
+            with self.lock:
+                if not self.tasks:
+                    return
+                future, func, args, timeout, trace = self.tasks.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                worker.conn.send((func, args, trace is not None))
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            worker.task = (future, time.monotonic(), timeout, func.__name__, trace)
+
+    def _replace(self, worker, error):
+        """Kill a worker, fail its task and start a fresh worker in its place"""
+        future = worker.task[0]
+        worker.kill()
+        self.workers[self.workers.index(worker)] = _Worker(self.context)
+        future.set_exception(error)
+
+    def _check(self, worker):
+        """Enforce the timeout and memory limit of a busy worker"""
+        future, started_at, timeout, _, _ = worker.task
+        if timeout is not None and time.monotonic() - started_at > timeout:
+            self._replace(worker, TaskTimeout(f"task exceeded {timeout:.0f}s"))
+        elif not worker.process.is_alive():
+            self._replace(worker, WorkerCrashed(
+                f"worker exited with code {worker.process.exitcode}"))
+        elif self.memory_limit is not None:
+            rss = process_rss(worker.process.pid)
+            if rss is not None and rss > self.memory_limit:
+                self._replace(worker, TaskMemoryExceeded(
+                    f"worker used {rss // (1024 * 1024)} MB"))
+
+    def _supervise(self):
+        while True:
+            with self.lock:
+                closed = self.closed
+            if closed:
+                break
+            self.wakeup.clear()
+            self._assign()
+
+            busy = {w.conn: w for w in self.workers if w.task is not None}
+            if not busy:
+                self.wakeup.wait(self.poll_interval)
+                continue
+            for conn in wait_connections(list(busy), timeout=self.poll_interval):
+                worker = busy.pop(conn)
+                try:
+                    ok, value, spans = conn.recv()
+                except (EOFError, OSError):
+                    self._replace(worker, WorkerCrashed("worker connection lost"))
+                    continue
+                future, _, _, name, submitted_ns = worker.task
+                worker.task = None
+                if submitted_ns is not None:
+                    # Merged before the future completes, so callers see the spans
+                    tracing.tracer.merge(spans or [])
+                    tracing.tracer.add(f"pool.{name}", submitted_ns)
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+            for worker in busy.values():
+                self._check(worker)
+
+        for worker in self.workers:
+            if worker.task is not None:
+                worker.task[0].set_exception(PoolShutDown("pool shut down"))
+                worker.kill()
+            else:
+                worker.stop()
@@ -0,0 +1,190 @@
+"""
+Synthetic inspection documents with known numbers, for benchmarks and accuracy checks.
+
+Every generated file is recorded in a manifest (manifest.json) with the number a
+detector should find, so the same corpus serves timing runs and accuracy runs.
+Generation is seeded: the same arguments always produce the same documents.
+
+Kinds of documents:
+    text        red 5-6 digit number at a random spot in the search region
+    decoy       red number plus black 5-6 digit numbers (references, dates)
+    scanned     the text document rasterized with noise and a slight tilt,
+                leaving no text layer (only OCR can find the number)
+    oversized   A0 plan sheet with the red number
+    unnumbered  no inspection number at all, only decoys
+"""
+
+import io
+import json
+import random
+from pathlib import Path
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageFilter
+
+MANIFEST_NAME = "manifest.json"
+KINDS = ("text", "decoy", "scanned", "oversized", "unnumbered")
+
+A4 = (595, 842)
+A0 = (2384, 3370)
+SCAN_DPI = 150
+
+
+def random_number(rng):
+    """Return a random 5 or 6 digit inspection number"""
+    return str(rng.randint(10_000, 999_999))
+
+
+def number_position(rng, page_size):
+    """Return a random baseline point inside the top-left search region"""
+    width, height = page_size
+    return rng.uniform(30, width * 0.5 - 120), rng.uniform(40, height * 0.3 - 10)
+
+
+def make_text_pdf(path, page_size=A4, number=None, position=None, decoys=(), pages=1):
+    """Write a PDF with an optional red inspection number and black decoy numbers
+    Args:
+        number: Red number on the first page (None = no number)
+        position: (x, y) of the number (default: top-left corner of the region)
+        decoys: (text, (x, y)) pairs written in black
+        pages: Number of pages (pages after the first carry body text only)
+    """
+    doc = fitz.open()
+    try:
+        for page_number in range(pages):
+            page = doc.new_page(width=page_size[0], height=page_size[1])
+            scale = page_size[0] / A4[0]
+            if page_number == 0:
+                if number:
+                    page.insert_text(position or (40, 60), number, fontsize=20 * scale,
+                                     color=(1, 0, 0))
+                for text, point in decoys:
+                    page.insert_text(point, text, fontsize=10 * scale, color=(0, 0, 0))
+            page.insert_text((40 * scale, page_size[1] * 0.5), f"Inspection report page {page_number + 1}",
+                             fontsize=12 * scale)
+        doc.save(str(path), garbage=3, deflate=True)
+    finally:
+        doc.close()
+
+
+def make_scanned_pdf(path, source_path, rng, dpi=SCAN_DPI, noise=0.04, max_tilt=1.5):
+    """Rasterize a PDF's first page like a scanner would and save it as an image-only PDF
+    Args:
+        noise: Fraction of pixels flipped to random gray values
+        max_tilt: Largest rotation in degrees
+    """
+    source = fitz.open(str(source_path))
+    try:
+        page = source[0]
+        pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), colorspace=fitz.csRGB,
+                              alpha=False)
+        image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+        page_size = (page.rect.width, page.rect.height)
+    finally:
+        source.close()
+
+    image = image.rotate(rng.uniform(-max_tilt, max_tilt), resample=Image.BILINEAR,
+                         fillcolor=(255, 255, 255))
+    pixels = image.load()
+    for _ in range(int(image.width * image.height * noise)):
+        gray = rng.randint(0, 255)
+        pixels[rng.randrange(image.width), rng.randrange(image.height)] = (gray, gray, gray)
+    image = image.filter(ImageFilter.GaussianBlur(0.6))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=70)
+    doc = fitz.open()
+    try:
+        scan_page = doc.new_page(width=page_size[0], height=page_size[1])
+        scan_page.insert_image(scan_page.rect, stream=buffer.getvalue())
+        doc.save(str(path))
+    finally:
+        doc.close()
+
+
+def decoy_numbers(rng, page_size, count):
+    """Return black 5-6 digit decoys (reference numbers, dates) in and around the region"""
+    decoys = []
+    for _ in range(count):
+        text = rng.choice([f"Ref {random_number(rng)}", f"Order {random_number(rng)}",
+                           f"{rng.randint(1, 28):02d}{rng.randint(1, 12):02d}{rng.randint(20, 29)}"])
+        decoys.append((text, (rng.uniform(30, page_size[0] * 0.7),
+                              rng.uniform(40, page_size[1] * 0.4))))
+    return decoys
+
+
+def generate_document(folder, index, kind, rng):
+    """Write one document of a kind
+    Returns:
+        manifest record: dict with name, kind and number (None if there is none)
+    """
+    folder = Path(folder)
+    number = None if kind == "unnumbered" else random_number(rng)
+    page_size = A0 if kind == "oversized" else A4
+    name = f"{kind}_{index:05d}.pdf"
+    decoys = decoy_numbers(rng, page_size, rng.randint(1, 3)) if kind in ("decoy", "unnumbered") else ()
+
+    if kind == "scanned":
+        source = folder / f".{name}.source.pdf"
+        make_text_pdf(source, page_size, number, number_position(rng, page_size),
+                      decoy_numbers(rng, page_size, 1))
+        try:
+            make_scanned_pdf(folder / name, source, rng)
+        finally:
+            source.unlink()
+    else:
+        make_text_pdf(folder / name, page_size, number, number_position(rng, page_size), decoys)
+    return {"name": name, "kind": kind, "number": number}
+
+
+def generate_corpus(folder, per_kind=5, kinds=KINDS, seed=0):
+    """Write a corpus of every kind of document and its manifest
+    Returns:
+        list of manifest records
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    records = []
+    for kind in kinds:
+        for index in range(per_kind):
+            records.append(generate_document(folder, index, kind, rng))
+    write_manifest(folder, records)
+    return records
+
+
+def generate_large_folder(folder, count=10_000, seed=0):
+    """Write a folder of many small documents for listing benchmarks
+    Documents are written once and copied byte for byte under different names:
+    listing cost depends on the number of files, not on their content.
+    Returns:
+        list of manifest records
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    templates = []
+    for index in range(8):
+        template = folder / f".template_{index}.pdf"
+        make_text_pdf(template, A4, random_number(rng), number_position(rng, A4))
+        templates.append(template.read_bytes())
+        template.unlink()
+
+    records = []
+    for index in range(count):
+        # A third of the files already carry an inspection number in their name
+        name = f"{random_number(rng)}_scan_{index:05d}.pdf" if index % 3 == 0 else f"scan_{index:05d}.pdf"
+        (folder / name).write_bytes(templates[index % len(templates)])
+        records.append({"name": name, "kind": "listing", "number": None})
+    write_manifest(folder, records)
+    return records
+
+
+def write_manifest(folder, records):
+    """Write the manifest of a generated folder"""
+    (Path(folder) / MANIFEST_NAME).write_text(json.dumps(records, indent=1), encoding="utf-8")
+
+
+def read_manifest(folder):
+    """Read the manifest of a generated folder"""
+    return json.loads((Path(folder) / MANIFEST_NAME).read_text(encoding="utf-8"))
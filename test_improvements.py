@@ -7,11 +7,50 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# Import the main application
-from app import PDFViewerApp
-import tkinter as tk
-import fitz  # PyMuPDF
+import base64
+import csv
+import http.client
+import json
 import re
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+import accuracy
+from batch_job import BatchJob
+import benchmark
+import bulk_rename
+from catalog import FolderCatalog, scan_folder
+import core
+import detection
+from detection import OCR_ZOOM, SEARCH_REGION, detect_best_number
+from duplicates import PARTIAL_BLOCK, find_duplicate_files
+from extraction_service import MAX_BODY_BYTES, ExtractionService
+from file_filter import (FileEntry, FileListModel, SHOW_NUMBERED, SHOW_UNNUMBERED,
+                         SORT_MTIME, SORT_NATURAL, SORT_SIZE, has_inspection_number)
+import manifest_export
+from number_index import InspectionNumberIndex, parse_inspection_number
+from page_layout import GridLayout, ListWindow, PageLayout
+import pdf_buffer
+from quarantine import Quarantine
+from render_service import RenderService
+from rendering import (MAX_RENDER_PIXELS, page_display_list, render_clip, render_draft,
+                       render_page, render_thumbnail, render_tile)
+from scheduler import BULK, CPU, IO, PREFETCH, PREVIEW, SUGGESTION, Scheduler
+from startup import DeferredModule, StartupProfile, WarmUp
+from supervisor import SupervisedPool, TaskMemoryExceeded, TaskTimeout, WorkerCrashed
+import synthetic_corpus
+from text_index import TextIndex, run_indexer
+import tracing
+from tree_walker import TreeWalker
+from watch_daemon import StabilityTracker, WatchDaemon, is_complete_pdf
 
 def test_regex_patterns():
     """Test the regex patterns used for inspection number detection"""
@@ -96,6 +135,1221 @@ def test_ocr_preprocessing():
     
     print("  OCR preprocessing testing completed.\n")
 
+def test_folder_catalog():
+    """Test that the folder catalog reconciles listings and keeps what was learned"""
+    print("Testing folder catalog...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        catalog = FolderCatalog(tmp, db_path=Path(tmp) / "catalog.sqlite3")
+        
+        changed = catalog.reconcile({"b.pdf": (100, 1), "12345_a.pdf": (200, 1)})
+        assert changed
+        assert catalog.files() == ["12345_a.pdf", "b.pdf"]
+        assert catalog.files(unnumbered_only=True) == ["b.pdf"]
+        assert catalog.files(numbered_only=True) == ["12345_a.pdf"]
+        plan = catalog.conn.execute("EXPLAIN QUERY PLAN SELECT name FROM files "
+                                    "WHERE is_numbered = 0 ORDER BY name").fetchall()
+        assert "idx_files_numbered" in str([tuple(row) for row in plan])
+        assert [tuple(row) for row in catalog.entries()] == [("12345_a.pdf", 200, 1, 1),
+                                                              ("b.pdf", 100, 1, 0)]
+        print("  ✅ Listing reconciled, numbered filters answered by indexed SQL")
+        
+        catalog.record_page_count("b.pdf", 3)
+        catalog.record_detection("b.pdf", ["482113"], 1.0, "text")
+        assert not catalog.reconcile({"b.pdf": (100, 1), "12345_a.pdf": (200, 1)})
+        assert catalog.get("b.pdf")["numbers"] == ["482113"]
+        print("  ✅ Unchanged files keep page count and detection results")
+        
+        catalog.rename("b.pdf", "482113_b.pdf")
+        record = catalog.get("482113_b.pdf")
+        assert record["page_count"] == 3 and record["is_numbered"] == 1
+        assert catalog.files(unnumbered_only=True) == []
+        print("  ✅ Rename keeps the record and updates numbered status")
+        
+        catalog.reconcile({"482113_b.pdf": (150, 2)})
+        record = catalog.get("482113_b.pdf")
+        assert record["page_count"] is None and record["numbers"] == []
+        assert catalog.files() == ["482113_b.pdf"]
+        print("  ✅ Modified files are invalidated, deleted files removed")
+        
+        catalog.close()
+    
+    print("Folder catalog testing completed.\n")
+
+def test_inspection_number_index():
+    """Test conflict lookup and duplicate reporting of the inspection number index"""
+    print("Testing inspection number index...")
+    
+    assert parse_inspection_number("482113_report.pdf") == "482113"
+    assert parse_inspection_number("report.pdf") is None
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "index.sqlite3"
+        site_a = Path(tmp) / "site_a"
+        site_b = Path(tmp) / "site_b"
+        
+        index = InspectionNumberIndex(db_path)
+        index.index_folder(site_a, ["12345_a.pdf", "b.pdf"])
+        index.index_folder(site_b, ["12345_c.pdf", "67890_d.pdf"])
+        
+        assert index.conflicts("12345") == [str(site_a / "12345_a.pdf"), str(site_b / "12345_c.pdf")]
+        assert index.conflicts("12345", exclude=site_a / "12345_a.pdf") == [str(site_b / "12345_c.pdf")]
+        assert index.conflicts("55555") == []
+        print("  ✅ Conflicts found across sibling folders")
+        
+        assert list(index.duplicates(root=tmp)) == ["12345"]
+        assert index.duplicates(root=site_a) == {}
+        print("  ✅ Duplicate report limited to the chosen tree")
+        
+        index.rename(site_a / "b.pdf", site_a / "67890_b.pdf")
+        index.rename(site_b / "12345_c.pdf", site_b / "c.pdf")
+        assert list(index.duplicates()) == ["67890"]
+        index.close()
+        
+        # The index is persisted and reloaded
+        index = InspectionNumberIndex(db_path)
+        assert index.conflicts("67890") == [str(site_a / "67890_b.pdf"), str(site_b / "67890_d.pdf")]
+        index.index_folder(site_b, [])
+        assert index.duplicates() == {}
+        index.close()
+        print("  ✅ Renames update the index incrementally and it is persisted")
+    
+    print("Inspection number index testing completed.\n")
+
+def test_duplicate_detection():
+    """Test content-hash duplicate detection"""
+    print("Testing duplicate detection...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        large = os.urandom(3 * PARTIAL_BLOCK)
+        # Same size, same first and last blocks, different middle
+        large_variant = large[:PARTIAL_BLOCK + 10] + b"X" + large[PARTIAL_BLOCK + 11:]
+        contents = {
+            "a.pdf": large, "copy_of_a.pdf": large, "variant.pdf": large_variant,
+            "b.pdf": b"%PDF-small", "12345_b.pdf": b"%PDF-small",
+            "unique.pdf": b"%PDF-other",
+        }
+        for name, data in contents.items():
+            (folder / name).write_bytes(data)
+        
+        groups = find_duplicate_files(folder.glob("*.pdf"), max_workers=4)
+        assert groups == [[folder / "12345_b.pdf", folder / "b.pdf"],
+                          [folder / "a.pdf", folder / "copy_of_a.pdf"]]
+        print("  ✅ Identical files grouped, partial-hash collisions resolved by full hash")
+    
+    print("Duplicate detection testing completed.\n")
+
+def test_full_text_index():
+    """Test the FTS5 content index and its incremental indexer"""
+    print("Testing full-text index...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        for name, text in [("a.pdf", "Inspection 482113 Haifa site"), ("b.pdf", "Report 99999")]:
+            pdf_document = fitz.open()
+            pdf_document.new_page().insert_text((50, 50), text)
+            pdf_document.save(folder / name)
+            pdf_document.close()
+        entries = {f.name: (f.stat().st_size, f.stat().st_mtime_ns) for f in folder.glob("*.pdf")}
+        db_path = folder / "catalog.sqlite3"
+        
+        index = TextIndex(db_path)
+        assert index.pending(entries) == entries
+        run_indexer(db_path, folder, entries, threading.Event(), threading.Event())
+        assert index.pending(entries) == {}
+        assert index.search("4821") == {"a.pdf"}
+        assert index.search("haifa SITE") == {"a.pdf"}
+        assert index.search("haifa 99999") == set()
+        print("  ✅ Page text indexed and searchable by word prefix")
+        
+        index.rename("a.pdf", "482113_a.pdf")
+        assert index.search("haifa") == {"482113_a.pdf"}
+        changed = {"482113_a.pdf": entries["a.pdf"], "b.pdf": (1, 1)}
+        assert list(index.pending(changed)) == ["b.pdf"]
+        print("  ✅ Renames keep the text, changed files are re-indexed")
+        index.close()
+    
+    print("Full-text index testing completed.\n")
+
+def test_file_filter():
+    """Test the name filter and sort modes of the file list model"""
+    print("Testing file list filter and sort...")
+    
+    assert has_inspection_number("12345_report.pdf")
+    assert not has_inspection_number("report_12345.pdf")
+    
+    model = FileListModel()
+    model.set_entries([
+        ("file10.pdf", 300, 1, 0),
+        ("file2.pdf", 100, 3, 0),
+        ("12345_Site.pdf", 200, 2, 1),
+    ])
+    names = lambda entries: [e.name for e in entries]
+    
+    assert names(model.query()) == ["12345_Site.pdf", "file10.pdf", "file2.pdf"]
+    assert names(model.query(sort_mode=SORT_NATURAL)) == ["12345_Site.pdf", "file2.pdf", "file10.pdf"]
+    assert names(model.query(sort_mode=SORT_MTIME)) == ["file10.pdf", "12345_Site.pdf", "file2.pdf"]
+    assert names(model.query(sort_mode=SORT_SIZE)) == ["file2.pdf", "12345_Site.pdf", "file10.pdf"]
+    print("  ✅ Name, natural, mtime and size sort orders")
+    
+    assert names(model.query("SITE")) == ["12345_Site.pdf"]
+    assert names(model.query("fi")) == ["file10.pdf", "file2.pdf"]
+    assert names(model.query("file1")) == ["file10.pdf"]  # Narrowed from the previous hits
+    assert names(model.query("fi")) == ["file10.pdf", "file2.pdf"]  # Widened again
+    assert names(model.query(r"^\d+_", use_regex=True)) == ["12345_Site.pdf"]
+    assert model.query("(", use_regex=True) is None
+    assert names(model.query(numbered=SHOW_UNNUMBERED)) == ["file10.pdf", "file2.pdf"]
+    assert names(model.query(numbered=SHOW_NUMBERED)) == ["12345_Site.pdf"]
+    assert names(model.query(allowed_names={"file2.pdf"})) == ["file2.pdf"]
+    print("  ✅ Substring, regex, numbered and content-search filters")
+    
+    assert model.rename_entry("file2.pdf", "55555_file2.pdf")
+    assert names(model.query(sort_mode=SORT_NATURAL)) == ["12345_Site.pdf", "55555_file2.pdf",
+                                                          "file10.pdf"]
+    assert names(model.query(numbered=SHOW_NUMBERED)) == ["12345_Site.pdf", "55555_file2.pdf"]
+    assert model.rename_entry("file10.pdf", "12345_Site.pdf")  # Replaces the target
+    assert names(model.query()) == ["12345_Site.pdf", "55555_file2.pdf"]
+    assert model.entries[model.positions["12345_Site.pdf"]].size == 300
+    assert not model.rename_entry("missing.pdf", "other.pdf")
+    print("  ✅ Renames move one entry within the cached sort orders")
+    
+    model.set_entries([(f"scan_{i}.pdf", i, i, 0) for i in range(100000)])
+    model.query()
+    start = time.perf_counter()
+    for text in ["s", "sc", "sca", "scan_9", "scan_99"]:
+        model.query(text)
+    per_keystroke = (time.perf_counter() - start) / 5 * 1000
+    print(f"  ✅ 100k-row filter: {per_keystroke:.1f} ms per keystroke")
+    
+    window = ListWindow(100000, 20)
+    assert window.visible() == range(0, 20)
+    assert window.see(500) and window.visible() == range(481, 501)
+    assert not window.see(490)  # Already in view
+    window.moveto(0.5)
+    assert window.top == 50000 and window.fractions() == (0.5, 0.5002)
+    window.resize(count=30)
+    assert window.visible() == range(10, 30)  # Clamped to the shorter list
+    window.resize(count=5)
+    assert window.visible() == range(0, 5) and window.fractions() == (0.0, 1.0)
+    print("  ✅ Only the rows in view are put in the listbox")
+    
+    print("File list filter testing completed.\n")
+
+def test_tree_walker():
+    """Test the parallel recursive walker with depth and glob limits"""
+    print("Testing recursive folder walker...")
+    
+    def walk(root, **kwargs):
+        walker = TreeWalker(root, workers=4, **kwargs)
+        walker.start()
+        files = {}
+        while True:
+            batch = walker.results.get(timeout=10)
+            if batch is None:
+                return files
+            files.update(batch[1])
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        for rel in ["a.pdf", "notes.txt", "site1/2024/12345_b.pdf", "site1/c.pdf", "site2/d.PDF"]:
+            (root / rel).parent.mkdir(parents=True, exist_ok=True)
+            (root / rel).write_bytes(b"%PDF")
+        
+        assert sorted(walk(root)) == ["a.pdf", "site1/2024/12345_b.pdf", "site1/c.pdf", "site2/d.PDF"]
+        assert sorted(walk(root, max_depth=1)) == ["a.pdf", "site1/c.pdf", "site2/d.PDF"]
+        assert sorted(walk(root, max_depth=0)) == ["a.pdf"]
+        assert sorted(walk(root, pattern="1*.pdf")) == ["site1/2024/12345_b.pdf"]
+        print("  ✅ Whole tree listed with relative paths, depth and glob limits applied")
+        
+        walker = TreeWalker(root)
+        walker.cancel()
+        walker.start()
+        assert walker.results.get(timeout=10) is None
+        print("  ✅ Cancelled walk ends without results")
+        
+        model = FileListModel()
+        model.set_entries([(name, 1, 1, None) for name in walk(root)])
+        assert [e.name for e in model.query()] == ["a.pdf", "site1/c.pdf", "site1/2024/12345_b.pdf", "site2/d.PDF"]
+        assert [e.numbered for e in model.query()] == [False, False, True, False]
+        print("  ✅ Files grouped by subfolder in the list")
+        
+        streamed = FileListModel()
+        streamed.query(sort_mode=SORT_NATURAL)
+        walker = TreeWalker(root, workers=4)
+        walker.start()
+        while True:
+            batch = walker.results.get(timeout=10)
+            if batch is None:
+                break
+            streamed.add_entries((name, 1, 1, None) for name in batch[1])
+        assert [e.name for e in streamed.query(sort_mode=SORT_NATURAL)] == \
+            [e.name for e in model.query(sort_mode=SORT_NATURAL)]
+        assert not streamed.add_entries([("a.pdf", 1, 1, None)])  # Already listed, unchanged
+        assert streamed.add_entries([("a.pdf", 2, 5, None)])
+        assert [e.size for e in streamed.query("a.pdf")] == [2]
+        print("  ✅ Walk batches merged into the cached sort order as they arrive")
+    
+    print("Recursive folder walker testing completed.\n")
+
+def make_inspection_pdf(path, number, red=True):
+    """Write a one-page PDF with a number in the top-left region"""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_text((40, 60), number, fontsize=20, color=(1, 0, 0) if red else (0, 0, 0))
+    page.insert_text((40, 100), "Ref 99999", fontsize=10)
+    doc.save(str(path))
+    doc.close()
+
+def test_watch_daemon():
+    """Test the watch-folder daemon: settle detection, renames and review routing"""
+    print("Testing watch-folder daemon...")
+    
+    tracker = StabilityTracker(settle_time=2)
+    assert tracker.update({"a.pdf": (10, 1)}, now=0) == []
+    assert tracker.update({"a.pdf": (20, 2)}, now=1) == []  # Still growing
+    assert tracker.update({"a.pdf": (20, 2)}, now=2) == []
+    assert tracker.update({"a.pdf": (20, 2)}, now=3) == ["a.pdf"]
+    print("  ✅ Files are only picked up once size and mtime have settled")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        watch, review = root / "watch", root / "review"
+        watch.mkdir()
+        
+        partial = watch / "partial.pdf"
+        partial.write_bytes(b"%PDF-1.7\n1 0 obj")
+        assert not is_complete_pdf(partial)
+        partial.unlink()
+        make_inspection_pdf(watch / "scan1.pdf", "482113")
+        make_inspection_pdf(watch / "scan2.pdf", "482114", red=False)
+        assert is_complete_pdf(watch / "scan1.pdf")
+        print("  ✅ Files still being written (no %%EOF) are not processed")
+        
+        result = detect_best_number(str(watch / "scan1.pdf"), allow_ocr=False)
+        assert result["number"] == "482113" and result["confidence"] == 1.0
+        
+        daemon = WatchDaemon(watch, review, workers=1, allow_ocr=False,
+                             poll_interval=0.1, settle_time=0.2)
+        stop = threading.Event()
+        runner = threading.Thread(target=daemon.run_forever, args=(stop,))
+        runner.start()
+        deadline = time.time() + 60
+        while time.time() < deadline and daemon.metrics.snapshot(0)["review"] + \
+                daemon.metrics.snapshot(0)["renamed"] < 2:
+            time.sleep(0.1)
+        stop.set()
+        runner.join()
+        
+        assert sorted(p.name for p in watch.iterdir()) == ["482113_scan1.pdf"]
+        assert sorted(p.name for p in review.iterdir()) == ["scan2.pdf"]
+        metrics = daemon.metrics.snapshot(daemon.queue.qsize())
+        assert metrics["renamed"] == 1 and metrics["review"] == 1 and metrics["in_flight"] == 0
+        print("  ✅ Confident numbers renamed, uncertain files moved to review")
+        
+        # Stopping with one file running and others queued leaves them all in the hot folder
+        for index in range(3):
+            make_inspection_pdf(watch / f"f{index}.pdf", f"48212{index}")
+        daemon = WatchDaemon(watch, review, workers=1, allow_ocr=False, settle_time=0)
+        daemon.scan()
+        daemon.scan()
+        assert daemon.queue.qsize() == 3
+        pool = SupervisedPool(workers=1)
+        path, ready_at = daemon.queue.get_nowait()
+        daemon.slots.acquire()
+        daemon.metrics.started()
+        running = pool.submit(time.sleep, 30)  # Stands in for a slow detection
+        running.add_done_callback(lambda f: daemon.on_detected(path, ready_at, f))
+        deadline = time.time() + 30
+        while not running.running() and time.time() < deadline:
+            time.sleep(0.05)
+        daemon.dispatch(pool)  # One file waits in the pool, one in the daemon queue
+        pool.shutdown()
+        assert sorted(p.name for p in watch.iterdir() if p.name.startswith("f")) == \
+            ["f0.pdf", "f1.pdf", "f2.pdf"]
+        assert sorted(p.name for p in review.iterdir()) == ["scan2.pdf"]
+        metrics = daemon.metrics.snapshot(0)
+        assert metrics["failed"] == 0 and metrics["review"] == 0 and metrics["in_flight"] == 0
+        queued, _ = daemon.queue.get_nowait()
+        assert daemon.claimed == {queued.name}  # run_forever releases it on exit
+        print("  ✅ Work stopped by a shutdown stays in the hot folder and is not counted")
+    
+    print("Watch-folder daemon testing completed.\n")
+
+def test_batch_job():
+    """Test the checkpointed batch job: resume, retries and progress"""
+    print("Testing resumable batch job...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        folder = root / "scans"
+        folder.mkdir()
+        checkpoint = root / "job.sqlite3"
+        make_inspection_pdf(folder / "a.pdf", "482113")
+        make_inspection_pdf(folder / "b.pdf", "482114")
+        make_inspection_pdf(folder / "12345_done.pdf", "12345")
+        (folder / "broken.pdf").write_bytes(b"not a pdf")
+        
+        job = BatchJob(folder, checkpoint_path=checkpoint, retries=1)
+        seen = []
+        progress = job.run(on_result=lambda name, result: seen.append((name, result["number"])))
+        assert sorted(seen) == [("a.pdf", "482113"), ("b.pdf", "482114")]
+        assert progress["done"] == 2 and progress["failed"] == 1 and progress["total"] == 3
+        assert progress["files_per_minute"] > 0 and progress["eta_seconds"] is not None
+        broken = [r for r in job.results() if r["name"] == "broken.pdf"][0]
+        assert broken["status"] == "failed" and broken["attempts"] == 2
+        job.close()
+        print("  ✅ Results checkpointed, failing file retried and recorded")
+        
+        job = BatchJob(folder, checkpoint_path=checkpoint, retries=1)
+        assert list(job.pending()) == ["broken.pdf"]
+        make_inspection_pdf(folder / "broken.pdf", "482115")
+        progress = job.run()
+        assert progress["done"] == 3 and progress["failed"] == 0 and progress["eta_seconds"] == 0
+        assert job.pending() == {}
+        job.close()
+        print("  ✅ Restart skips finished work and only retries failures")
+        
+        (folder / "a.pdf").rename(folder / "c.pdf")
+        make_inspection_pdf(folder / "b.pdf", "482116")
+        os.utime(folder / "b.pdf", ns=(1, 1))
+        job = BatchJob(folder, checkpoint_path=checkpoint, retries=1)
+        assert sorted(job.pending()) == ["b.pdf", "c.pdf"]
+        progress = job.progress()
+        assert progress["total"] == 3 and progress["done"] == 1 and progress["remaining"] == 2
+        job.close()
+        print("  ✅ Checkpoints of renamed or modified files are not counted as done")
+    
+    print("Resumable batch job testing completed.\n")
+
+def hold_memory(mb):
+    """Allocate memory and keep it (runs in a supervised worker)"""
+    block = bytearray(mb * 1024 * 1024)
+    time.sleep(30)
+    return len(block)
+
+def test_supervised_workers():
+    """Test per-task timeouts, memory limits, crash isolation and quarantine"""
+    print("Testing supervised workers...")
+    
+    with SupervisedPool(workers=1, timeout=1.5, memory_limit_mb=300) as pool:
+        assert pool.submit(pow, 2, 10).result(timeout=30) == 1024
+        try:
+            pool.submit(int, "not a number").result(timeout=30)
+            assert False, "exception was not propagated"
+        except ValueError:
+            pass
+        print("  ✅ Results and exceptions returned from the worker")
+        
+        failures = [
+            (pool.submit(time.sleep, 60), TaskTimeout),
+            (pool.submit(os._exit, 3), WorkerCrashed),
+        ]
+        if sys.platform.startswith("linux"):
+            failures.append((pool.submit(hold_memory, 600, timeout=30), TaskMemoryExceeded))
+        started = time.time()
+        for future, expected in failures:
+            try:
+                future.result(timeout=60)
+                assert False, f"{expected.__name__} was not raised"
+            except expected:
+                pass
+        assert time.time() - started < 40
+        assert pool.submit(pow, 3, 3).result(timeout=30) == 27
+        print("  ✅ Hung, crashed and oversized tasks stopped; pool keeps working")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bad.pdf"
+        path.write_bytes(b"%PDF")
+        quarantine = Quarantine(Path(tmp) / "quarantine.sqlite3")
+        quarantine.add(path, "timeout", "task exceeded 20s")
+        assert quarantine.get(path)["reason"] == "timeout"
+        listed = scan_folder(tmp)["bad.pdf"]
+        assert quarantine.get(path.resolve(), listed)["reason"] == "timeout"
+        assert quarantine.get(path.resolve(), (listed[0] + 1, listed[1])) is None
+        time.sleep(0.01)
+        path.write_bytes(b"%PDF-1.7 replaced")
+        assert not quarantine.is_quarantined(path)
+        quarantine.close()
+        print("  ✅ Quarantine recorded and lifted once the file changes")
+    
+    print("Supervised workers testing completed.\n")
+
+def test_bounded_rendering():
+    """Test that render sizes are capped by the pixel budget on oversized pages"""
+    print("Testing memory-bounded rendering...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "a0.pdf"
+        doc = fitz.open()
+        page = doc.new_page(width=2384, height=3370)  # A0 plan sheet
+        page.draw_rect(fitz.Rect(100, 100, 2000, 3000), color=(0, 0, 1), fill=(0.8, 0.9, 1))
+        page.insert_text((60, 80), "482113", fontsize=40, color=(1, 0, 0))
+        doc.save(str(path))
+        doc.close()
+        
+        preview = render_page(str(path))["image"]
+        assert preview.width == 800
+        print("  ✅ A0 preview rendered straight at preview size")
+        
+        doc = fitz.open(str(path))
+        page = doc[0]
+        region = fitz.Rect(0, 0, page.rect.width * 0.5, page.rect.height * 0.3)
+        ocr_image = render_clip(page, 4.0, clip=region, gray=True)
+        assert ocr_image.mode == "L"
+        assert ocr_image.width * ocr_image.height <= MAX_RENDER_PIXELS * 1.01
+        print(f"  ✅ OCR region capped at {ocr_image.width}x{ocr_image.height} instead of "
+              f"{int(region.width * 4)}x{int(region.height * 4)}")
+        
+        whole = render_clip(page, 0.5)
+        tiled = render_clip(page, 0.5, tile_pixels=40_000)
+        assert whole.size == tiled.size
+        assert whole.getpixel((600, 800)) == tiled.getpixel((600, 800))
+        assert whole.getpixel((5, 5)) == tiled.getpixel((5, 5)) == (255, 255, 255)
+        doc.close()
+        print("  ✅ Tiled rendering matches a single render")
+    
+    print("Memory-bounded rendering testing completed.\n")
+
+def test_progressive_preview():
+    """Test the cheap draft render used by the preview"""
+    print("Testing progressive preview...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scan.pdf"
+        make_inspection_pdf(path, "482113")
+        
+        draft = render_draft(str(path))
+        full = render_page(str(path))
+        assert tuple(draft["page_sizes"][0]) == full["image"].size
+        assert full["image"].width == 800
+        assert draft["image"].width == 200 and draft["page_count"] == 1
+        print("  ✅ Draft rendered at a quarter of the preview size")
+    
+    print("Progressive preview testing completed.\n")
+
+def test_multi_page_layout():
+    """Test the virtualized multi-page layout of the preview"""
+    print("Testing multi-page viewer layout...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "report.pdf"
+        doc = fitz.open()
+        for number in range(300):
+            page = doc.new_page(width=842 if number == 5 else 595, height=595 if number == 5 else 842)
+            page.insert_text((50, 50), f"Page {number + 1}")
+        doc.save(str(path))
+        doc.close()
+        
+        started = time.perf_counter()
+        draft = render_draft(str(path))
+        elapsed = time.perf_counter() - started
+        assert draft["page_count"] == 300 and len(draft["page_sizes"]) == 300
+        assert draft["page_sizes"][0] == (800, 1132) and draft["page_sizes"][5] == (800, 565)
+        assert render_page(str(path), 5)["image"].size == (800, 565)
+        print(f"  ✅ 300 page sizes read with the first draft in {elapsed * 1000:.0f} ms")
+    
+    layout = PageLayout(draft["page_sizes"])
+    assert layout.page_box(0) == (10, 10, 810, 1142)
+    assert layout.page_box(1)[1] == 1152
+    assert layout.total_height == layout.page_box(299)[3] + 10
+    assert layout.page_at(1150) == 0 and layout.page_at(1152) == 1
+    
+    top = layout.page_box(100)[1] + 100
+    wanted = layout.visible_pages(top, top + 700)
+    assert wanted == [100, 101, 99]
+    assert layout.pages_to_evict([0, 95, 96, 100, 104, 105, 299], top, top + 700) == [0, 95, 105, 299]
+    print("  ✅ Only pages near the viewport are rendered; far pages are evicted")
+    
+    print("Multi-page viewer layout testing completed.\n")
+
+def test_tiled_zoom():
+    """Test tile selection and tile rendering of the zoomed preview"""
+    print("Testing tiled zoom...")
+    
+    layout = PageLayout([(800, 1132), (800, 1132)], zoom=2.0)
+    assert layout.sizes[0] == (1600, 2264)
+    x0, y0, _, _ = layout.page_box(1)
+    tiles = layout.visible_tiles(1, x0 + 300, y0 + 10, x0 + 700, y0 + 500)
+    assert [(column, row) for column, row, _ in tiles] == [(1, 0), (2, 0), (1, 1), (2, 1)]
+    assert tiles[0][2] == (256, 0, 512, 256)
+    assert layout.visible_tiles(0, x0, y0, x0 + 100, y0 + 100) == []
+    edge = layout.visible_tiles(0, 1500, 10, 1700, 100)
+    assert [box for _, _, box in edge] == [(1280, 0, 1536, 256), (1536, 0, 1600, 256)]
+    print("  ✅ Only tiles intersecting the viewport are selected, clipped to the page")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "drawing.pdf"
+        make_inspection_pdf(path, "123456")
+        
+        doc = fitz.open(str(path))
+        page = doc[0]
+        scale = 1600 / page.rect.width
+        expected = render_clip(page, scale, clip=fitz.Rect(256 / scale, 256 / scale,
+                                                           512 / scale, 512 / scale))
+        doc.close()
+        tile = render_tile(str(path), 0, (1600, 2264), (256, 256, 512, 512))
+        assert tile.size == (256, 256)
+        assert tile.tobytes() == expected.tobytes()
+        print("  ✅ A tile matches the same region rendered from the page")
+        
+        first = page_display_list(str(path), 0)[0]
+        assert page_display_list(str(path), 0)[0] is first
+        print("  ✅ The page display list is reused across tiles")
+    
+    print("Tiled zoom testing completed.\n")
+
+def test_thumbnail_grid():
+    """Test the virtualized thumbnail grid layout and thumbnail rendering"""
+    print("Testing thumbnail grid...")
+    
+    grid = GridLayout(10000, 600)
+    assert grid.columns == 4 and grid.rows == 2500
+    assert grid.cell_box(5) == (156, 184, 292, 348)
+    assert grid.index_at(160, 190) == 5
+    assert grid.index_at(150, 190) is None  # Gap between cells
+    assert GridLayout(3, 600).index_at(160, 190) is None  # Past the last file
+    
+    top = grid.cell_box(5000)[1]
+    visible = grid.visible_range(top, top + 500)
+    assert visible.start == 4996 and len(visible) == 20
+    print(f"  ✅ 10,000 files: {len(visible)} cells drawn for a 500 px viewport")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scan.pdf"
+        make_inspection_pdf(path, "123456")
+        thumbnail = render_thumbnail(str(path))
+        assert max(thumbnail.size) == 120 and thumbnail.size[0] < thumbnail.size[1]
+        print(f"  ✅ Thumbnail rendered at {thumbnail.size[0]}x{thumbnail.size[1]}")
+    
+    print("Thumbnail grid testing completed.\n")
+
+def test_render_service():
+    """Test request sharing, caching and derived rasters of the render service"""
+    print("Testing render service...")
+    
+    with tempfile.TemporaryDirectory() as tmp, SupervisedPool(workers=1, timeout=30) as pool:
+        path = Path(tmp) / "scan.pdf"
+        make_inspection_pdf(path, "123456")
+        scheduler = Scheduler(pool)
+        service = RenderService(scheduler)
+        identity = (path.stat().st_size, path.stat().st_mtime_ns)
+        
+        first = service.request(path, identity, 0, clip=SEARCH_REGION, zoom=OCR_ZOOM, gray=True)
+        second = service.request(path, identity, 0, clip=SEARCH_REGION, zoom=OCR_ZOOM, gray=True)
+        region = first.result(timeout=30)
+        assert second.result(timeout=30).tobytes() == region.tobytes()
+        assert region.mode == "L" and region.size == (1190, 1011)
+        assert service.stats["rendered"] == 1 and service.stats["shared"] == 1
+        print("  ✅ Identical requests in flight share one render")
+        
+        again = service.request(path, identity, 0, clip=SEARCH_REGION, zoom=OCR_ZOOM, gray=True)
+        assert again.result(timeout=30) is not region
+        smaller = service.request(path, identity, 0, clip=(0.0, 0.0, 0.25, 0.15), zoom=2.0, gray=True)
+        assert smaller.result(timeout=30).size == (298, 253)
+        assert service.stats == {"rendered": 1, "cached": 1, "derived": 1, "shared": 1}
+        print("  ✅ Repeats served from the cache, crops and downscales derived from it")
+        
+        # A color page cannot be derived from a grayscale raster
+        page = service.request(path, identity, 0, zoom=1.0, size=(200, 283)).result(timeout=30)
+        assert page.mode == "RGB" and page.size == (200, 283)
+        assert service.stats["rendered"] == 2
+        
+        # A preview raster is too coarse for OCR, so only the region is rendered
+        preview = service.request(path, identity, 0, zoom=2.0, size=(800, 1131))
+        assert preview.result(timeout=30).size == (800, 1131)
+        color_region = service.request(path, identity, 0, clip=SEARCH_REGION, zoom=OCR_ZOOM)
+        assert color_region.result(timeout=30).size == (1190, 1011)
+        assert service.stats["rendered"] == 4 and service.stats["derived"] == 1
+        print("  ✅ OCR renders just its region unless a cached raster covers the OCR zoom")
+        
+        # A modified file is listed with a new identity and renders again
+        modified = service.request(path, (identity[0], identity[1] + 1), 0, clip=SEARCH_REGION,
+                                   zoom=OCR_ZOOM)
+        assert modified.result(timeout=30).size == (1190, 1011)
+        assert service.stats["rendered"] == 5
+        
+        blocker = scheduler.submit(time.sleep, 1)
+        queued = service.request(path, identity, 0, zoom=3.0)
+        duplicate = service.request(path, identity, 0, zoom=3.0)
+        queued.cancel()
+        duplicate.cancel()
+        blocker.result(timeout=30)
+        time.sleep(0.3)
+        assert not service.in_flight and service.stats["rendered"] == 5
+        print("  ✅ A render nobody waits for any more is dropped")
+        service.shutdown()
+        scheduler.shutdown()
+    
+    print("Render service testing completed.\n")
+
+def test_core_rename():
+    """Test the GUI-free rename planning and applying"""
+    print("Testing core rename API...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        path = folder / "scan.pdf"
+        make_inspection_pdf(path, "123456")
+        
+        assert core.plan_number_rename(path, "!!") is None
+        plan = core.plan_number_rename(path, " 12/345 ")
+        assert plan.target == folder / "12345_scan.pdf" and not plan.target_exists
+        assert core.apply_rename(plan) == folder / "12345_scan.pdf"
+        assert not path.exists()
+        print("  ✅ Number rename planned from cleaned input and applied")
+        
+        plan = core.plan_name_rename(folder / "12345_scan.pdf", 'final: "v2"')
+        assert plan.target.name == "final v2.pdf"
+        assert core.plan_name_rename(folder / "12345_scan.pdf", "12345_scan").unchanged
+        
+        (folder / "final v2.pdf").write_bytes(b"%PDF-1.7 other")
+        assert plan.target_exists
+        try:
+            core.apply_rename(plan)
+            assert False, "an existing file was overwritten"
+        except FileExistsError:
+            pass
+        core.apply_rename(plan, overwrite=True)
+        assert (folder / "final v2.pdf").read_bytes().startswith(b"%PDF")
+        assert not (folder / "12345_scan.pdf").exists()
+        print("  ✅ Existing targets refused unless overwriting is confirmed")
+        
+        copies = [folder / "a.pdf", folder / "b.pdf", folder / "54321_c.pdf"]
+        for copy_path in copies:
+            copy_path.write_bytes(b"%PDF")
+        (folder / "777777_b.pdf").write_bytes(b"%PDF")
+        plans = core.plan_copy_renames(copies, "777777")
+        assert [p.target.name for p in plans] == ["777777_a.pdf"]
+        assert core.rename_copies(copies, "777777") == [(folder / "a.pdf", folder / "777777_a.pdf")]
+        print("  ✅ Copy renames skip numbered files and taken names")
+    
+    assert "tkinter" not in sys.modules
+    print("  ✅ Tests ran without importing tkinter")
+    
+    print("Core rename API testing completed.\n")
+
+def test_cold_start():
+    """Test deferred imports, background warm-up and the cached Tesseract probe"""
+    print("Testing cold start...")
+    
+    probe = ("import sys, app; "
+             "print(sorted(m for m in ('fitz', 'PIL.Image', 'pytesseract', 'core') if m in sys.modules))")
+    loaded = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert loaded.stdout.strip() == "[]", loaded.stdout + loaded.stderr
+    print("  ✅ Importing the app loads neither PyMuPDF, Pillow nor pytesseract")
+    
+    deferred = DeferredModule("json")
+    assert deferred._module is None
+    assert deferred.dumps([1]) == "[1]" and deferred._module is sys.modules["json"]
+    
+    profile = StartupProfile()
+    ran = []
+    warm_up = WarmUp(("colorsys", "no_such_module_xyz"), [lambda: ran.append(True)],
+                     profile=profile).start()
+    assert warm_up.done.wait(10)
+    assert "colorsys" in sys.modules and len(warm_up.errors) == 1 and not ran
+    warm_up = WarmUp(("colorsys",), [lambda: ran.append(True), lambda: 1 / 0],
+                     profile=profile).start()
+    assert warm_up.done.wait(10) and ran and isinstance(warm_up.errors[0], ZeroDivisionError)
+    assert [name for name, _ in profile.milestones] == ["modules warmed up", "warm-up tasks done"]
+    assert len(profile.report()) == 2
+    print("  ✅ Deferred modules load on first use; warm-up errors are kept, not raised")
+    
+    calls = []
+    original = (detection.probe_tesseract, detection._tesseract_checked, detection._tesseract_error)
+    try:
+        detection._tesseract_checked = False
+        detection.probe_tesseract = lambda: calls.append(1) or "missing"
+        assert detection.check_tesseract() == "missing" and detection.check_tesseract() == "missing"
+        detection.probe_tesseract = lambda: calls.append(1) or None
+        assert detection.check_tesseract() == "missing" and len(calls) == 1
+        assert detection.check_tesseract(retry=True) is None and detection.check_tesseract() is None
+        assert len(calls) == 2
+    finally:
+        (detection.probe_tesseract, detection._tesseract_checked,
+         detection._tesseract_error) = original
+    print("  ✅ The Tesseract probe result is cached, failures too, until a retry")
+    
+    print("Cold start testing completed.\n")
+
+def test_benchmark_suite():
+    """Test the synthetic corpus, the benchmark timer and baseline comparison"""
+    print("Testing benchmark suite...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        records = synthetic_corpus.generate_corpus(tmp, per_kind=1)
+        assert [r["kind"] for r in records] == list(synthetic_corpus.KINDS)
+        assert synthetic_corpus.read_manifest(tmp) == records
+        assert synthetic_corpus.generate_corpus(Path(tmp) / "again", per_kind=1) == records
+        for record in records:
+            result = detect_best_number(str(Path(tmp) / record["name"]), allow_ocr=False)
+            if record["kind"] in ("text", "decoy", "oversized"):
+                assert result["number"] == record["number"], (record, result)
+            elif record["kind"] == "scanned":
+                assert result["number"] is None
+        print("  ✅ Seeded corpus with a manifest; text-layer numbers are found, scans need OCR")
+        
+        listing = synthetic_corpus.generate_large_folder(Path(tmp) / "large", count=30)
+        assert len(listing) == 30 and len(list((Path(tmp) / "large").glob("*.pdf"))) == 30
+        print("  ✅ Listing folder with the requested number of files")
+    
+    calls = []
+    result = benchmark.measure(calls.append, ["a", "b"], warmup=1, repeats=3)
+    assert len(calls) == 8 and result["runs"] == 6
+    assert result["p50_ms"] <= result["p95_ms"] and result["per_second"] > 0
+    assert benchmark.percentile([1, 2, 3, 4], 0.5) == 2.5
+    print("  ✅ Warmup runs are not timed; p50/p95 and throughput reported")
+    
+    def baseline(p50):
+        return {"results": {"render": {"p50_ms": p50}, "tiny": {"p50_ms": 0.01}}}
+    rows = benchmark.compare(baseline(10.0), {"results": {"render": {"p50_ms": 12.0},
+                                                          "tiny": {"p50_ms": 0.02}}})
+    assert [(name, regressed) for name, _, _, _, regressed in rows] == [("render", True),
+                                                                       ("tiny", False)]
+    assert not any(row[4] for row in benchmark.compare(baseline(10.0), baseline(10.5)))
+    print("  ✅ Slowdowns beyond the threshold are regressions, timer noise is not")
+    
+    print("Benchmark suite testing completed.\n")
+
+def test_accuracy_harness():
+    """Test per-file accuracy records and the regression check of the detector harness"""
+    print("Testing accuracy harness...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic_corpus.generate_corpus(tmp, per_kind=1, kinds=("text", "decoy", "unnumbered"))
+        run = accuracy.run_harness(tmp, ocr_mode="off", log=lambda line: None)
+        summary = run["summary"]
+        assert summary["files"] == 3 and summary["accuracy"] == 1.0 and summary["false_accepts"] == 0
+        text_file = next(f for f in run["files"] if f["kind"] == "text")
+        assert text_file["stages"]["text"]["rank"] == 1 and "ocr" not in text_file["stages"]
+        assert summary["stages"]["text"]["runs"] == 3 and summary["stages"]["text"]["p50_ms"] > 0
+        print("  ✅ Per-file correctness, candidate rank and stage timings recorded")
+        
+        named = Path(tmp) / "named"
+        named.mkdir()
+        (named / "123456_report.pdf").write_bytes((Path(tmp) / text_file["name"]).read_bytes())
+        (named / "report.pdf").write_bytes(b"%PDF-")
+        assert accuracy.load_labels(named) == [{"name": "123456_report.pdf", "kind": "named",
+                                                "number": "123456"}]
+        print("  ✅ Renamed files are labeled by their inspection number prefix")
+    
+    assert accuracy.candidate_rank(["1", "1", "2"], "2") == 2
+    assert accuracy.candidate_rank(["1"], None) is None
+    assert accuracy.check(run, run) == []
+    
+    worse = json.loads(json.dumps(run))
+    worse["files"][0].update(correct=False, accepted=True)
+    worse["summary"] = accuracy.summarize(worse["files"])
+    worse["summary"]["stages"]["text"]["p50_ms"] = run["summary"]["stages"]["text"]["p50_ms"] * 2 + 5
+    failures = accuracy.check(run, worse)
+    assert any(f.startswith("accuracy") for f in failures)
+    assert any(f.startswith("newly wrong: " + worse["files"][0]["name"]) for f in failures)
+    assert any(f.startswith("wrong numbers accepted") for f in failures)
+    assert any(f.startswith("text stage") for f in failures)
+    assert accuracy.check(worse, run) == []
+    print("  ✅ Accuracy drops, new wrong accepts and slower stages fail the check")
+    
+    # OCR reads black decoys as readily as the red number; only red-ink readings are accepted
+    gray_passes = ["בסיסי", "סף 100", "סף 150", "סף 180", "הפוך"]
+    
+    def fake_ocr(pdf_path):
+        number = labels[Path(pdf_path).name]
+        passes = gray_passes + [detection.RED_PASS] if number else gray_passes
+        read = number or "482113"  # A black reference number on an unnumbered page
+        return {"candidates": detection.score_ocr_results(
+            [{"process_name": name, "digit_text": read, "general_text": f"Ref {read}"}
+             for name in passes])}
+    
+    patched = ("OCR_AVAILABLE", "check_tesseract", "detect_ocr_numbers")
+    original = [getattr(detection, name) for name in patched]
+    try:
+        detection.OCR_AVAILABLE = True
+        detection.check_tesseract = lambda: None
+        detection.detect_ocr_numbers = fake_ocr
+        with tempfile.TemporaryDirectory() as tmp:
+            records = synthetic_corpus.generate_corpus(tmp, per_kind=2, kinds=("scanned", "unnumbered"))
+            labels = {record["name"]: record["number"] for record in records}
+            run = accuracy.run_harness(tmp, ocr_mode="fallback", log=lambda line: None)
+        assert run["summary"]["false_accepts"] == 0 and run["summary"]["accuracy"] == 1.0
+        for f in run["files"]:
+            assert f["stages"]["ocr"]["number"] == (f["expected"] or "482113")
+            assert f["accepted"] == (f["kind"] == "scanned"), f
+        assert detection.reading_confidence(False, 5, 5) < detection.HIGH_CONFIDENCE
+        assert detection.reading_confidence(True, 0, 5) < detection.HIGH_CONFIDENCE
+        print("  ✅ Decoys OCR reads in every pass are not auto-accepted; red-ink readings are")
+    finally:
+        for name, value in zip(patched, original):
+            setattr(detection, name, value)
+    
+    print("Accuracy harness testing completed.\n")
+
+def test_tracing():
+    """Test timing spans, worker span collection and the Chrome trace export"""
+    print("Testing tracing...")
+    
+    tracer = tracing.Tracer()
+    assert tracer.span("idle") is tracing.NULL_SPAN
+    tracer.add("idle", time.perf_counter_ns())
+    assert tracer.snapshot() == []
+    print("  ✅ Disabled tracing records nothing")
+    
+    tracer.enable()
+    started = time.perf_counter_ns()
+    with tracer.span("outer", file="a.pdf") as span:
+        with tracer.span("inner"):
+            time.sleep(0.01)
+        span.set(pages=2)
+    names = [event[0] for event in tracer.snapshot()]
+    assert names == ["inner", "outer"] and tracer.snapshot()[1][5] == {"file": "a.pdf", "pages": 2}
+    totals = tracer.totals(started, names=("inner",))
+    assert list(totals) == ["inner"] and totals["inner"] >= 10
+    trace = tracer.chrome_trace()
+    spans = [e for e in trace["traceEvents"] if e["ph"] == "X"]
+    assert len(spans) == 2 and spans[0]["dur"] >= 10_000 and spans[0]["pid"] == os.getpid()
+    print("  ✅ Spans nest, carry details and sum per stage over a time window")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = Path(tmp) / "trace.pdf"
+        make_inspection_pdf(pdf, "123456")
+        tracing.tracer.enable()
+        try:
+            tracing.tracer.drain()
+            with SupervisedPool(workers=1) as pool:
+                pool.submit(render_page, str(pdf)).result(timeout=60)
+                tracing.tracer.enable(False)
+                pool.submit(render_page, str(pdf)).result(timeout=60)
+            events = tracing.tracer.drain()
+        finally:
+            tracing.tracer.enable(False)
+        names = [event[0] for event in events]
+        assert names.count("worker.render_page") == 1 and names.count("pool.render_page") == 1
+        assert "fitz.open" in names and "get_pixmap" in names
+        worker_pids = {event[3] for event in events if event[0] == "fitz.open"}
+        assert worker_pids and os.getpid() not in worker_pids
+        print("  ✅ Worker spans come back with the task result, only while tracing")
+        
+        tracer.export(Path(tmp) / "trace.json")
+        exported = json.loads((Path(tmp) / "trace.json").read_text(encoding="utf-8"))
+        assert exported["traceEvents"][0]["ph"] == "M" and len(exported["traceEvents"]) == 3
+        print("  ✅ Chrome trace export")
+    
+    print("Tracing testing completed.\n")
+
+def test_scheduler():
+    """Test priority classes, keyed cancellation, pausing and lane limits of the scheduler"""
+    print("Testing scheduler...")
+    
+    with SupervisedPool(workers=1, timeout=30) as pool:
+        scheduler = Scheduler(pool, io_workers=1)
+        order = []
+        blocker = scheduler.submit(time.sleep, 0.5, priority=BULK)
+        futures = [(name, scheduler.submit(pow, 2, exponent, priority=priority, key=name))
+                   for name, exponent, priority in [("bulk", 1, BULK), ("prefetch", 2, PREFETCH),
+                                                    ("preview", 3, PREVIEW),
+                                                    ("suggestion", 4, SUGGESTION)]]
+        for name, future in futures:
+            future.add_done_callback(lambda f, name=name: order.append(name))
+        assert scheduler.pending(CPU) == 4
+        blocker.result(timeout=30)
+        assert [f.result(timeout=30) for _, f in futures] == [2, 4, 8, 16]
+        assert order == ["preview", "suggestion", "prefetch", "bulk"], order
+        print("  ✅ Queued work runs by priority class, not submission order")
+        
+        blocker = scheduler.submit(time.sleep, 0.5)
+        renamed = [scheduler.submit(pow, 2, 2, key="old.pdf") for _ in range(3)]
+        kept = scheduler.submit(pow, 2, 3, key="other.pdf")
+        assert scheduler.cancel_key("old.pdf") == 3 and all(f.cancelled() for f in renamed)
+        assert kept.result(timeout=30) == 8 and not scheduler.keyed
+        print("  ✅ Queued tasks of a renamed file are dropped by key")
+        
+        with scheduler.paused():
+            held = scheduler.submit(pow, 3, 2, priority=PREFETCH)
+            urgent = scheduler.submit(pow, 3, 3, priority=PREVIEW)
+            assert urgent.result(timeout=30) == 27
+            time.sleep(0.2)
+            assert not held.done()
+        assert held.result(timeout=30) == 9
+        print("  ✅ Prefetch and bulk work waits while paused; previews do not")
+        
+        # The I/O lane runs on threads, limited apart from the worker processes
+        gate = threading.Event()
+        slow_io = scheduler.submit(gate.wait, 10, lane=IO)
+        queued_io = scheduler.submit(os.getpid, lane=IO)
+        assert scheduler.submit(pow, 2, 5).result(timeout=30) == 32
+        assert not queued_io.done()
+        gate.set()
+        assert slow_io.result(timeout=10) and queued_io.result(timeout=10) == os.getpid()
+        try:
+            scheduler.submit(int, "x", lane=IO).result(timeout=10)
+            assert False, "exception was not propagated"
+        except ValueError:
+            pass
+        print("  ✅ Separate CPU and I/O concurrency limits")
+        scheduler.shutdown()
+    
+    print("Scheduler testing completed.\n")
+
+def test_extraction_service():
+    """Test the local HTTP detection service: paths, uploads, batches, backpressure and metrics"""
+    print("Testing extraction service...")
+    
+    def post(url, body, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode("utf-8")
+        request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type})
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return response.status, json.loads(response.read()), response.headers
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read()), e.headers
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        first, second = Path(tmp) / "scan1.pdf", Path(tmp) / "scan2.pdf"
+        make_inspection_pdf(first, "482113")
+        make_inspection_pdf(second, "482114")
+        
+        service = ExtractionService(workers=1, max_queue=3, allow_ocr=False, timeout=30)
+        server = service.serve(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            service.wait_until_warm(timeout=60)
+            status, body, _ = post(base + "/detect", {"path": str(first)})
+            assert status == 200, body
+            result = body["results"][0]
+            assert result["number"] == "482113" and result["source"] == "text"
+            assert result["candidates"][0] == {"number": "482113", "confidence": 1.0}
+            print("  ✅ Detection by path returns the number, confidence and candidates")
+            
+            status, body, _ = post(base + "/detect?name=upload.pdf", first.read_bytes(),
+                                   "application/pdf")
+            assert status == 200 and body["results"][0]["number"] == "482113"
+            status, body, _ = post(base + "/detect", {
+                "paths": [str(second), str(Path(tmp) / "missing.pdf")],
+                "documents": [{"name": "b.pdf",
+                               "data": base64.b64encode(second.read_bytes()).decode()}]})
+            assert status == 200
+            assert [r.get("number") for r in body["results"]] == ["482114", None, "482114"]
+            assert body["results"][1]["reason"] == "not_found"
+            assert not list(Path(service.upload_dir.name).iterdir())
+            print("  ✅ Uploaded PDFs and batches are detected in order, with per-file errors")
+            
+            status, body, _ = post(base + "/detect", b"not json")
+            assert status == 400
+            
+            # Refused before its body is read: the connection is closed, not reused
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+            for url, length in [("/detect", MAX_BODY_BYTES + 1), ("/unknown", 16)]:
+                connection.request("POST", url, body=b"x" * 16,
+                                   headers={"Content-Length": str(length)})
+                response = connection.getresponse()
+                response.read()
+                assert response.status in (404, 413) and response.getheader("Connection") == "close"
+                connection.request("GET", "/health")
+                response = connection.getresponse()
+                assert response.status == 200 and json.loads(response.read())["status"] == "ok"
+            connection.close()
+            print("  ✅ Requests refused unread close their connection")
+            status, body, _ = post(base + "/detect", {"documents": [
+                {"name": "a.pdf", "data": base64.b64encode(first.read_bytes()).decode()},
+                {"name": "b.pdf", "data": "not base64!"}]})
+            assert status == 400 and not list(Path(service.upload_dir.name).iterdir())
+            print("  ✅ Documents saved before an invalid one are deleted")
+            
+            status, body, _ = post(base + "/detect", {"paths": [str(first)] * 4})
+            assert status == 413 and service.accepted == 0
+            service.reserve(3)  # Three files already waiting fill the queue
+            status, body, headers = post(base + "/detect", {"path": str(first)})
+            service.release(3)
+            assert status == 503 and headers["Retry-After"]
+            print("  ✅ Requests beyond the queue limit get 503 and Retry-After, larger ones 413")
+            
+            with urllib.request.urlopen(base + "/metrics", timeout=10) as response:
+                metrics = json.loads(response.read())
+            assert metrics["found"] == 4 and metrics["failed"] == 1 and metrics["rejected"] == 2
+            assert metrics["in_flight"] == 0 and metrics["latency_p50"] is not None
+            print("  ✅ Metrics report counts, throughput and latency")
+        finally:
+            service.close()
+    
+    print("Extraction service testing completed.\n")
+
+def test_pdf_buffer():
+    """Test read-once PDF buffers shared by rendering and detection"""
+    print("Testing read-once PDF buffers...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "scan.pdf"
+        make_inspection_pdf(path, "482113")
+        pdf_buffer.clear_cache()
+        hits, misses, _ = pdf_buffer.cache_stats()
+        
+        render_draft(str(path))
+        render_page(str(path))
+        assert detection.detect_text_numbers(str(path))["candidates"][0]["number"] == "482113"
+        after_hits, after_misses, held = pdf_buffer.cache_stats()
+        assert after_misses - misses == 1 and after_hits - hits == 2
+        assert held == path.stat().st_size
+        print("  ✅ Preview and extraction read the file once")
+        
+        document = pdf_buffer.open_pdf(str(path))
+        renamed = path.with_name("482113_scan.pdf")
+        path.rename(renamed)  # The open document does not hold the file
+        assert document.page_count == 1
+        document.close()
+        
+        make_inspection_pdf(path, "482114")
+        assert detection.detect_text_numbers(str(path))["candidates"][0]["number"] == "482114"
+        print("  ✅ Changed files are read again, open documents do not lock the file")
+        
+        data = pdf_buffer.read_file(str(renamed))
+        assert data == renamed.read_bytes()
+        limit = pdf_buffer.MAX_BUFFERED_FILE
+        pdf_buffer.MAX_BUFFERED_FILE = 10
+        try:
+            assert pdf_buffer.read_pdf(str(renamed)) is None
+            with pdf_buffer.open_pdf(str(renamed)) as document:
+                assert document.page_count == 1
+        finally:
+            pdf_buffer.MAX_BUFFERED_FILE = limit
+        cache = pdf_buffer.BufferCache(max_bytes=10)
+        cache.put("a", b"123456")
+        cache.put("b", b"123456")
+        assert cache.get("a") is None and cache.get("b") == b"123456" and cache.size == 6
+        print("  ✅ Large files are opened by path and the cache stays within its budget")
+    
+    print("Read-once PDF buffer testing completed.\n")
+
+def test_manifest_export():
+    """Test the streaming manifest export: cached fields, worker results, formats and cancelling"""
+    print("Testing manifest export...")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "scans"
+        folder.mkdir()
+        make_inspection_pdf(folder / "a.pdf", "482113")
+        make_inspection_pdf(folder / "b.pdf", "482114")
+        make_inspection_pdf(folder / "777777_c.pdf", "777777")
+        make_inspection_pdf(folder / "555555_d.pdf", "555555")
+        catalog = FolderCatalog(folder, db_path=Path(tmp) / "catalog.sqlite3")
+        catalog.reconcile(scan_folder(folder))
+        catalog.record_detection("b.pdf", ["111111"], 0.5, "ocr")
+        catalog.record_page_count("b.pdf", 3)
+        catalog.record_detection("777777_c.pdf", ["777777"], 1.0, "manual")
+        assert [name for name, _ in catalog.iter_entries(batch_size=3)] == \
+            ["555555_d.pdf", "777777_c.pdf", "a.pdf", "b.pdf"]
+        
+        output = Path(tmp) / "manifest.csv"
+        with SupervisedPool(workers=1, timeout=30) as pool:
+            written = manifest_export.export_manifest(folder, output, entries=catalog.iter_entries(),
+                                                      catalog=catalog, submit=pool.submit)
+        assert written == 4
+        with open(output, encoding="utf-8-sig", newline="") as f:
+            rows = {row["path"]: row for row in csv.DictReader(f)}
+        assert list(rows) == ["555555_d.pdf", "777777_c.pdf", "a.pdf", "b.pdf"]
+        assert (rows["a.pdf"]["number"], rows["a.pdf"]["source"], rows["a.pdf"]["page_count"]) == \
+            ("482113", "text", "1")
+        assert (rows["b.pdf"]["number"], rows["b.pdf"]["source"], rows["b.pdf"]["page_count"]) == \
+            ("111111", "ocr", "3")
+        assert (rows["777777_c.pdf"]["source"], rows["555555_d.pdf"]["source"]) == ("manual", "filename")
+        assert int(rows["a.pdf"]["size"]) == (folder / "a.pdf").stat().st_size
+        assert catalog.get("a.pdf")["numbers"][0] == "482113"
+        assert catalog.get("555555_d.pdf")["page_count"] == 1
+        print("  ✅ Known fields come from the catalog, missing ones from the workers")
+        
+        jsonl = Path(tmp) / "manifest.jsonl"
+        assert manifest_export.export_manifest(folder, jsonl, catalog=catalog) == 4
+        lines = [json.loads(line) for line in jsonl.read_text(encoding="utf-8").splitlines()]
+        assert lines[2]["path"] == "a.pdf" and lines[2]["number"] == "482113"
+        assert set(lines[0]) == set(manifest_export.FIELDS)
+        print("  ✅ JSON Lines export from the folder listing alone")
+        
+        cancelled = threading.Event()
+        cancelled.set()
+        partial = Path(tmp) / "cancelled.csv"
+        assert manifest_export.export_manifest(folder, partial, cancelled=cancelled) is None
+        assert not partial.exists() and not list(Path(tmp).glob("*.partial"))
+        print("  ✅ A cancelled export leaves no file behind")
+        catalog.close()
+    
+    print("Manifest export testing completed.\n")
+
+def test_bulk_rename():
+    """Test template bulk renames: fields, lazy previews, in-memory collision checks and one-pass apply"""
+    print("Testing bulk rename...")
+    
+    mtime_ns = int(datetime(2024, 3, 5, 12, 0).timestamp() * 1e9)
+    template = bulk_rename.RenameTemplate("{number}_{mtime:%Y%m%d}_{stem}_{counter:03d}",
+                                          pattern=r"^scan[ _]", replacement="")
+    assert template.render("scan_site A.pdf", 4, "482113", mtime_ns) == \
+        "482113_20240305_site A_005.pdf"
+    assert template.render("777777_x.pdf", 0, None, mtime_ns).startswith("777777_")
+    assert bulk_rename.RenameTemplate("a:b?").render("x.pdf") == "ab.pdf"
+    assert bulk_rename.RenameTemplate("///").render("x.pdf") is None
+    for bad in ("{owner}", "{stem.upper}", "{stem!r}"):
+        try:
+            bulk_rename.RenameTemplate(bad)
+            assert False, f"{bad} was accepted"
+        except ValueError:
+            pass
+    print("  ✅ Templates fill {number}, {mtime:...}, {stem} after the regex and {counter:03d}")
+    
+    entries = [FileEntry(f"f{i}.pdf", 10, mtime_ns) for i in range(10_000)]
+    bulk = bulk_rename.BulkRename(Path("/nowhere"), entries,
+                                  bulk_rename.RenameTemplate("doc_{counter:05d}"))
+    assert bulk.rows(20, 23) == [("f20.pdf", "doc_00021.pdf"), ("f21.pdf", "doc_00022.pdf"),
+                                 ("f22.pdf", "doc_00023.pdf")]
+    assert len(bulk.targets) == 3
+    print("  ✅ The preview only computes the rows shown")
+    
+    entries = [FileEntry(name, 10, mtime_ns) for name in ("a.pdf", "b.pdf", "c.pdf")]
+    bulk = bulk_rename.BulkRename(Path("/nowhere"), entries, bulk_rename.RenameTemplate("same"),
+                                  existing=["a.pdf", "b.pdf", "c.pdf"])
+    assert bulk.problems() == {0: "duplicate", 1: "duplicate", 2: "duplicate"}
+    bulk = bulk_rename.BulkRename(Path("/nowhere"), entries[:1], bulk_rename.RenameTemplate("B"),
+                                  existing=["a.pdf", "b.pdf"])
+    assert bulk.problems() == {0: "exists"}
+    print("  ✅ Duplicate and existing names are found in memory")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp)
+        (folder / "sub").mkdir()
+        for name, content in [("a.pdf", b"A"), ("b.pdf", b"B"), ("c.pdf", b"C"), ("sub/d.pdf", b"D")]:
+            (folder / name).write_bytes(content)
+        entries = [FileEntry(name, 1, mtime_ns) for name in ("a.pdf", "b.pdf", "c.pdf", "sub/d.pdf")]
+        # a and b trade names, c keeps its name, d is renamed inside its subfolder
+        targets = {"a.pdf": "b", "b.pdf": "a", "c.pdf": "c", "d.pdf": "d_new"}
+        
+        class Swap(bulk_rename.RenameTemplate):
+            def render(self, name, index=0, number=None, mtime_ns=None, size=None):
+                return targets[name] + ".pdf"
+        
+        bulk = bulk_rename.BulkRename(folder, entries, Swap(),
+                                      existing=[e.name for e in entries])
+        assert not bulk.problems()
+        assert bulk.changes() == [("a.pdf", "b.pdf"), ("b.pdf", "a.pdf"), ("sub/d.pdf", "sub/d_new.pdf")]
+        renamed, failed = bulk.apply()
+        assert not failed and len(renamed) == 3
+        assert (folder / "a.pdf").read_bytes() == b"B" and (folder / "b.pdf").read_bytes() == b"A"
+        assert (folder / "sub" / "d_new.pdf").read_bytes() == b"D"
+        assert sorted(p.name for p in folder.iterdir()) == ["a.pdf", "b.pdf", "c.pdf", "sub"]
+        print("  ✅ Swapped names and subfolder files are renamed in one pass")
+        
+        # A file created after the listing is not replaced
+        (folder / "new_c.pdf").write_bytes(b"NEW")
+        bulk = bulk_rename.BulkRename(folder, [FileEntry("c.pdf", 1, mtime_ns)],
+                                      bulk_rename.RenameTemplate("new_{stem}"),
+                                      existing=["a.pdf", "b.pdf", "c.pdf"])
+        assert not bulk.problems()
+        renamed, failed = bulk.apply()
+        assert not renamed and failed == [("c.pdf", "'new_c.pdf' already exists")]
+        assert (folder / "new_c.pdf").read_bytes() == b"NEW" and (folder / "c.pdf").read_bytes() == b"C"
+        print("  ✅ A target that appeared since the listing fails instead of being replaced")
+    
+    print("Bulk rename testing completed.\n")
+
 def main():
     """Run all tests"""
     print("=" * 60)
@@ -107,6 +1361,31 @@ def main():
     test_color_detection()
     test_region_calculation()
     test_ocr_preprocessing()
+    test_folder_catalog()
+    test_inspection_number_index()
+    test_duplicate_detection()
+    test_full_text_index()
+    test_file_filter()
+    test_tree_walker()
+    test_watch_daemon()
+    test_batch_job()
+    test_supervised_workers()
+    test_bounded_rendering()
+    test_progressive_preview()
+    test_multi_page_layout()
+    test_tiled_zoom()
+    test_thumbnail_grid()
+    test_render_service()
+    test_core_rename()
+    test_cold_start()
+    test_benchmark_suite()
+    test_accuracy_harness()
+    test_tracing()
+    test_scheduler()
+    test_extraction_service()
+    test_pdf_buffer()
+    test_manifest_export()
+    test_bulk_rename()
     
     print("=" * 60)
     print("Summary of Improvements:")
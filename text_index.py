@@ -0,0 +1,167 @@
+"""
+Full-text search index over the PDFs of a folder.
+
+Page text is extracted with PyMuPDF into an SQLite FTS5 table stored next to the
+folder catalog. Indexing runs in a separate low-priority process (PyMuPDF must not
+be used from several threads of one process) and pauses while the app renders a
+preview, so it never competes with the file the operator is looking at.
+"""
+
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_files (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS text_fts USING fts5(content, tokenize='unicode61');
+"""
+
+# Pause between documents so indexing never saturates the disk
+INDEX_THROTTLE = 0.01
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """Turn free text into an FTS5 query: every word must match as a prefix"""
+    tokens = TOKEN_PATTERN.findall(text)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+class TextIndex:
+    """FTS5 index of page text, keyed by file identity (name, size, mtime)"""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(str(db_path), timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        """Close the underlying database connection"""
+        self.conn.close()
+
+    def search(self, text):
+        """Return the names of files whose text matches every word of the query"""
+        query = build_match_query(text)
+        if not query:
+            return set()
+        rows = self.conn.execute(
+            "SELECT f.name FROM text_fts JOIN indexed_files f ON f.id = text_fts.rowid "
+            "WHERE text_fts MATCH ?", (query,))
+        return {row[0] for row in rows}
+
+    def pending(self, entries):
+        """Return the entries whose current identity is not indexed yet
+        Args:
+            entries: dict mapping file name -> (size, mtime_ns)
+        """
+        known = {row[0]: (row[1], row[2]) for row in
+                 self.conn.execute("SELECT name, size, mtime_ns FROM indexed_files")}
+        return {name: identity for name, identity in entries.items()
+                if known.get(name) != tuple(identity)}
+
+    def remove_missing(self, names):
+        """Drop indexed files that are no longer in the folder"""
+        names = set(names)
+        stale = [(row[0],) for row in self.conn.execute("SELECT id, name FROM indexed_files")
+                 if row[1] not in names]
+        with self.conn:
+            self.conn.executemany("DELETE FROM text_fts WHERE rowid = ?", stale)
+            self.conn.executemany("DELETE FROM indexed_files WHERE id = ?", stale)
+
+    def store(self, name, identity, text):
+        """Store (or replace) the text of one file"""
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM indexed_files WHERE name = ?",
+                                    (name,)).fetchone()
+            if row is not None:
+                self.conn.execute("DELETE FROM text_fts WHERE rowid = ?", (row[0],))
+                self.conn.execute("DELETE FROM indexed_files WHERE id = ?", (row[0],))
+            cursor = self.conn.execute(
+                "INSERT INTO indexed_files (name, size, mtime_ns) VALUES (?, ?, ?)",
+                (name, identity[0], identity[1]))
+            self.conn.execute("INSERT INTO text_fts (rowid, content) VALUES (?, ?)",
+                              (cursor.lastrowid, text))
+
+    def rename(self, old_name, new_name):
+        """Keep the indexed text of a renamed file"""
+        with self.conn:
+            row = self.conn.execute("SELECT id FROM indexed_files WHERE name = ?",
+                                    (new_name,)).fetchone()
+            if row is not None:
+                self.conn.execute("DELETE FROM text_fts WHERE rowid = ?", (row[0],))
+                self.conn.execute("DELETE FROM indexed_files WHERE id = ?", (row[0],))
+            self.conn.execute("UPDATE indexed_files SET name = ? WHERE name = ?",
+                              (new_name, old_name))
+
+
+def extract_document_text(path):
+    """Return the text of every page of a PDF"""
+    from pdf_buffer import open_pdf  # PyMuPDF, only needed in the indexing process
+
+    # Read once, but not kept: indexing a folder would evict the previews' buffers
+    with open_pdf(path, cache=False) as pdf_document:
+        return "\n".join(page.get_text() for page in pdf_document)
+
+
+def run_indexer(db_path, folder, entries, pause_event, stop_event):
+    """Index the given files of a folder (runs in the indexer process)
+    Args:
+        entries: dict mapping file name -> (size, mtime_ns)
+        pause_event: Set by the app while it renders a preview
+        stop_event: Set when the folder is closed
+    """
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass  # Not supported on this platform
+
+    index = TextIndex(db_path)
+    try:
+        index.remove_missing(entries)
+        for name, identity in sorted(index.pending(entries).items()):
+            while pause_event.is_set() and not stop_event.is_set():
+                time.sleep(0.05)
+            if stop_event.is_set():
+                return
+            try:
+                text = extract_document_text(os.path.join(folder, name))
+            except Exception:
+                text = ""  # Unreadable file: index it empty so it is not retried every time
+            index.store(name, identity, text)
+            time.sleep(INDEX_THROTTLE)
+    finally:
+        index.close()
+
+
+class BackgroundIndexer:
+    """Handle to the indexer process of one folder"""
+
+    def __init__(self, db_path, folder, entries):
+        context = multiprocessing.get_context("spawn")
+        self.pause_event = context.Event()
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=run_indexer,
+            args=(str(db_path), str(folder), dict(entries), self.pause_event, self.stop_event),
+            daemon=True)
+        self.process.start()
+
+    def pause(self):
+        """Hold indexing while foreground work runs"""
+        self.pause_event.set()
+
+    def resume(self):
+        """Let indexing continue"""
+        self.pause_event.clear()
+
+    def stop(self):
+        """Stop indexing (the current document is finished first)"""
+        self.stop_event.set()
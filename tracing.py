@@ -0,0 +1,153 @@
+"""
+Timing spans around the stages of previews, extraction and folder listing.
+
+Spans are recorded only while tracing is enabled; otherwise span() returns a
+shared no-op context manager, so instrumented code pays one attribute check.
+Worker processes record their spans too: the supervised pool enables tracing
+for tasks submitted while it is on and merges the worker's spans into this
+process's tracer when the result arrives. Timestamps come from
+time.perf_counter_ns(), a system-wide monotonic clock, so spans of different
+processes line up.
+
+A session is exported in the Chrome trace event format and can be opened in
+chrome://tracing or https://ui.perfetto.dev.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_EVENTS = 200_000  # Oldest spans are dropped beyond this many
+
+
+class _NullSpan:
+    """Span returned while tracing is disabled"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Times a with block and records it in its tracer"""
+
+    __slots__ = ("tracer", "name", "args", "started")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer.add(self.name, self.started, args=self.args)
+        return False
+
+    def set(self, **args):
+        """Attach details known only inside the block (sizes, counts)"""
+        self.args.update(args)
+
+
+class Tracer:
+    """Collects timing spans of this process (and of its workers)"""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.enabled = False
+        self.lock = threading.Lock()
+        # (name, start ns, end ns, pid, thread id, args)
+        self.events = deque(maxlen=max_events)
+        self.pid = os.getpid()
+
+    def enable(self, enabled=True):
+        """Start (or stop) recording spans"""
+        self.enabled = enabled
+
+    def span(self, name, **args):
+        """Return a context manager timing its block as a span named name"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, args)
+
+    def add(self, name, started_ns, ended_ns=None, args=None):
+        """Record a span whose start (and end) were taken with time.perf_counter_ns()
+        For work that starts and ends in different callbacks.
+        """
+        if not self.enabled:
+            return
+        event = (name, started_ns, ended_ns or time.perf_counter_ns(), os.getpid(),
+                 threading.get_ident(), args or {})
+        with self.lock:
+            self.events.append(event)
+
+    def merge(self, events):
+        """Add spans recorded by another process"""
+        with self.lock:
+            self.events.extend(events)
+
+    def drain(self):
+        """Remove and return every recorded span"""
+        with self.lock:
+            events = list(self.events)
+            self.events.clear()
+        return events
+
+    def snapshot(self):
+        """Return a copy of the recorded spans"""
+        with self.lock:
+            return list(self.events)
+
+    def totals(self, started_ns, ended_ns=None, names=None):
+        """Sum the durations of the spans that ran inside a time window
+        Args:
+            names: Only these span names (default: all)
+        Returns:
+            dict of span name -> milliseconds
+        """
+        ended_ns = ended_ns or time.perf_counter_ns()
+        totals = {}
+        for name, start, end, _, _, _ in self.snapshot():
+            if start >= started_ns and end <= ended_ns and (names is None or name in names):
+                totals[name] = totals.get(name, 0.0) + (end - start) / 1e6
+        return totals
+
+    def chrome_trace(self):
+        """Return the recorded spans in the Chrome trace event format"""
+        events = self.snapshot()
+        trace = []
+        for pid in sorted({event[3] for event in events}):
+            label = "viewer" if pid == self.pid else f"worker {pid}"
+            trace.append({"name": "process_name", "ph": "M", "pid": pid,
+                          "args": {"name": label}})
+        for name, start, end, pid, tid, args in events:
+            trace.append({"name": name, "cat": name.split(".")[0], "ph": "X",
+                          "ts": start / 1000, "dur": (end - start) / 1000,
+                          "pid": pid, "tid": tid, "args": args})
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        """Write the recorded spans to a Chrome trace JSON file"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# The tracer of this process; modules record into it through span()
+tracer = Tracer()
+
+
+def span(name, **args):
+    """Time a block as a span of this process's tracer"""
+    return tracer.span(name, **args)
@@ -0,0 +1,89 @@
+"""
+Parallel recursive folder walker.
+
+Each directory is listed with os.scandir on a worker thread, and subdirectories
+are queued as soon as their parent has been listed, so many directories are
+listed at once. This matters on high-latency network shares, where each listing
+is a round-trip. Results stream out per directory as they arrive.
+"""
+
+import fnmatch
+import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+DEFAULT_WORKERS = 8
+
+
+class TreeWalker:
+    """Walks a folder tree in the background and streams (subfolder, files) batches
+    Results are read from the `results` queue; None marks the end of the walk.
+    """
+
+    def __init__(self, root, max_depth=None, pattern="*.pdf", workers=DEFAULT_WORKERS):
+        """
+        Args:
+            root: Folder to walk
+            max_depth: Subfolder levels to descend below root (None = unlimited, 0 = root only)
+            pattern: Glob the file names must match (case-insensitive)
+            workers: Number of directories listed concurrently
+        """
+        self.root = Path(root)
+        self.max_depth = max_depth
+        self.pattern = pattern.lower()
+        self.workers = workers
+        self.results = queue.Queue()
+        self.cancelled = threading.Event()
+
+    def start(self):
+        """Start walking in a background thread"""
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def cancel(self):
+        """Stop the walk; directories already being listed are finished"""
+        self.cancelled.set()
+
+    def _scan(self, rel_dir, depth):
+        """List one directory
+        Returns:
+            (rel_dir, files, subdirs, depth), files mapping relative path -> (size, mtime_ns)
+        """
+        files = {}
+        subdirs = []
+        if self.cancelled.is_set():
+            return rel_dir, files, subdirs, depth
+
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        try:
+            with os.scandir(self.root / rel_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.max_depth is None or depth < self.max_depth:
+                                subdirs.append(prefix + entry.name)
+                        elif (fnmatch.fnmatchcase(entry.name.lower(), self.pattern)
+                              and entry.is_file()):
+                            stat = entry.stat()
+                            files[prefix + entry.name] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue  # Entry vanished or is unreadable
+        except OSError:
+            pass  # Unreadable directory, skip it
+        return rel_dir, files, subdirs, depth
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = {executor.submit(self._scan, "", 0)}
+            while pending and not self.cancelled.is_set():
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    rel_dir, files, subdirs, depth = future.result()
+                    for subdir in subdirs:
+                        pending.add(executor.submit(self._scan, subdir, depth + 1))
+                    if files:
+                        self.results.put((rel_dir, files))
+            for future in pending:
+                future.cancel()
+        self.results.put(None)
@@ -0,0 +1,308 @@
+"""
+Headless watch-folder daemon.
+
+Polls a hot folder where scanners drop PDFs, waits until each file has finished
+being written, and runs inspection number detection on a bounded pool of worker
+processes. Files with a high-confidence number get the quick rename naming
+(<number>_<original name>); everything else is moved to a review folder.
+"""
+
+import collections
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import CancelledError
+from pathlib import Path
+
+from catalog import scan_folder
+import core
+from detection import HIGH_CONFIDENCE
+from file_filter import has_inspection_number
+from supervisor import DEFAULT_MEMORY_LIMIT_MB, PoolShutDown, SupervisedPool
+
+log = logging.getLogger("watch_daemon")
+
+POLL_INTERVAL = 1.0  # Seconds between folder listings
+SETTLE_TIME = 2.0  # Seconds a file must stay unchanged before it is processed
+METRICS_INTERVAL = 30.0  # Seconds between metrics log lines
+TASK_TIMEOUT = 120.0  # Seconds a file may take before it is sent to review
+
+
+def is_complete_pdf(path):
+    """Check that a PDF ends with its %%EOF marker (scanners write it last)"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - 1024))
+            return b"%%EOF" in f.read()
+    except OSError:
+        return False
+
+
+def unique_path(path):
+    """Return path, or path with a numeric suffix if it already exists"""
+    path = Path(path)
+    counter = 1
+    candidate = path
+    while candidate.exists():
+        candidate = path.with_name(f"{path.stem}_{counter}{path.suffix}")
+        counter += 1
+    return candidate
+
+
+class StabilityTracker:
+    """Tracks files until their size and mtime stop changing"""
+
+    def __init__(self, settle_time=SETTLE_TIME):
+        self.settle_time = settle_time
+        self.pending = {}  # name -> (identity, time the identity was first seen)
+
+    def update(self, entries, now):
+        """Feed a fresh listing
+        Args:
+            entries: dict mapping name -> (size, mtime_ns)
+        Returns:
+            names that have been stable for the settle time
+        """
+        ready = []
+        for name in list(self.pending):
+            if name not in entries:
+                del self.pending[name]
+        for name, identity in entries.items():
+            known = self.pending.get(name)
+            if known is None or known[0] != identity:
+                self.pending[name] = (identity, now)
+            elif now - known[1] >= self.settle_time and identity[0] > 0:
+                ready.append(name)
+        for name in ready:
+            del self.pending[name]
+        return ready
+
+
+class DaemonMetrics:
+    """Thread-safe counters, throughput and latency of the daemon"""
+
+    def __init__(self, outcomes=("renamed", "review", "failed")):
+        """
+        Args:
+            outcomes: Outcome names reported by snapshot(), zero until first seen
+        """
+        self.outcomes = outcomes
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=1000)  # Seconds from ready to done
+        self.completions = collections.deque(maxlen=10000)  # Completion timestamps
+
+    def started(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def finished(self, outcome, latency):
+        with self.lock:
+            self.in_flight -= 1
+            self.counts[outcome] += 1
+            self.latencies.append(latency)
+            self.completions.append(time.monotonic())
+
+    def abandoned(self):
+        """Forget work that was stopped before it had an outcome"""
+        with self.lock:
+            self.in_flight -= 1
+
+    def count(self, outcome):
+        """Count an outcome that involved no work (such as a rejected request)"""
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def snapshot(self, queue_depth):
+        """Return the current metrics as a plain dict"""
+        with self.lock:
+            now = time.monotonic()
+            recent = sum(1 for t in self.completions if now - t <= 60)
+            latencies = sorted(self.latencies)
+
+            def percentile(p):
+                if not latencies:
+                    return None
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3)
+
+            snapshot = {"queue_depth": queue_depth, "in_flight": self.in_flight}
+            snapshot.update((outcome, self.counts[outcome]) for outcome in self.outcomes)
+            snapshot.update({
+                "throughput_per_minute": recent,
+                "latency_p50": percentile(0.50),
+                "latency_p95": percentile(0.95),
+            })
+            return snapshot
+
+
+class WatchDaemon:
+    """Watches a folder and processes incoming PDFs"""
+
+    def __init__(self, watch_dir, review_dir, done_dir=None, workers=2,
+                 threshold=HIGH_CONFIDENCE, allow_ocr=True, max_queue=1000,
+                 poll_interval=POLL_INTERVAL, settle_time=SETTLE_TIME, status_file=None,
+                 timeout=TASK_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+        """
+        Args:
+            watch_dir: Hot folder the scanners write to
+            review_dir: Where files without a trusted number are moved
+            done_dir: Where renamed files are moved (None = rename in place)
+            workers: Detection worker processes
+            threshold: Minimum confidence for an automatic rename
+            max_queue: Bound of the detection queue (files wait on disk beyond it)
+            status_file: Optional JSON file rewritten with the current metrics
+            timeout: Wall-clock seconds detection may take on one file
+            memory_limit_mb: Resident memory a worker may use on one file
+        """
+        self.watch_dir = Path(watch_dir)
+        self.review_dir = Path(review_dir)
+        self.done_dir = Path(done_dir) if done_dir else None
+        self.workers = workers
+        self.threshold = threshold
+        self.allow_ocr = allow_ocr
+        self.poll_interval = poll_interval
+        self.status_file = Path(status_file) if status_file else None
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.tracker = StabilityTracker(settle_time)
+        self.metrics = DaemonMetrics()
+        self.claimed = set()  # Names queued or being processed
+        self.claimed_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(workers * 2)  # Keeps workers fed, bounds memory
+
+    def scan(self):
+        """List the hot folder and queue files that finished being written"""
+        try:
+            entries = scan_folder(self.watch_dir)
+        except OSError as e:
+            log.warning("Cannot list %s: %s", self.watch_dir, e)
+            return
+
+        with self.claimed_lock:
+            self.claimed &= set(entries)
+            entries = {name: identity for name, identity in entries.items()
+                       if name not in self.claimed
+                       and (self.done_dir or not has_inspection_number(name))}
+
+        for name in self.tracker.update(entries, time.monotonic()):
+            path = self.watch_dir / name
+            if not is_complete_pdf(path):
+                self.tracker.pending[name] = (entries[name], time.monotonic())
+                continue
+            try:
+                self.queue.put_nowait((path, time.monotonic()))
+            except queue.Full:
+                # Backpressure: leave the file on disk, it is picked up again later
+                continue
+            with self.claimed_lock:
+                self.claimed.add(name)
+
+    def dispatch(self, pool):
+        """Submit queued files while worker slots are free"""
+        while self.slots.acquire(blocking=False):
+            try:
+                path, ready_at = self.queue.get_nowait()
+            except queue.Empty:
+                self.slots.release()
+                return
+            self.metrics.started()
+            future = pool.submit(core.detect, str(path), self.allow_ocr)
+            future.add_done_callback(
+                lambda f, path=path, ready_at=ready_at: self.on_detected(path, ready_at, f))
+
+    def on_detected(self, path, ready_at, future):
+        """Apply a detection result: rename, or move to review"""
+        outcome = "failed"
+        try:
+            try:
+                result = future.result()
+            except (CancelledError, PoolShutDown):
+                # The daemon is stopping: the file stays in the hot folder for the next run
+                outcome = None
+                with self.claimed_lock:
+                    self.claimed.discard(path.name)
+                return
+            except Exception as e:
+                # Detection errors, timeouts and crashes
+                log.error("Detection failed for %s: %s", path.name, e)
+                self.move_to_review(path)
+                return
+            outcome = self.apply_result(path, result)
+        except OSError as e:
+            log.error("Cannot move %s: %s", path.name, e)
+        finally:
+            if outcome is None:
+                self.metrics.abandoned()
+            else:
+                self.metrics.finished(outcome, time.monotonic() - ready_at)
+            self.slots.release()
+
+    def apply_result(self, path, result):
+        """Rename a file with a trusted number, or send it to review
+        Returns:
+            'renamed' or 'review'
+        """
+        if result["number"] and result["confidence"] >= self.threshold:
+            target_dir = self.done_dir or path.parent
+            target = target_dir / core.numbered_name(result["number"], path.name)
+            if not target.exists():
+                target_dir.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(path), str(target))
+                log.info("Renamed %s -> %s (%s, %.2f)", path.name, target.name,
+                         result["source"], result["confidence"])
+                return "renamed"
+            log.warning("Target %s already exists, sending %s to review", target.name, path.name)
+
+        log.info("Review: %s (candidates: %s)", path.name, ", ".join(result["numbers"]) or "-")
+        self.move_to_review(path)
+        return "review"
+
+    def move_to_review(self, path):
+        """Move a file to the review folder without overwriting anything"""
+        self.review_dir.mkdir(parents=True, exist_ok=True)
+        shutil.move(str(path), str(unique_path(self.review_dir / path.name)))
+
+    def report_metrics(self):
+        """Log the current metrics and update the status file"""
+        snapshot = self.metrics.snapshot(self.queue.qsize())
+        log.info("Metrics: %s", json.dumps(snapshot))
+        if self.status_file:
+            self.status_file.write_text(json.dumps(snapshot, indent=2), encoding="utf-8")
+
+    def run_forever(self, stop_event=None):
+        """Watch until interrupted (or until stop_event is set)"""
+        stop_event = stop_event or threading.Event()
+        log.info("Watching %s with %d workers", self.watch_dir, self.workers)
+        last_report = time.monotonic()
+        # Supervised workers: a file that hangs or blows up memory costs one
+        # timeout and goes to review instead of stalling the daemon
+        with SupervisedPool(workers=self.workers, timeout=self.timeout,
+                            memory_limit_mb=self.memory_limit_mb) as pool:
+            try:
+                while not stop_event.is_set():
+                    self.scan()
+                    self.dispatch(pool)
+                    if time.monotonic() - last_report >= METRICS_INTERVAL:
+                        self.report_metrics()
+                        last_report = time.monotonic()
+                    stop_event.wait(self.poll_interval)
+            except KeyboardInterrupt:
+                log.info("Stopping")
+        # Files queued but never dispatched stay in the hot folder as well
+        while True:
+            try:
+                path, _ = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            with self.claimed_lock:
+                self.claimed.discard(path.name)
+        self.report_metrics()